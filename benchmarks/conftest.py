@@ -0,0 +1,102 @@
+"""
+Benchmarks for the app's data paths, run headless on Toga's dummy backend
+against synthetic ledgers (see sqltest.synthetic). They need pytest-benchmark
+and are not part of the default test run.
+
+    pytest benchmarks                                  # the 10k ledger
+    CASHFLOWER_BENCH_SIZES=10k,1m,10m pytest benchmarks
+
+Baselines are kept in benchmarks/baselines. Compare a run against them with
+
+    pytest benchmarks --benchmark-storage=benchmarks/baselines --benchmark-compare
+
+and record new ones with ``--benchmark-save=<name>`` in place of
+``--benchmark-compare``. Generated ledgers are cached in benchmarks/.ledgers.
+"""
+
+import asyncio
+import locale
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("TOGA_BACKEND", "toga_dummy")
+
+from sqltest import migrations, synthetic  # noqa: E402
+
+LEDGER_DIR = Path(__file__).parent / ".ledgers"
+
+
+def bench_sizes():
+    return os.environ.get("CASHFLOWER_BENCH_SIZES", "10k").split(",")
+
+
+def pytest_generate_tests(metafunc):
+    if "ledger_size" in metafunc.fixturenames:
+        metafunc.parametrize("ledger_size", bench_sizes(), scope="session")
+
+
+@pytest.fixture(scope="session")
+def ledger(ledger_size):
+    "A cached synthetic ledger of the requested size, generated on first use"
+    LEDGER_DIR.mkdir(exist_ok=True)
+    path = LEDGER_DIR / f"budget-{ledger_size}-{synthetic.SEED}-v{migrations.SCHEMA_VERSION}"
+    if not path.exists():
+        partial = path.with_suffix(".partial")
+        if partial.exists():
+            partial.unlink()
+        synthetic.generate_ledger(partial, synthetic.parse_size(ledger_size))
+        partial.rename(path)
+    return path
+
+
+@pytest.fixture(scope="session")
+def available_locale():
+    """
+    The app sets the en_US.UTF-8 locale. Where that is not installed, its
+    calls fall back to C.UTF-8 for the session so the benchmarks still
+    run; the money formatter then uses its own US conventions, which give
+    the same text. setlocale is put back afterwards.
+    """
+    try:
+        locale.setlocale(locale.LC_ALL, "en_US.UTF-8")
+    except locale.Error:
+        pass
+    else:
+        yield
+        return
+    set_locale = locale.setlocale
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(
+            locale, "setlocale", lambda category, value=None: set_locale(category, "C.UTF-8" if value else value)
+        )
+        yield
+
+
+@pytest.fixture(scope="session")
+def app(ledger, tmp_path_factory, available_locale):
+    "The app, started on a scratch copy of the ledger"
+    from sqltest.app import SQLTest
+
+    scratch = tmp_path_factory.mktemp("ledger") / "budget"
+    shutil.copy(ledger, scratch)
+    os.environ["CASHFLOWER_DB"] = str(scratch)
+    os.environ["HOME"] = str(tmp_path_factory.mktemp("home"))
+    sqltest_app = SQLTest("Cashflower", "com.example.sqltest")
+
+    async def loaded():
+        while sqltest_app.transaction_source is None or sqltest_app.account_source is None:
+            await asyncio.sleep(0.01)
+
+    sqltest_app.loop.run_until_complete(loaded())
+    yield sqltest_app
+    sqltest_app.exit_handler(sqltest_app)
+    del os.environ["CASHFLOWER_DB"]
+
+
+@pytest.fixture
+def run_async(app):
+    "Run a coroutine to completion on the app's event loop"
+    return app.loop.run_until_complete
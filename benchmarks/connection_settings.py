@@ -0,0 +1,139 @@
+"""
+Compare the tuned connection settings (db.connect) with a bare
+sqlite3.connect on a synthetic ledger (see sqltest.synthetic).
+
+    python benchmarks/connection_settings.py [rows]
+
+Each setup gets its own copy of the same file. Times are wall clock on this
+machine; compare the two columns, not the absolute numbers.
+"""
+
+import datetime
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqltest import dates, db, pagination, rollups, synthetic
+
+INSERT_SQL = """
+INSERT INTO transactions (date, transaction_type, amount, account_id, merchant, budget_category_id, spending_category_id)
+values (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def synthetic_rows(count, seed=12345):
+    generator = random.Random(seed)
+    start = dates.day_number(datetime.date(2020, 1, 1))
+    for number in range(count):
+        amount = generator.randint(-20000, 5000)
+        yield (
+            start + number * 1500 // count,
+            "Credit" if amount > 0 else "Debit",
+            amount,
+            generator.randint(1, 2),
+            f"Merchant {generator.randint(1, 500)}",
+            generator.randint(1, 2),
+            generator.randint(1, 2),
+        )
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def single_row_commits(con, count=200):
+    def write():
+        for _ in range(count):
+            con.execute(INSERT_SQL, next(rows))
+            con.commit()
+
+    rows = synthetic_rows(count * 3, seed=7)
+    return timed(write, 3) / count
+
+
+def first_page(con):
+    return timed(lambda: pagination.TransactionPager().next_page(con), 20)
+
+
+def category_rollups(con):
+    return timed(lambda: rollups.category_rollups(con), 5)
+
+
+def reads_during_a_write(writer, open_reader, rows=50000):
+    """Slowest page read while another connection writes and commits ``rows`` rows."""
+    done = threading.Event()
+    latencies = []
+
+    def read():
+        reader = open_reader()
+        try:
+            while not done.is_set():
+                started = time.perf_counter()
+                try:
+                    pagination.TransactionPager().next_page(reader)
+                except sqlite3.OperationalError:
+                    pass
+                latencies.append(time.perf_counter() - started)
+        finally:
+            reader.close()
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    writer.execute("BEGIN")
+    writer.executemany(INSERT_SQL, synthetic_rows(rows, seed=99))
+    writer.commit()
+    done.set()
+    thread.join()
+    return max(latencies) if latencies else 0.0
+
+
+def run(count):
+    work_dir = Path(tempfile.mkdtemp())
+    base = work_dir / "base.db"
+    print(f"Building a {count}-row ledger in {work_dir}...")
+    synthetic.generate_ledger(base, count)
+
+    setups = {
+        "bare connect": (
+            lambda path: sqlite3.connect(path),
+            lambda path: sqlite3.connect(path, check_same_thread=False),
+        ),
+        "db.connect": (
+            lambda path: db.connect(path),
+            lambda path: db.connect(path, read_only=True),
+        ),
+    }
+    results = {}
+    for name, (open_writer, open_reader) in setups.items():
+        path = work_dir / f"{name.replace(' ', '_').replace('.', '_')}.db"
+        shutil.copy(base, path)
+        writer = open_writer(path)
+        results[name] = [
+            ("commit of one row", single_row_commits(writer)),
+            ("first transaction page", first_page(writer)),
+            ("category rollups", category_rollups(writer)),
+            ("slowest read during a write", reads_during_a_write(writer, lambda: open_reader(path))),
+        ]
+        writer.close()
+    shutil.rmtree(work_dir)
+
+    names = list(results)
+    print(f"{'':30}" + "".join(f"{name:>16}" for name in names))
+    for index, (label, _) in enumerate(results[names[0]]):
+        cells = "".join(f"{results[name][index][1] * 1000:13.2f} ms" for name in names)
+        print(f"{label:30}{cells}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,178 @@
+import copy
+
+from sqltest import budgets, dates, forecast, pivot, queries, rollups
+from sqltest.pagination import TransactionPager
+from sqltest.rollups import CategoryRollups
+from sqltest.search import SearchPager
+
+
+def test_account_list(app, run_async, benchmark):
+    def build():
+        app.reference.invalidate_accounts()
+        run_async(app.build_desktop_account_list())
+
+    benchmark(build)
+    assert len(app.account_source) == 4
+
+
+def test_transaction_list_first_page(app, run_async, benchmark):
+    def build():
+        app.transaction_source = None
+        run_async(app.build_desktop_transaction_list())
+
+    benchmark(build)
+    assert len(app.transaction_source) > 0
+
+
+def test_transaction_list_scroll(app, run_async, benchmark):
+    "Ten pages further down the list"
+
+    async def scroll():
+        pager = TransactionPager()
+        rows = []
+        for _ in range(10):
+            page = await app.db.read(pager.next_page)
+            rows.extend(app.transaction_rows_data(page))
+        return rows
+
+    rows = benchmark(lambda: run_async(scroll()))
+    assert len(rows) == 2000
+
+
+def test_search_common_merchant(app, run_async, benchmark):
+    "First two pages of a search that matches a large share of the ledger"
+
+    async def search():
+        pager = SearchPager("fresh")
+        return await app.db.read(pager.next_page) + await app.db.read(pager.next_page)
+
+    rows = benchmark(lambda: run_async(search()))
+    assert len(rows) == 400
+
+
+def test_search_rare_words(app, run_async, benchmark):
+    "A search whose matches all fit in the ranked window"
+    rows = benchmark(lambda: run_async(app.db.read(SearchPager("receipt kept").next_page)))
+    assert rows
+
+
+def test_category_totals_query(app, run_async, benchmark):
+    rows = benchmark(lambda: run_async(app.db.read(rollups.category_rollups)))
+    assert rows
+
+
+def test_snapshot_category_month_totals(app, run_async, benchmark):
+    "Spending per category and month, grouped in memory"
+
+    def totals(con):
+        app.ledger.refresh(con)
+        return app.ledger.totals(("budget_category_id", "spending_category_id", "month"), transfers=False)
+
+    rows = benchmark(lambda: run_async(app.db.read(totals)))
+    assert rows
+
+
+def test_categories_window(app, run_async, benchmark):
+    "The categories window with the rollups worked out again each time"
+
+    def show():
+        app.category_rollups = CategoryRollups(app.ledger)
+        app.all_categories = None
+        run_async(app.show_categories_window(None))
+
+    benchmark(show)
+    assert len(app.category_table_source) > 0
+
+
+def test_categories_window_cached(app, run_async, benchmark):
+    benchmark(lambda: run_async(app.show_categories_window(None)))
+
+
+def last_year(con):
+    "The twelve months up to the ledger's latest"
+    latest = con.execute("SELECT MAX(date) FROM transactions").fetchone()[0]
+    return pivot.month_number(dates.to_date(latest)) - 11, 12
+
+
+def test_pivot_year_query(app, run_async, benchmark):
+    "A year of spending per category and month, grouped in SQL"
+    rows = benchmark(lambda: run_async(app.db.read(lambda con: pivot.spending_pivot(con, *last_year(con)))))
+    assert rows
+
+
+def test_pivot_year_after_insert(app, run_async, benchmark):
+    "The cached year pivot brought up to date after one new transaction"
+    cache = pivot.PivotCache()
+    window = run_async(app.db.run(last_year))
+    run_async(app.db.run(cache.get, *window))
+    warm = copy.deepcopy(cache.windows)
+    values = (pivot.month_day(window[0] + 11), "Debit", -1200, 1, "Cafe Luna", None, None, 5, 7, None)
+
+    def start_round():
+        # The previous round's row was rolled back, so its month is put back
+        # to the warm window as well.
+        cache.windows = copy.deepcopy(warm)
+
+    def insert_and_get(con):
+        try:
+            queries.add_transaction(con, values)
+            return cache.get(con, *window)
+        finally:
+            con.rollback()
+
+    rows = benchmark.pedantic(
+        lambda: run_async(app.db.run(insert_and_get)), setup=start_round, rounds=50
+    )
+    assert rows
+
+
+def test_transaction_insert(app, run_async, benchmark):
+    "A hundred entries keyed in quickly, every tenth a transfer"
+
+    async def enter():
+        futures = []
+        for number in range(100):
+            values = (19813, "Debit", -1200, 1, "Cafe Luna", None, None, 5, 7, None)
+            transfer_values = None
+            if number % 10 == 0:
+                values = (19813, "Transfer", -5000, 1, None, None, None, None, None, 2)
+                transfer_values = (19813, "Transfer", 5000, 2, None, None, None, None, None, 1)
+            futures.append(app.writes.submit(queries.add_transaction, values, transfer_values))
+        await app.writes.flush()
+        for future in futures:
+            await future
+
+    benchmark(lambda: run_async(enter()))
+
+
+def test_budget_funding(app, run_async, benchmark):
+    "Every budget category funded for a year"
+
+    async def fund():
+        await app.load_reference_data()
+        entries = [(row[0], "01/01/2024", 40000) for row in app.budget_category_list]
+        rows = budgets.funding_rows(entries, months=12)
+        written = app.writes.submit(budgets.set_funding, rows)
+        await app.writes.flush()
+        await written
+        return rows
+
+    rows = benchmark(lambda: run_async(fund()))
+    assert len(rows) == 12 * len(app.budget_category_list)
+
+
+def test_forecast_fifty_accounts(benchmark):
+    "Five years of daily balances for 50 accounts with 200 recurring rules"
+    first = 19814
+    frequencies = list(forecast.FREQUENCIES)
+    rules = [
+        (1 + n % 50, (-1) ** n * (1000 + 37 * n), frequencies[n % 4], 1 + n % 3, first - n, None, None)
+        for n in range(200)
+    ]
+
+    def project():
+        flows = forecast.rule_flows(rules, first, first + 1825)
+        projection = forecast.project(range(1, 51), [100000] * 50, *flows, first, 1826)
+        return projection.shortfalls()
+
+    benchmark(project)
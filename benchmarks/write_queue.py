@@ -0,0 +1,68 @@
+"""
+Rapid data entry: one commit per transaction against the write-behind queue.
+
+    python benchmarks/write_queue.py [entries]
+
+Both runs write the same transactions, every tenth one a transfer pair,
+through a DataService on a fresh budget file.
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqltest import migrations, queries
+from sqltest.schema import create_schema
+from sqltest.service import DataService
+from sqltest.writequeue import WriteQueue
+
+
+def entries(count):
+    for number in range(count):
+        values = (1712000000 + number, "Debit", -100 - number, 1, "Cafe", None, None, None, None, None)
+        if number % 10 == 0:
+            values = values[:1] + ("Transfer",) + values[2:9] + (2,)
+            yield values, values[:2] + (-values[2], 2) + values[4:9] + (1,)
+        else:
+            yield values, None
+
+
+def open_service(path):
+    service = DataService(path)
+    service.call(create_schema)
+    service.call(migrations.migrate)
+    service.call(lambda con: con.commit())
+    return service
+
+
+async def commit_each(service, count):
+    for values, transfer_values in entries(count):
+        await service.write(queries.add_transaction, values, transfer_values)
+
+
+async def queued(service, count):
+    queue = WriteQueue(service)
+    futures = [
+        queue.submit(queries.add_transaction, values, transfer_values)
+        for values, transfer_values in entries(count)
+    ]
+    await queue.flush()
+    await asyncio.gather(*futures)
+
+
+def run(count):
+    work_dir = Path(tempfile.mkdtemp())
+    for label, enter in [("commit per entry", commit_each), ("write-behind queue", queued)]:
+        service = open_service(work_dir / f"{enter.__name__}.db")
+        started = time.perf_counter()
+        asyncio.run(enter(service, count))
+        elapsed = time.perf_counter() - started
+        rows = service.call(lambda con: con.execute("SELECT COUNT(*) FROM transactions").fetchone()[0])
+        service.close()
+        print(f"{label:20} {count / elapsed:10.0f} entries/s ({rows} rows)")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
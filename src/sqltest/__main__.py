@@ -1,4 +1,14 @@
-from sqltest.app import main
+import sys
+
+from sqltest.startup_timing import timer
 
 if __name__ == '__main__':
+    if sys.argv[1:2] == ["cli"]:
+        # Headless: sqltest.cli never imports toga.
+        from sqltest.cli import main
+
+        sys.exit(main(sys.argv[2:]))
+
+    from sqltest.app import main
+
     main().main_loop()
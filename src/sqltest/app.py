@@ -2,11 +2,12 @@
 My first application
 """
 
+import asyncio
+import bisect
+import logging
 import os
-import time
 import datetime
 from pathlib import Path, PurePath
-from tempfile import mkdtemp
 
 import locale
 import toga
@@ -16,8 +17,59 @@ from toga.style.pack import COLUMN, ROW
 from toga.constants import CENTER, COLUMN, HIDDEN, ROW, VISIBLE
 
 
-import sqlite3
-import urllib.request
+from sqltest import balances, budgets, checkpoints, dates, exporter, forecast, importers, instrumentation, migrations, money, pagination, paths, pivot, queries, recurring, rollups
+from sqltest.changes import ChangeBus, ChangeWatcher
+from sqltest.instrumentation import timed
+from sqltest.rollups import CategoryRollups
+from sqltest.pagination import TransactionPager
+from sqltest.listdiff import patch_rows, update_rows
+from sqltest.reference import ReferenceData
+from sqltest.search import SearchPager
+from sqltest.snapshot import LedgerSnapshot
+from sqltest.service import DataService
+from sqltest.startup_timing import timer
+from sqltest.writequeue import WriteQueue
+
+logger = logging.getLogger(__name__)
+
+
+class PagedListSource(ListSource):
+    """
+    A ListSource that asks for more rows when the widget reads a row close
+    to the end of what has been loaded so far.
+    """
+
+    def __init__(self, accessors, on_near_end, prefetch=50):
+        super().__init__(accessors=accessors, data=[])
+        self.on_near_end = on_near_end
+        self.prefetch = prefetch
+
+    def __getitem__(self, index):
+        if index >= len(self) - self.prefetch:
+            self.on_near_end()
+        return super().__getitem__(index)
+
+    def loaded(self):
+        """The rows loaded so far, without asking for more."""
+        return [ListSource.__getitem__(self, index) for index in range(len(self))]
+
+
+DATE_RANGES = ["All dates", "This month", "Last 90 days", "Custom"]
+# How often a new transaction repeats: (frequency, interval), or None for once.
+REPEATS = {
+    "Never": None,
+    "Every day": (forecast.DAILY, 1),
+    "Every week": (forecast.WEEKLY, 1),
+    "Every 2 weeks": (forecast.WEEKLY, 2),
+    "Every month": (forecast.MONTHLY, 1),
+    "Every 3 months": (forecast.MONTHLY, 3),
+    "Every year": (forecast.YEARLY, 1),
+}
+FORECAST_HORIZONS = ["1 year", "2 years", "3 years", "4 years", "5 years"]
+# Months in the spending pivot, ending with this month.
+PIVOT_PERIODS = {"Last 3 months": 3, "Last 6 months": 6, "Last 12 months": 12, "Last 24 months": 24}
+# Seconds to wait after the last keystroke in the search box before searching.
+SEARCH_DELAY = 0.3
 
 
 class SQLTest(toga.App):
@@ -29,39 +81,53 @@ class SQLTest(toga.App):
         We then create a main window (with a name matching the app), and
         show the main window.
         """
-        # download db
-
+        timer.mark("import")
+        instrumentation.configure()
         data_dir = self.app.paths.data
         if not os.path.exists(data_dir):
-            print(f"Data dir {data_dir} does not exist, creating...")
+            logger.info("Data dir %s does not exist, creating...", data_dir)
             os.makedirs(data_dir)
 
-        dest = Path(data_dir) / Path("budget")
-
-        if not os.path.isfile(dest):
-            self.create_empty_db(dest)
-
-        print(f"Opening data from {dest}")
-
-        # dest = Path("/var/folders/3q/f_7507pn20d28hc11nlvntb80000gn/T/tmpu4d43zf3/budget")
-        # expected_path = Path(mkdtemp()) / Path("Chinook_Sqlite.sqlite")
-        # print(f"expected path is {expected_path}")
-        # url = "https://github.com/lerocha/chinook-database/raw/master/ChinookDatabase/DataSources/Chinook_Sqlite.sqlite"
-        # response = urllib.request.urlopen(url)
-        # dest.write_bytes(response.read())
-
-        # query db
-        self.con = None
-        try:
-            self.con = sqlite3.connect(dest)
-            if self.con is None:
-                print("FAILED TO CONNECT TO sqlite DB")
-            else:
-                print("Successfully connected to sqlite DB")
-        except:
-            print(f"Failed to connect to sqlite db with error")
+        dest = paths.budget_path(data_dir)
+        new_database = not os.path.isfile(dest)
+
+        logger.info("Opening data from %s", dest)
+        self.db = DataService(dest)
+        # Writes by this app or by another process are published on
+        # self.changes, and each view refreshes what they touch.
+        self.changes = ChangeBus()
+        self.change_watcher = ChangeWatcher(self.db, self.changes)
+        self.writes = WriteQueue(self.db, on_commit=self.change_watcher.check_soon)
+        # Reports group in memory when NumPy is there, and in SQL otherwise.
+        # They run on the reader threads, so queued writes never wait on them.
+        self.ledger = LedgerSnapshot() if money.optional_numpy() else None
+        self.category_rollups = CategoryRollups(self.ledger)
+        self.pivot_cache = pivot.PivotCache(self.ledger)
+        self.reference = ReferenceData()
+        self.all_categories = None
+        self.on_exit = self.exit_handler
+
+        # Views are built the first time they are shown and kept; later
+        # visits patch their data instead of building new widgets.
+        self.account_source = None
+        self.transaction_source = None
+        # Changes to transactions made while the list was not showing.
+        self.pending_transaction_changes = []
+        self.add_account_view = None
+        self.add_transaction_view = None
+        self.budgets_view = None
+        self.categories_view = None
+        self.diagnostics_view = None
+        self.export_view = None
+        self.forecast_view = None
+        self.import_view = None
+        self.pivot_view = None
+        self.transaction_search_timer = None
+        self.subscribe_to_changes()
 
         locale.setlocale(locale.LC_ALL, "en_US.UTF-8")
+        # The locale is read once, here; rows are formatted from this.
+        self.money = money.MoneyFormatter()
         self.main_window = toga.MainWindow(title=self.formal_name)
 
         account_list_container = toga.Box()
@@ -69,25 +135,142 @@ class SQLTest(toga.App):
         account_list_container.add(account_loading_label)
         self.account_list_container = account_list_container
 
-        transaction_container = toga.Box()
+        transaction_container = toga.Box(style=Pack(direction=COLUMN, flex=1))
         transaction_loading_label = toga.Label("Loading Transaction List...")
         transaction_container.add(transaction_loading_label)
         self.transaction_container = transaction_container
 
-        self.build_desktop_account_list()
-        self.build_desktop_transaction_list()
-
-        split = toga.SplitContainer(
+        self.main_split = toga.SplitContainer(
             content=[self.account_list_container, self.transaction_container]
         )
 
-        self.main_window.content = split
+        self.main_window.content = self.main_split
+        self.build_desktop_navigation()
+        self.build_menu_commands()
         self.main_window.show()
-        self.show_main_window()
-
-    def switch_to_main_window(self, widget):
-        print("Switching to main window")
-        self.show_main_window()
+        # The first turn of the event loop is when the shell gets drawn.
+        self.loop.call_soon(timer.mark, "first paint")
+        # The placeholders stay up until the data has been read.
+        self.loop.create_task(self.open_database(new_database))
+
+    async def open_database(self, new_database):
+        await self.db.run(self.prepare_database, new_database)
+        # Changes are published from here on.
+        await self.change_watcher.check()
+        timer.mark("db open")
+        await self.show_main_window()
+        timer.mark("data loaded")
+        self.change_watcher.start()
+        logger.info("Startup timing:\n%s", timer.report())
+        if self.ledger is not None:
+            # Read the ledger for the reports now, rather than when one is first opened.
+            await self.db.read(self.ledger.refresh)
+
+    def prepare_database(self, con, new_database):
+        """Create or upgrade the schema and post due recurring transactions. Runs on the database thread."""
+        migrations.prepare(con, new_database)
+        posted = recurring.post_due(con)
+        con.commit()
+        if posted:
+            logger.info("Posted %s recurring transactions", posted)
+
+    def exit_handler(self, app, **kwargs):
+        self.change_watcher.stop()
+        self.writes.close()
+        self.db.close()
+        return True
+
+    def subscribe_to_changes(self):
+        # First, so the views below read checkpoints that are whole again.
+        self.changes.subscribe(self.checkpoints_changed, {"transactions"})
+        self.changes.subscribe(self.reference_changed, {"budget_categories", "spending_categories"})
+        self.changes.subscribe(self.accounts_changed, {"accounts", "transactions"})
+        self.changes.subscribe(
+            self.transaction_list_changed, {"transactions", "budget_categories", "spending_categories"}
+        )
+        self.changes.subscribe(
+            self.categories_changed, {"transactions", "budget_transactions", "budget_categories", "spending_categories"}
+        )
+        self.changes.subscribe(self.budget_categories_changed, {"budget_categories"})
+        self.changes.subscribe(self.pivot_changed, {"transactions", "budget_categories", "spending_categories"})
+        self.changes.subscribe(self.forecast_changed, {"transactions", "accounts", "recurring_rules"})
+
+    def showing(self, view):
+        return view is not None and self.main_window.content is view
+
+    async def checkpoints_changed(self, changed):
+        """Fill back in the balance checkpoints that the changed transactions dropped."""
+        account_ids = None
+        if all(change.table is not None for change in changed):
+            account_ids = sorted(set(change.account_id for change in changed))
+        await self.db.write(checkpoints.build_checkpoints, account_ids)
+
+    def reference_changed(self, changed):
+        tables = set(change.table for change in changed)
+        if None in tables or "budget_categories" in tables:
+            self.reference.invalidate_budget_categories()
+        if None in tables or "spending_categories" in tables:
+            self.reference.invalidate_spending_categories()
+
+    async def accounts_changed(self, changed):
+        """Patch in the balances of the accounts that changed, or the whole list if accounts did."""
+        if any(change.table != "transactions" for change in changed):
+            self.reference.invalidate_accounts()
+            await self.build_desktop_account_list()
+            return
+        account_ids = set(change.account_id for change in changed)
+        rows = await self.db.read(balances.get_account_balances, sorted(account_ids))
+        self.reference.update_accounts(rows)
+        if self.account_source is not None:
+            update_rows(self.account_source, self.account_rows_data(rows), "account_id")
+
+    async def transaction_list_changed(self, changed):
+        """Update the loaded rows if the list is showing, or keep the changes for when it is."""
+        changed = [change for change in changed if change.table == "transactions" or change.operation != "insert"]
+        if not changed or self.transaction_source is None:
+            # A new category is on no transaction yet.
+            return
+        if self.showing(self.main_split):
+            await self.refresh_transaction_rows(changed)
+        else:
+            self.pending_transaction_changes.extend(changed)
+
+    async def categories_changed(self, changed):
+        """Refresh the rollups of the budget categories that changed, if the table is showing."""
+        if not self.showing(self.categories_view):
+            # It is brought up to date when it is next shown.
+            return
+        if any(change.table in (None, "budget_categories", "spending_categories") for change in changed):
+            await self.update_categories_view()
+            return
+        budget_category_ids = set(change.budget_category_id for change in changed) - {None}
+        if budget_category_ids:
+            rows = await self.db.read(rollups.category_rollups, None, sorted(budget_category_ids))
+            update_rows(self.category_table_source, self.category_rows_data(rows), "key")
+
+    async def budget_categories_changed(self, changed):
+        if self.budgets_view is not None:
+            await self.get_budget_category_list()
+            self.update_budget_rows()
+
+    async def pivot_changed(self, changed):
+        if self.showing(self.pivot_view):
+            await self.update_pivot()
+
+    async def forecast_changed(self, changed):
+        if self.showing(self.forecast_view):
+            await self.update_forecast()
+
+    def show_view(self, view):
+        """Put a view in the main window, committing any queued writes."""
+        if self.writes.pending:
+            self.loop.create_task(self.writes.flush())
+        self.main_window.content = view
+
+    @timed
+    async def switch_to_main_window(self, widget):
+        logger.debug("Switching to main window")
+        await self.show_main_window()
 
     def build_desktop_navigation(self):
         accounts_cmd = toga.Command(
@@ -114,6 +297,18 @@ class SQLTest(toga.App):
             tooltip="Transactions",
             icon=toga.Icon.DEFAULT_ICON,
         )
+        import_cmd = toga.Command(
+            self.show_import_window,
+            "Import",
+            tooltip="Import a bank statement",
+            icon=toga.Icon.DEFAULT_ICON,
+        )
+        export_cmd = toga.Command(
+            self.show_export_window,
+            "Export",
+            tooltip="Export the ledger to CSV, Parquet or Arrow",
+            icon=toga.Icon.DEFAULT_ICON,
+        )
         main_window_cmd = toga.Command(
             self.switch_to_main_window,
             " @ Main Window",
@@ -121,68 +316,332 @@ class SQLTest(toga.App):
             icon=toga.Icon.DEFAULT_ICON,
         )
         self.main_window.toolbar.add(
-            main_window_cmd, accounts_cmd, budgets_cmd, categories_cmd, transactions_cmd
+            main_window_cmd, accounts_cmd, budgets_cmd, categories_cmd, transactions_cmd, import_cmd, export_cmd
         )
 
-    def show_main_window(self):
-        print("Showing main window")
-        self.main_window = toga.MainWindow(title=self.formal_name)
+    @timed
+    async def verify_balances_callback(self, widget):
+        mismatches = await self.db.read(balances.verify_account_balances)
+        if not mismatches:
+            self.main_window.info_dialog("Verify Balances", "All account balances match the ledger.")
+            return
+
+        for account_id, stored_balance, actual_balance in mismatches:
+            logger.warning("Account %s balance was %s, ledger says %s", account_id, stored_balance, actual_balance)
+        await self.db.write(balances.rebuild_account_balances)
+        self.reference.invalidate_accounts()
+        await self.build_desktop_account_list()
+        self.show_view(self.main_split)
+        self.main_window.info_dialog(
+            "Verify Balances",
+            f"Rebuilt balances; {len(mismatches)} account(s) did not match the ledger.",
+        )
 
-        self.build_desktop_account_list()
+    def build_menu_commands(self):
+        verify_balances_cmd = toga.Command(
+            self.verify_balances_callback,
+            "Verify Balances",
+            tooltip="Check account balances against the ledger and rebuild them if they differ",
+            group=toga.Group.FILE,
+        )
+        diagnostics_cmd = toga.Command(
+            self.show_diagnostics_window,
+            "Diagnostics",
+            tooltip="Show the slowest queries and callbacks",
+            group=toga.Group.VIEW,
+        )
+        forecast_cmd = toga.Command(
+            self.show_forecast_window,
+            "Forecast",
+            tooltip="Project account balances and find the days they go below zero",
+            group=toga.Group.VIEW,
+        )
+        pivot_cmd = toga.Command(
+            self.show_pivot_window,
+            "Spending by Month",
+            tooltip="Spending per category in each of the last few months",
+            group=toga.Group.VIEW,
+        )
+        self.commands.add(verify_balances_cmd, diagnostics_cmd, forecast_cmd, pivot_cmd)
+
+    def show_diagnostics_window(self, widget):
+        if self.diagnostics_view is None:
+            self.diagnostics_view = self.build_diagnostics_view()
+        self.update_diagnostics()
+        self.show_view(self.diagnostics_view)
+
+    def build_diagnostics_view(self):
+        diagnostics_box = toga.Box(style=Pack(direction=COLUMN, padding=10))
+        accessors = ["name", "count", "total", "worst", "mean"]
+
+        diagnostics_box.add(toga.Label("Slowest callbacks:"))
+        self.callback_timing_source = ListSource(accessors=accessors, data=[])
+        diagnostics_box.add(
+            toga.Table(
+                headings=["Callback", "Calls", "Total ms", "Worst ms", "Mean ms"],
+                accessors=accessors,
+                data=self.callback_timing_source,
+                style=Pack(height=250),
+            )
+        )
 
-        locale.setlocale(locale.LC_ALL, "en_US.UTF-8")
-        self.transaction_container = self.build_desktop_transaction_list()
+        self.query_timing_label = toga.Label("Slowest queries:")
+        diagnostics_box.add(self.query_timing_label)
+        self.query_timing_source = ListSource(accessors=accessors, data=[])
+        diagnostics_box.add(
+            toga.Table(
+                headings=["Statement", "Calls", "Total ms", "Worst ms", "Mean ms"],
+                accessors=accessors,
+                data=self.query_timing_source,
+                style=Pack(height=250),
+            )
+        )
 
-        split = toga.SplitContainer(
-            content=[self.account_list_container, self.transaction_container]
+        buttons_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        buttons_box.add(
+            toga.Button("Refresh", on_press=self.refresh_diagnostics_callback, style=Pack(width=120)),
+            toga.Button("Reset", on_press=self.reset_diagnostics_callback, style=Pack(width=120)),
         )
+        diagnostics_box.add(buttons_box)
+        return diagnostics_box
 
-        self.main_window.content = split
+    def timing_rows(self, timings):
+        rows = []
+        for name, count, total, worst in timings.slowest():
+            rows.append(
+                {
+                    "name": name,
+                    "count": count,
+                    "total": f"{total * 1000:.1f}",
+                    "worst": f"{worst * 1000:.1f}",
+                    "mean": f"{total * 1000 / max(count, 1):.2f}",
+                }
+            )
+        return rows
+
+    def update_diagnostics(self):
+        patch_rows(self.callback_timing_source, self.timing_rows(instrumentation.callbacks), "name")
+        patch_rows(self.query_timing_source, self.timing_rows(instrumentation.queries), "name")
+        if instrumentation.trace_queries:
+            self.query_timing_label.text = "Slowest queries:"
+        else:
+            self.query_timing_label.text = (
+                f"Slowest queries (not timed; start with {instrumentation.TRACE_ENV}=all to time them):"
+            )
 
-        self.build_desktop_navigation()
-        self.main_window.show()
+    def refresh_diagnostics_callback(self, widget):
+        self.update_diagnostics()
+
+    def reset_diagnostics_callback(self, widget):
+        instrumentation.callbacks.clear()
+        instrumentation.queries.clear()
+        self.update_diagnostics()
+
+    async def show_forecast_window(self, widget):
+        if self.forecast_view is None:
+            self.forecast_view = self.build_forecast_view()
+        await self.update_forecast()
+        self.show_view(self.forecast_view)
+
+    def build_forecast_view(self):
+        forecast_box = toga.Box(style=Pack(direction=COLUMN, padding=10))
+        horizon_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        self.forecast_horizon_selection = toga.Selection(
+            items=FORECAST_HORIZONS,
+            on_change=self.forecast_horizon_change_callback,
+            style=Pack(width=150),
+        )
+        self.forecast_status_label = toga.Label("", style=Pack(padding_left=5))
+        horizon_box.add(toga.Label("Project balances over"), self.forecast_horizon_selection, self.forecast_status_label)
+        forecast_box.add(horizon_box)
+
+        accessors = ["account_id", "account", "lowest", "lowest_on", "overdrawn"]
+        self.forecast_source = ListSource(accessors=accessors, data=[])
+        forecast_box.add(
+            toga.Table(
+                headings=["ID", "Account", "Lowest balance", "On", "First below zero"],
+                accessors=accessors,
+                data=self.forecast_source,
+                style=Pack(flex=1),
+            )
+        )
+        return forecast_box
 
-    def get_budget_category_list(self):
-        budget_cur = self.con.cursor()
-        categories_res = budget_cur.execute(
-            "SELECT id, name FROM budget_categories ORDER BY Name"
+    @timed
+    async def update_forecast(self):
+        await self.writes.flush()
+        await self.load_reference_data()
+        try:
+            years = FORECAST_HORIZONS.index(self.forecast_horizon_selection.value) + 1
+            projection = await self.db.read(recurring.forecast_ledger, forecast.horizon_days(years), None, self.ledger)
+        except ValueError as error:
+            self.forecast_status_label.text = str(error)
+            return
+
+        names = {row[0]: row[1] for row in self.accounts_list}
+        overdrawn = {}
+        for account_id, first, _, _ in projection.shortfalls():
+            overdrawn.setdefault(account_id, first)
+        lowest = projection.lowest()
+        lowest_texts = self.money.format_many([balance for _, _, balance in lowest])
+        rows = []
+        for (account_id, day, _), lowest_text in zip(lowest, lowest_texts):
+            rows.append(
+                {
+                    "account_id": account_id,
+                    "account": names.get(account_id, ""),
+                    "lowest": lowest_text,
+                    "lowest_on": dates.to_date(day).strftime(dates.DATE_FORMAT),
+                    "overdrawn": (
+                        dates.to_date(overdrawn[account_id]).strftime(dates.DATE_FORMAT)
+                        if account_id in overdrawn
+                        else ""
+                    ),
+                }
+            )
+        patch_rows(self.forecast_source, rows, "account_id")
+        self.forecast_status_label.text = (
+            f"{len(overdrawn)} account(s) go below zero" if overdrawn else "No account goes below zero"
         )
+
+    async def forecast_horizon_change_callback(self, widget):
+        await self.update_forecast()
+
+    async def show_pivot_window(self, widget):
+        if self.pivot_view is None:
+            self.pivot_view = self.build_pivot_view()
+        await self.update_pivot()
+        self.show_view(self.pivot_view)
+
+    def build_pivot_view(self):
+        pivot_box = toga.Box(style=Pack(direction=COLUMN, padding=10))
+        period_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        self.pivot_period_selection = toga.Selection(
+            items=list(PIVOT_PERIODS),
+            on_change=self.pivot_period_change_callback,
+            style=Pack(width=150),
+        )
+        period_box.add(toga.Label("Spending over"), self.pivot_period_selection)
+        pivot_box.add(period_box)
+        # The table is made by update_pivot, since its columns are the months shown.
+        self.pivot_table_container = toga.Box(style=Pack(direction=COLUMN, flex=1))
+        pivot_box.add(self.pivot_table_container)
+        self.pivot_headings = None
+        self.pivot_rows = None
+        return pivot_box
+
+    @timed
+    async def update_pivot(self):
+        await self.writes.flush()
+        months = PIVOT_PERIODS[self.pivot_period_selection.value]
+        first_month = pivot.month_number(datetime.date.today()) - months + 1
+        rows = await self.db.read(self.pivot_cache.get, first_month, months)
+        headings = [pivot.month_label(first_month + index) for index in range(months)]
+        if headings != self.pivot_headings:
+            # A new period, or a new month: the columns change, so a new table.
+            month_accessors = [f"month_{index}" for index in range(months)]
+            accessors = ["budget_category", "spending_category"] + month_accessors + ["total"]
+            self.pivot_source = ListSource(accessors=accessors, data=[])
+            self.pivot_table_container.clear()
+            self.pivot_table_container.add(
+                toga.Table(
+                    headings=["Budget Category", "Spending Category"] + headings + ["Total"],
+                    accessors=accessors,
+                    data=self.pivot_source,
+                    style=Pack(flex=1),
+                )
+            )
+            self.pivot_headings = headings
+        elif rows is self.pivot_rows:
+            # Served from the cache: nothing has changed since the last time.
+            return
+        self.pivot_rows = rows
+
+        texts = iter(self.money.format_many([amount for row in rows for amount in row[2:]]))
+        table_rows = []
+        for budget_name, spending_name, *amounts in rows:
+            data = {
+                "key": (budget_name, spending_name),
+                "budget_category": budget_name,
+                "spending_category": spending_name,
+            }
+            for index in range(months):
+                data[f"month_{index}"] = next(texts)
+            data["total"] = next(texts)
+            table_rows.append(data)
+        patch_rows(self.pivot_source, table_rows, "key")
+
+    async def pivot_period_change_callback(self, widget):
+        await self.update_pivot()
+
+    @timed
+    async def show_main_window(self):
+        """Show the account and transaction lists, bringing them up to date."""
+        await self.writes.flush()
+        await self.change_watcher.check()
+        logger.debug("Showing main window")
+        await self.build_desktop_account_list()
+        await self.build_desktop_transaction_list()
+        self.show_view(self.main_split)
+
+    async def load_reference_data(self):
+        """Make sure accounts and categories are cached, reading only what is missing."""
+        if not self.reference.loaded():
+            await self.db.read(self.reference.load)
+        self.accounts_list = self.reference.accounts
+        self.budget_category_list = self.reference.budget_categories
+        self.spending_category_list = self.reference.spending_categories
+
+    async def get_budget_category_list(self):
         self.budget_category_rows = []
-        self.budget_category_list = categories_res.fetchall()
+        await self.load_reference_data()
         for row in self.budget_category_list:
             data = {
                 "subtitle": row[1],
             }
             self.budget_category_rows.append(data)
-        budget_cur.close()
 
-    def get_spending_category_list(self):
-        spending_cur = self.con.cursor()
-        spending_categories_res = spending_cur.execute(
-            "SELECT id, name, parent_category_id FROM spending_categories ORDER BY Name"
-        )
+    async def get_spending_category_list(self):
         self.spending_category_rows = []
-        self.spending_category_list = spending_categories_res.fetchall()
+        await self.load_reference_data()
         for row in self.spending_category_list:
             data = {
                 "subtitle": row[1],
             }
             self.spending_category_rows.append(data)
-        spending_cur.close()
 
 
-    def get_all_categories_data(self):
-        categories_cur = self.con.cursor()
-        categories_res = categories_cur.execute("SELECT b.name as budget_category_name, s.name as spending_category_name FROM budget_categories b LEFT JOIN spending_categories s ON s.parent_category_id =  b.id")
-        self.all_categories = categories_res.fetchall()
-        self.all_categories_rows = []
-        for row in self.all_categories:
-            data = (row[0], row[1])
-            self.all_categories_rows.append(data)
-        categories_cur.close()
+    async def get_all_categories_data(self):
+        rollup_rows = await self.db.read(self.category_rollups.get)
+        if rollup_rows is self.all_categories:
+            # Nothing has changed since the table rows were last formatted.
+            return
+        self.all_categories = rollup_rows
+        self.all_categories_rows = self.category_rows_data(rollup_rows)
+
+    def category_rows_data(self, rollup_rows):
+        rows = []
+        spent_texts = self.money.format_many([row[3] for row in rollup_rows])
+        for (budget_name, spending_name, remaining, spent), spent_text in zip(rollup_rows, spent_texts):
+            data = {
+                "key": (budget_name, spending_name),
+                "budget_category": budget_name,
+                "spending_category": spending_name,
+                "amount_remaining": "" if remaining is None else self.money.format(remaining),
+                "amount_spent": spent_text,
+            }
+            rows.append(data)
+        return rows
 
 
+    @timed
     def show_add_account_window(self, widget):
+        if self.add_account_view is None:
+            self.add_account_view = self.build_add_account_view()
+        self.account_name_input.value = ""
+        self.show_view(self.add_account_view)
+
+    def build_add_account_view(self):
         add_account_box = toga.Box(style=Pack(direction=COLUMN, padding=10))
         add_account_box.add(toga.Label("Add Account:"))
         account_name_box = toga.Box(style=Pack(direction=ROW, padding=5))
@@ -210,109 +669,125 @@ class SQLTest(toga.App):
             "Add Account", on_press=self.add_account_callback, style=Pack(width=200)
         )
         add_account_box.add(add_account_button)
-        self.main_window.content = add_account_box
-
-    def show_budgets_window(self, widget):
-        budgets_box = toga.Box(style=Pack(direction=COLUMN, padding=10))
-        budgets_box.add(toga.Label("Fund Budgets:"))
-        self.get_budget_category_list()
-        self.budget_date_inputs = []
-        self.budget_amount_inputs = []
-        self.budget_id_inputs = []
+        return add_account_box
+
+    @timed
+    async def show_budgets_window(self, widget):
+        await self.writes.flush()
+        await self.get_budget_category_list()
+        if self.budgets_view is None:
+            budgets_box = toga.Box(style=Pack(direction=COLUMN, padding=10))
+            budgets_box.add(toga.Label("Fund Budgets:"))
+            # One row box per budget category, keyed by category id.
+            self.budget_rows_box = toga.Box(style=Pack(direction=COLUMN))
+            self.budget_inputs = {}
+            budgets_box.add(self.budget_rows_box)
+
+            budget_months_box = toga.Box(style=Pack(direction=ROW, padding=5))
+            budget_months_box.add(toga.Label("Apply to months:", style=Pack(flex=1)))
+            self.budget_months_input = toga.NumberInput(step=1, min=1, max=120, value=1, style=Pack(flex=1))
+            budget_months_box.add(self.budget_months_input)
+            budgets_box.add(budget_months_box)
+
+            update_budget_button = toga.Button(
+                "Update Budget", on_press=self.update_budget_callback, style=Pack(width=200)
+            )
+            budgets_box.add(update_budget_button)
+            self.budgets_view = budgets_box
+        self.update_budget_rows()
+        self.show_view(self.budgets_view)
+
+    def update_budget_rows(self):
+        """Add rows for new budget categories and drop rows for removed ones."""
+        category_ids = set(row[0] for row in self.budget_category_list)
+        for budget_category_id in list(self.budget_inputs):
+            if budget_category_id not in category_ids:
+                row_box = self.budget_inputs.pop(budget_category_id)[0]
+                self.budget_rows_box.remove(row_box)
+
+        for row_number, row in enumerate(self.budget_category_list):
+            if row[0] in self.budget_inputs:
+                continue
+            logger.debug('Adding budget row %s', row_number)
+            row_box = toga.Box(style=Pack(direction=COLUMN))
+            row_box.add(toga.Label(row[1]))
 
-        row_number = 0
-        for row in self.budget_category_list:
-            print(f'Adding row number {row_number}')
-            budgets_box.add(toga.Label(row[1]))
-            
             budget_date_box = toga.Box(style=Pack(direction=ROW, padding=5))
             budget_date_box.add(toga.Label("Date:", style=Pack(flex=1)))
-            self.budget_date_inputs.append(toga.TextInput(style=Pack(flex=1)))
-            budget_date_box.add(self.budget_date_inputs[row_number])
+            budget_date_input = toga.TextInput(style=Pack(flex=1))
+            budget_date_box.add(budget_date_input)
 
-            self.budget_amount_inputs.append(toga.NumberInput(step=0.01, style=Pack(flex=1)))
+            budget_amount_input = toga.NumberInput(step=0.01, style=Pack(flex=1))
             budget_amount_box = toga.Box(style=Pack(direction=ROW, padding=5))
             budget_amount_box.add(toga.Label("Amount:", style=Pack(flex=1)))
-            budget_amount_box.add(self.budget_amount_inputs[row_number])
+            budget_amount_box.add(budget_amount_input)
 
-            self.budget_id_inputs.append(toga.NumberInput(step=1, style=Pack(visibility=HIDDEN, width=0, height=0)))
-            self.budget_id_inputs[row_number].value = row[0]
-            budgets_box.add(self.budget_id_inputs[row_number])
+            row_box.add(budget_date_box, budget_amount_box)
+            self.budget_rows_box.insert(row_number, row_box)
+            self.budget_inputs[row[0]] = (row_box, budget_date_input, budget_amount_input)
 
-            budgets_box.add(budget_date_box, budget_amount_box)
-            row_number = row_number+1
-        
-        update_budget_button = toga.Button(
-            "Update Budget", on_press=self.update_budget_callback, style=Pack(width=200)
-        )
-        budgets_box.add(update_budget_button)
-        
-        self.main_window.content = budgets_box
 
+    @timed
+    async def update_budget_callback(self, widget):
+        logger.debug("Updating budget categories")
 
-    def update_budget_callback(self, widget):
-        print("Updating budget categories:")
+        funding_entries = []
+        for budget_category_id, (row_box, budget_date_input, budget_amount_input) in self.budget_inputs.items():
+            if budget_date_input.value and budget_amount_input.value:
+                logger.debug('Funding budget category %s', budget_category_id)
+                funding_entries.append(
+                    (budget_category_id, budget_date_input.value, money.to_minor(budget_amount_input.value))
+                )
+        months = int(self.budget_months_input.value or 1)
+        try:
+            funding_rows = budgets.funding_rows(funding_entries, months)
+        except ValueError as error:
+            self.main_window.error_dialog("Update Budget", f"Could not read the dates (use mm/dd/yyyy): {error}")
+            return
+        # Every category and month of the submission goes in one write.
+        await self.writes.submit(budgets.set_funding, funding_rows)
 
-        row_number = -1
-        sql_statement = 'insert into budget_transactions (amount, date) values (?, ?)'
+        for row_box, budget_date_input, budget_amount_input in self.budget_inputs.values():
+            budget_date_input.value = ""
+            budget_amount_input.value = None
 
-        budget_update_cur = self.con.cursor()
-        for row in self.budget_category_list:
-            row_number = row_number + 1
-            print(f'update for {row} {row_number}: {self.budget_date_inputs[row_number].value} {self.budget_amount_inputs[row_number].value}')
-            if self.budget_date_inputs[row_number].value and self.budget_amount_inputs[row_number].value:
-                print(f'Updating budget... {self.budget_id_inputs[row_number].value}')
-                transaction_datetime = time.mktime(
-                    datetime.datetime.strptime(
-                        self.budget_date_inputs[row_number].value, "%m/%d/%Y").timetuple())
-                transaction_amount = int(self.budget_amount_inputs[row_number].value)
-                budget_update_cur.execute(sql_statement, [transaction_datetime, transaction_amount])
-        self.con.commit()
-
-        #spending_categories_cur = self.con.cursor()
-        #sql_statement = (
-        #    "INSERT INTO spending_categories (name, parent_category_id) values (?, ?)"
-        #)
-        #category_name = self.spending_category_name_input.value
-        #parent_category_id = self.parent_budget_category_selection.value.id
-        #print(
-        #    f"Running SQL statement {sql_statement} with value {category_name} and {parent_category_id}"
-        #)
-        # TODO: get this using proper id's. If you only pass in one arg and it's a string, Python/sqlite interpret this as a list of chars.
-        # wrapping the variable in [] fixes this.
-        # See: https://techoverflow.net/2019/10/14/how-to-fix-sqlite3-python-incorrect-number-of-bindings-supplied-the-current-statement-uses-1-supplied/
-        #spending_categories_cur.execute(
-        #    sql_statement, ([category_name, parent_category_id])
-        #)
-        #self.con.commit()
-        self.show_budgets_window(widget)
-
-
-    def add_account_to_db(self):
-        account_cur = self.con.cursor()
-        sql_statement = f"INSERT INTO accounts (name, account_type) values (?, ?)"
-        print(
-            f"Running {sql_statement} with values {self.account_name_input.value} and {self.account_type_selection.value.name}"
-        )
-        account_cur.execute(
-            sql_statement,
-            (self.account_name_input.value, self.account_type_selection.value.name),
-        )
-        self.con.commit()
-
-    def add_account_callback(self, widget):
-        self.add_account_to_db()
-        self.build_desktop_account_list()
-        split = toga.SplitContainer(
-            content=[self.account_list_container, self.transaction_container]
+
+    async def add_account_to_db(self):
+        logger.info(
+            "Adding account %s of type %s", self.account_name_input.value, self.account_type_selection.value.name
+        )
+        await self.writes.submit(
+            queries.add_account,
+            self.account_name_input.value,
+            self.account_type_selection.value.name,
         )
 
-        self.main_window.content = split
+    @timed
+    async def add_account_callback(self, widget):
+        await self.add_account_to_db()
+        await self.change_watcher.check()
+        self.show_view(self.main_split)
+
+    @timed
+    async def show_categories_window(self, widget):
+        await self.writes.flush()
+        if self.categories_view is None:
+            self.categories_view = self.build_categories_view()
+        await self.update_categories_view()
+        self.show_view(self.categories_view)
+
+    async def update_categories_view(self):
+        await self.get_budget_category_list()
+        await self.get_spending_category_list()
+        await self.get_all_categories_data()
+        patch_rows(
+            self.parent_budget_category_source,
+            [{"name": row[1], "id": row[0]} for row in self.budget_category_list],
+            "id",
+        )
+        patch_rows(self.category_table_source, self.all_categories_rows, "key")
 
-    def show_categories_window(self, widget):
-        self.get_budget_category_list()
-        self.get_spending_category_list()
-        self.get_all_categories_data()
+    def build_categories_view(self):
         categories_box = toga.Box(style=Pack(direction=COLUMN, padding=10))
         categories_box.add(toga.Label("Add Category:"))
         categories_box.add(toga.Label("Category Name:"))
@@ -327,14 +802,9 @@ class SQLTest(toga.App):
 
         categories_box.add(toga.Label("Add Spending Category:"))
 
-        budget_list_options = ListSource(accessors=["name", "id"], data=[])
-
-        for row in self.budget_category_list:
-            data = {"name": row[1], "id": row[0]}
-            budget_list_options.append(data)
-
+        self.parent_budget_category_source = ListSource(accessors=["name", "id"], data=[])
         self.parent_budget_category_selection = toga.Selection(
-            items=budget_list_options, accessor="name"
+            items=self.parent_budget_category_source, accessor="name"
         )
 
         categories_box.add(toga.Label("Parent Budget Category:"))
@@ -352,68 +822,210 @@ class SQLTest(toga.App):
         )
         categories_box.add(add_spending_category_button)
 
+        category_accessors = ["budget_category", "spending_category", "amount_remaining", "amount_spent"]
+        self.category_table_source = ListSource(accessors=category_accessors, data=[])
         category_tree = toga.Table(
             headings=["Budget Category", "Spending Category", "Amount Remaining", "Amount Spent"],
+            accessors=category_accessors,
             style=Pack(height=500),
-            data=self.all_categories_rows
+            data=self.category_table_source
         )
         categories_box.add(category_tree)
-        self.main_window.content = categories_box
+        return categories_box
 
 
-    def add_category_callback(self, widget):
-        print("Adding category:")
-        categories_cur = self.con.cursor()
-        sql_statement = "INSERT INTO budget_categories (name) values (?)"
+    @timed
+    async def add_category_callback(self, widget):
         category_name = self.category_name_input.value
-        print(f"Running SQL statement {sql_statement} with value {category_name}")
-        # TODO: get this using proper id's. If you only pass in one arg and it's a string, Python/sqlite interpret this as a list of chars.
-        # wrapping the variable in [] fixes this.
-        # See: https://techoverflow.net/2019/10/14/how-to-fix-sqlite3-python-incorrect-number-of-bindings-supplied-the-current-statement-uses-1-supplied/
-        categories_cur.execute(sql_statement, ([category_name]))
-        self.con.commit()
-        self.show_categories_window(widget)
-
-    def add_spending_category_callback(self, widget):
-        print("Adding spending category:")
-        spending_categories_cur = self.con.cursor()
-        sql_statement = (
-            "INSERT INTO spending_categories (name, parent_category_id) values (?, ?)"
-        )
+        logger.info("Adding budget category %s", category_name)
+        await self.writes.submit(queries.add_budget_category, category_name)
+        self.category_name_input.value = ""
+        # The categories view and the budgets view pick the new row up.
+        await self.change_watcher.check()
+
+    @timed
+    async def add_spending_category_callback(self, widget):
         category_name = self.spending_category_name_input.value
         parent_category_id = self.parent_budget_category_selection.value.id
-        print(
-            f"Running SQL statement {sql_statement} with value {category_name} and {parent_category_id}"
-        )
-        # TODO: get this using proper id's. If you only pass in one arg and it's a string, Python/sqlite interpret this as a list of chars.
-        # wrapping the variable in [] fixes this.
-        # See: https://techoverflow.net/2019/10/14/how-to-fix-sqlite3-python-incorrect-number-of-bindings-supplied-the-current-statement-uses-1-supplied/
-        spending_categories_cur.execute(
-            sql_statement, ([category_name, parent_category_id])
-        )
-        self.con.commit()
-        self.show_categories_window(widget)
+        logger.info("Adding spending category %s under %s", category_name, parent_category_id)
+        await self.writes.submit(queries.add_spending_category, category_name, parent_category_id)
+        self.spending_category_name_input.value = ""
+        await self.change_watcher.check()
 
 
+    @timed
     def update_available_spending_categories_callback(self, widget):
         self.update_available_spending_categories()
 
 
     def update_available_spending_categories(self):
-        spending_list_options = ListSource(accessors=["name", "id"], data=[{"name": "None", "id": 0}])
-        print(f"Budget category: {self.transaction_budget_selection.value.budget_category_id}")
-        print(f"Spending category list: {self.spending_category_list}")
-        for row in self.spending_category_list:
-            if row[2] and row[2] == self.transaction_budget_selection.value.budget_category_id:
-                data = {"name": row[1], "id": row[0]}
-                print(f"spending category: {data}")
-                spending_list_options.append(data)
-        print(f"Spending list options is now {spending_list_options}")
-        self.transaction_spending_selection.items = spending_list_options
-#        self.transaction_spending_selection.items = [{"name": self.transaction_budget_selection.value.name, "id": 42}]
+        budget_category_id = self.transaction_budget_selection.value.budget_category_id
+        patch_rows(
+            self.spending_list_options,
+            [{"name": "None", "id": 0}]
+            + [{"name": row[1], "id": row[0]} for row in self.reference.children(budget_category_id)],
+            "id",
+        )
 
 
-    def show_add_transaction_window(self, widget):
+    @timed
+    async def show_import_window(self, widget):
+        await self.load_reference_data()
+        if self.import_view is None:
+            self.import_view = self.build_import_view()
+        patch_rows(
+            self.import_account_source,
+            [{"name": row[1], "account_id": row[0]} for row in self.accounts_list],
+            "account_id",
+        )
+        self.import_status_label.text = ""
+        self.show_view(self.import_view)
+
+    def build_import_view(self):
+        import_box = toga.Box(style=Pack(direction=COLUMN, padding=10))
+        import_box.add(toga.Label("Import Statement (CSV, OFX, QFX or QIF):"))
+
+        self.import_account_source = ListSource(accessors=["name", "account_id"], data=[])
+        self.import_account_selection = toga.Selection(
+            items=self.import_account_source, accessor="name", style=Pack(flex=1)
+        )
+        import_account_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        import_account_box.add(toga.Label("Account:", style=Pack(flex=1)))
+        import_account_box.add(self.import_account_selection)
+        import_box.add(import_account_box)
+
+        import_button = toga.Button(
+            "Choose Statement...", on_press=self.import_statement_callback, style=Pack(width=200)
+        )
+        import_box.add(import_button)
+        self.import_status_label = toga.Label("")
+        import_box.add(self.import_status_label)
+        return import_box
+
+    @timed
+    async def import_statement_callback(self, widget):
+        path = await self.main_window.open_file_dialog(
+            "Import Statement", file_types=["csv", "ofx", "qfx", "qif"]
+        )
+        if path is None:
+            return
+        account_id = self.import_account_selection.value.account_id
+        self.import_status_label.text = f"Importing {path.name}..."
+        try:
+            result = await self.db.run(importers.import_statement, path, account_id)
+        except ValueError as error:
+            self.import_status_label.text = f"Could not import {path.name}: {error}"
+            return
+        self.import_status_label.text = (
+            f"Imported {result.inserted} of {result.read} transactions from {path.name}"
+            f" ({result.skipped} already imported)"
+        )
+        await self.change_watcher.check()
+
+    @timed
+    async def show_export_window(self, widget):
+        await self.load_reference_data()
+        if self.export_view is None:
+            self.export_view = self.build_export_view()
+        patch_rows(
+            self.export_account_source,
+            [{"name": "All accounts", "account_id": None}]
+            + [{"name": row[1], "account_id": row[0]} for row in self.accounts_list],
+            "account_id",
+        )
+        self.export_status_label.text = ""
+        self.show_view(self.export_view)
+
+    def build_export_view(self):
+        export_box = toga.Box(style=Pack(direction=COLUMN, padding=10))
+        export_box.add(toga.Label("Export Transactions:"))
+
+        export_start_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        export_start_box.add(toga.Label("From (mm/dd/yyyy):", style=Pack(flex=1)))
+        self.export_start_input = toga.TextInput(placeholder="Any date", style=Pack(flex=1))
+        export_start_box.add(self.export_start_input)
+
+        export_end_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        export_end_box.add(toga.Label("To (mm/dd/yyyy):", style=Pack(flex=1)))
+        self.export_end_input = toga.TextInput(placeholder="Any date", style=Pack(flex=1))
+        export_end_box.add(self.export_end_input)
+
+        self.export_account_source = ListSource(accessors=["name", "account_id"], data=[])
+        self.export_account_selection = toga.Selection(
+            items=self.export_account_source, accessor="name", style=Pack(flex=1)
+        )
+        export_account_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        export_account_box.add(toga.Label("Account:", style=Pack(flex=1)))
+        export_account_box.add(self.export_account_selection)
+
+        export_box.add(export_start_box, export_end_box, export_account_box)
+        export_button = toga.Button(
+            "Export...", on_press=self.export_ledger_callback, style=Pack(width=200)
+        )
+        export_box.add(export_button)
+        self.export_status_label = toga.Label("")
+        export_box.add(self.export_status_label)
+        return export_box
+
+    @timed
+    async def export_ledger_callback(self, widget):
+        try:
+            start = end = None
+            if self.export_start_input.value:
+                start = datetime.datetime.strptime(self.export_start_input.value, "%m/%d/%Y").date()
+            if self.export_end_input.value:
+                end = datetime.datetime.strptime(self.export_end_input.value, "%m/%d/%Y").date()
+        except ValueError as error:
+            self.export_status_label.text = f"Could not read the dates: {error}"
+            return
+        account_id = self.export_account_selection.value.account_id
+        export_filter = exporter.ExportFilter(
+            start=start, end=end, account_ids=None if account_id is None else [account_id]
+        )
+
+        path = await self.main_window.save_file_dialog(
+            "Export Transactions",
+            suggested_filename="transactions.csv",
+            file_types=exporter.available_formats(),
+        )
+        if path is None:
+            return
+        self.export_status_label.text = f"Exporting to {path.name}..."
+        try:
+            count = await self.db.read(exporter.export_ledger, path, export_filter)
+        except ValueError as error:
+            self.export_status_label.text = f"Could not export: {error}"
+            return
+        self.export_status_label.text = f"Exported {count} transactions to {path.name}"
+
+    @timed
+    async def show_add_transaction_window(self, widget):
+        await self.writes.flush()
+        await self.load_reference_data()
+        if self.add_transaction_view is None:
+            self.add_transaction_view = self.build_add_transaction_view()
+        account_rows = [{"name": row[1], "account_id": row[0]} for row in self.accounts_list]
+        patch_rows(self.transaction_account_source, account_rows, "account_id")
+        patch_rows(
+            self.transfer_account_source, [{"name": "None", "account_id": None}] + account_rows, "account_id"
+        )
+        patch_rows(
+            self.transaction_budget_source,
+            [{"name": row[1], "budget_category_id": row[0]} for row in self.budget_category_list],
+            "budget_category_id",
+        )
+        self.update_available_spending_categories()
+        for text_input in (
+            self.transaction_date_input,
+            self.transaction_merchant_input,
+            self.transaction_description_input,
+            self.transaction_notes_input,
+        ):
+            text_input.value = ""
+        self.transaction_amount_input.value = None
+        self.show_view(self.add_transaction_view)
+
+    def build_add_transaction_view(self):
         transaction_box = toga.Box(style=Pack(direction=COLUMN, padding=10))
         transaction_box.add(toga.Label("Add Transaction:"))
 
@@ -448,18 +1060,10 @@ class SQLTest(toga.App):
         )
         transaction_type_box.add(self.transaction_type_selection)
 
-        self.transaction_transfer_account_box = toga.Box(style=Pack(direction=ROW, padding=5))
-        
-        account_list_options = ListSource(accessors=["name", "account_id"], data=[])
-
-        for row in self.accounts_list:
-            data = {"name": row[1], "account_id": row[0]}
-            account_list_options.append(data)
-
+        self.transaction_account_source = ListSource(accessors=["name", "account_id"], data=[])
         self.transaction_account_selection = toga.Selection(
-            items=account_list_options, accessor="name", style=Pack(flex=1)
+            items=self.transaction_account_source, accessor="name", style=Pack(flex=1)
         )
-
         transaction_account_box = toga.Box(style=Pack(direction=ROW, padding=5))
         transaction_account_box.add(toga.Label("Account:", style=Pack(flex=1)))
         transaction_account_box.add(self.transaction_account_selection)
@@ -478,51 +1082,42 @@ class SQLTest(toga.App):
         transaction_notes_box.add(toga.Label("Notes:", style=Pack(flex=1)))
         transaction_notes_box.add(self.transaction_notes_input)
 
-        self.transaction_category_input = toga.TextInput(
-            placeholder="Category", style=Pack(flex=1)
-        )
-        transaction_category_box = toga.Box(style=Pack(direction=ROW, padding=5))
-
-        cur = self.con.cursor()
-        categories_res = cur.execute(
-            "SELECT id, name FROM budget_categories ORDER BY Name"
-        )
-        self.budget_category_list = categories_res.fetchall()
-
-        self.get_spending_category_list()
-
-        budget_list_options = ListSource(
-            accessors=["name", "budget_category_id"], data=[]
-        )
-
-        for row in self.budget_category_list:
-            data = {"name": row[1], "budget_category_id": row[0]}
-            budget_list_options.append(data)
-
-        self.spending_list_options = ListSource(accessors=["name", "id"], data=[{"name": "None", "id": 0}])
-
+        self.transaction_budget_source = ListSource(accessors=["name", "budget_category_id"], data=[])
         self.transaction_budget_selection = toga.Selection(
-            items=budget_list_options, accessor="name", on_change=self.update_available_spending_categories_callback, style=Pack(flex=1)
+            items=self.transaction_budget_source,
+            accessor="name",
+            on_change=self.update_available_spending_categories_callback,
+            style=Pack(flex=1),
         )
-
+        transaction_category_box = toga.Box(style=Pack(direction=ROW, padding=5))
         transaction_category_box.add(toga.Label("Budget Category:", style=Pack(flex=1)))
         transaction_category_box.add(self.transaction_budget_selection)
-    
-        transaction_spending_category_box = toga.Box(style=Pack(direction=ROW, padding=5))
 
+        self.spending_list_options = ListSource(accessors=["name", "id"], data=[])
         self.transaction_spending_selection = toga.Selection(
             items=self.spending_list_options, accessor="name", style=Pack(flex=1)
         )
-
-        self.update_available_spending_categories() #Populate initial spending category list based on initial budget category
-
+        transaction_spending_category_box = toga.Box(style=Pack(direction=ROW, padding=5))
         transaction_spending_category_box.add(toga.Label("Spending Category:", style=Pack(flex=1)))
         transaction_spending_category_box.add(self.transaction_spending_selection)
 
+        # Shown only while the type is Transfer.
+        self.transfer_account_source = ListSource(accessors=["name", "account_id"], data=[])
+        self.transfer_account_selection = toga.Selection(
+            items=self.transfer_account_source, accessor="name", style=Pack(flex=1)
+        )
+        self.transaction_transfer_account_box = toga.Box(style=Pack(direction=ROW, padding=5, visibility=HIDDEN))
+        self.transaction_transfer_account_box.add(toga.Label("Transfer to:", style=Pack(flex=1)))
+        self.transaction_transfer_account_box.add(self.transfer_account_selection)
+
+        transaction_repeat_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        transaction_repeat_box.add(toga.Label("Repeats:", style=Pack(flex=1)))
+        self.transaction_repeat_selection = toga.Selection(items=list(REPEATS), style=Pack(flex=1))
+        transaction_repeat_box.add(self.transaction_repeat_selection)
+
         transaction_box.add(
             transaction_date_box,
             transaction_amount_box,
-            transaction_merchant_box,
             transaction_type_box,
             transaction_account_box,
             transaction_merchant_box,
@@ -530,7 +1125,8 @@ class SQLTest(toga.App):
             transaction_notes_box,
             transaction_category_box,
             transaction_spending_category_box,
-            self.transaction_transfer_account_box
+            self.transaction_transfer_account_box,
+            transaction_repeat_box,
         )
 
         add_transaction_button = toga.Button(
@@ -539,246 +1135,352 @@ class SQLTest(toga.App):
             style=Pack(width=200),
         )
         transaction_box.add(add_transaction_button)
-        self.main_window.content = transaction_box
-
+        return transaction_box
 
+    @timed
     def transaction_type_change_callback(self, widget):
-        # TODO: Show/Hide this as needed.
-        #if self.transaction_type_selection.value.name == 'transfer':
-            account_list_options = ListSource(accessors=["name", "account_id"], data=[{"name": "None", "account_id": None}])
-
-            for row in self.accounts_list:
-                data = {"name": row[1], "account_id": row[0]}
-                account_list_options.append(data)
-
-            self.transfer_account_selection = toga.Selection(
-                items=account_list_options, accessor="name", style=Pack(flex=1)
-            )
+        transfer = self.transaction_type_selection.value.name == "Transfer"
+        self.transaction_transfer_account_box.style.visibility = VISIBLE if transfer else HIDDEN
 
-            self.transaction_transfer_account_box.add(toga.Label("Account:", style=Pack(flex=1)))
-            self.transaction_transfer_account_box.add(self.transfer_account_selection)
-        #else:
-        #    self.transaction_transfer_account_box = None
 
-
-    def add_transaction_callback(self, widget):
-        print("Adding transaction:")
-        trans_cur = self.con.cursor()
-        sql_statement = f"INSERT INTO transactions (date, transaction_type, amount, account_id, merchant, description, notes, budget_category_id, spending_category_id, transfer_account_id) values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
-
-        transaction_datetime = time.mktime(
-            datetime.datetime.strptime(
-                self.transaction_date_input.value, "%m/%d/%Y"
-            ).timetuple()
-        )
-        print(f"transaction type: {self.transaction_type_selection.value}")
-        print(
-            f"Running {sql_statement} with values {transaction_datetime} and {int(self.transaction_amount_input.value)}"
-        )
+    @timed
+    async def add_transaction_callback(self, widget):
+        try:
+            transaction_day = dates.parse_day(self.transaction_date_input.value)
+        except ValueError as error:
+            self.main_window.error_dialog("Add Transaction", f"Could not read the date (use mm/dd/yyyy): {error}")
+            return
+        try:
+            amount = money.to_minor(self.transaction_amount_input.value)
+        except ValueError as error:
+            self.main_window.error_dialog("Add Transaction", f"Could not read the amount: {error}")
+            return
         transfer_account_id = None
         if self.transaction_type_selection.value.name == 'Transfer':
             transfer_account_id = self.transfer_account_selection.value.account_id
-        trans_cur.execute(
-            sql_statement,
-            (
-                transaction_datetime,
+            if transfer_account_id is None:
+                self.main_window.error_dialog("Add Transaction", "Choose the account to transfer to.")
+                return
+            if transfer_account_id == self.transaction_account_selection.value.account_id:
+                self.main_window.error_dialog("Add Transaction", "A transfer needs two different accounts.")
+                return
+        logger.debug(
+            "Adding %s transaction dated %s for %s",
+            self.transaction_type_selection.value.name,
+            self.transaction_date_input.value,
+            self.transaction_amount_input.value,
+        )
+        values = (
+            transaction_day,
+            self.transaction_type_selection.value.name,
+            amount,
+            int(self.transaction_account_selection.value.account_id),
+            self.transaction_merchant_input.value,
+            self.transaction_description_input.value,
+            self.transaction_notes_input.value,
+            self.transaction_budget_selection.value.budget_category_id,
+            self.transaction_spending_selection.value.id,
+            transfer_account_id
+        )
+        transfer_values = None
+        if self.transaction_type_selection.value.name == 'Transfer':
+            transfer_values = (
+                transaction_day,
                 self.transaction_type_selection.value.name,
-                int(self.transaction_amount_input.value),
-                int(self.transaction_account_selection.value.account_id),
+                -amount,
+                transfer_account_id,
                 self.transaction_merchant_input.value,
                 self.transaction_description_input.value,
                 self.transaction_notes_input.value,
                 self.transaction_budget_selection.value.budget_category_id,
                 self.transaction_spending_selection.value.id,
-                transfer_account_id
-            ),
-        )
-        if self.transaction_type_selection.value.name == 'Transfer':
-            print("Current transaction is a transfer. Creating other side of transfer")
-            trans_cur.execute(
-                sql_statement,
-                (
-                    transaction_datetime,
-                    self.transaction_type_selection.value.name,
-                    -int(self.transaction_amount_input.value),
-                    transfer_account_id,
-                    self.transaction_merchant_input.value,
-                    self.transaction_description_input.value,
-                    self.transaction_notes_input.value,
-                    self.transaction_budget_selection.value.budget_category_id,
-                    self.transaction_spending_selection.value.id,
-                    int(self.transaction_account_selection.value.account_id)
-                ),
+                int(self.transaction_account_selection.value.account_id)
             )
-            print("Other side of transfer created")
-        self.con.commit()
+        repeats = REPEATS[self.transaction_repeat_selection.value]
+        if repeats is not None:
+            # The rule posts this first occurrence too, once its date comes;
+            # the rule and anything already due commit together.
+            frequency, interval = repeats
+
+            def add_repeating(con):
+                recurring.add_rule(
+                    con,
+                    values[3],
+                    amount,
+                    frequency,
+                    transaction_day,
+                    interval=interval,
+                    transaction_type=values[1],
+                    merchant=values[4],
+                    description=values[5],
+                    notes=values[6],
+                    budget_category_id=values[7],
+                    spending_category_id=values[8],
+                    transfer_account_id=transfer_account_id,
+                )
+                return recurring.post_due(con)
+
+            await self.writes.submit(add_repeating)
+        else:
+            # Both sides of a transfer are one queued write, so they are
+            # committed (or rolled back) together.
+            await self.writes.submit(queries.add_transaction, values, transfer_values)
+
+    @timed
+    async def build_desktop_account_list(self):
+        await self.load_reference_data()
+        rows = self.account_rows_data(self.accounts_list)
+        if self.account_source is not None:
+            patch_rows(self.account_source, rows, "account_id")
+            return
 
+        # display table
+        self.account_source = ListSource(accessors=["title", "subtitle", "account_id"], data=rows)
+        table = toga.DetailedList(
+            data=self.account_source,
+            style=Pack(flex=1),
+        )
+        self.account_list_container.clear()
+        self.account_list_container.add(table)
 
-    def build_desktop_account_list(self):
-        cur = self.con.cursor()
-        accounts_res = cur.execute("SELECT id, name FROM accounts ORDER BY Name")
+    def account_rows_data(self, accounts):
         rows = []
-        self.accounts_list = accounts_res.fetchall()
-        for row in self.accounts_list:
+        balance_texts = self.money.format_many([row[2] for row in accounts])
+        for row, balance_text in zip(accounts, balance_texts):
             data = {
-                "subtitle": row[1],
+                "account_id": row[0],
+                "title": row[1],
+                "subtitle": balance_text,
             }
             rows.append(data)
-        cur.close()
+        return rows
+
+    @timed
+    async def build_desktop_transaction_list(self):
+        if self.transaction_source is not None:
+            if self.pending_transaction_changes:
+                changed, self.pending_transaction_changes = self.pending_transaction_changes, []
+                await self.refresh_transaction_rows(changed)
+            return
+
+        self.transaction_pager = TransactionPager()
+        self.transaction_page_pending = False
+        # Held while rows are read and put in the list, so a page load and
+        # a refresh never place the same row twice.
+        self.transaction_list_lock = asyncio.Lock()
+        self.transaction_source = PagedListSource(
+            accessors=["title", "subtitle", "id"],
+            on_near_end=self.request_transaction_page,
+        )
+        await self.load_transaction_page()
 
-        # display table
-        left_container = toga.Box()
-        table = toga.DetailedList(
-            # headings=["ID", "Track Name"],
-            data=rows,
+        # The list scrolls itself; wrapping it in a ScrollContainer would make
+        # it ask for every row up front and defeat the paging.
+        transactions_list = toga.DetailedList(
+            data=self.transaction_source, style=Pack(flex=1)
+        )
+        self.transaction_container.clear()
+        self.transaction_container.add(self.build_transaction_filter_bar(), transactions_list)
+
+    def build_transaction_filter_bar(self):
+        filter_box = toga.Box(style=Pack(direction=COLUMN))
+        self.transaction_search_input = toga.TextInput(
+            placeholder="Search merchant, description and notes",
+            on_change=self.transaction_search_change_callback,
+            on_confirm=self.apply_transaction_filter_callback,
             style=Pack(flex=1),
         )
-        left_container.add(table)
-        self.account_list_container = left_container
-
-    def build_desktop_transaction_list(self):
-        trans_cur = self.con.cursor()
-        #TODO: Update to include transactions that are transfers or don't have categories set.
-        trans_res = trans_cur.execute(
-            "SELECT t.id, amount, date(date, 'unixepoch') as date, account_id, merchant, description, notes, b.name, s.name FROM transactions t, budget_categories b, spending_categories s where t.budget_category_id = b.id and t.spending_category_id = s.id ORDER BY date"
+        search_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        search_box.add(self.transaction_search_input)
+
+        date_range_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        self.date_range_selection = toga.Selection(
+            items=DATE_RANGES,
+            on_change=self.date_range_change_callback,
+            style=Pack(width=150),
         )
-        trans_rows = []
-
-        for trans_row in trans_res.fetchall():
-            trans_data = {
-                "title": f"{trans_row[4]} {trans_row[5]} {trans_row[6]} {trans_row[7]} {trans_row[8]}",
-                "subtitle": f"{locale.currency(trans_row[1], grouping=True)} Date: {trans_row[2]}",
-            }
-            # trans_data = {
-            #     "id": trans_row[0],
-            #     "amount": locale.currency(trans_row[1], grouping=True),
-            #     "date": trans_row[2],
-            #     "account_id": trans_row[3],
-            #     "merchant": trans_row[4],
-            #     "category": trans_row[5],
-            #     "sub_category": trans_row[6],
-            # }
-            trans_rows.append(trans_data)
-
-        print(f"Transactions rows: {trans_rows}")
-        trans_cur.close()
-
-        right_container = toga.ScrollContainer()
-        transactions_list = toga.DetailedList(data=trans_rows)
-        right_content = transactions_list
-        # transaction_table = toga.Table(
-        #     headings=["Id", "Amount", "Date", "Account Id", "Merchant", "Category", "Sub category"],
-        #     data=trans_rows,
-        #     style=Pack(flex=1)
-        # )
-        # right_content = transaction_table
-        right_container.content = right_content
-
-        # right_content = toga.Box(style=Pack(direction=COLUMN))
-        # right_content.add(
-        #     toga.Button(
-        #         "Hello world!",
-        #         on_press=self.button_handler,
-        #         style=Pack(padding=20),
-        #     )
-        # )
-        # right_container = toga.ScrollContainer()
-        # right_container.content = right_content
-        return right_container
-
-    def create_empty_db(self, dest_path):
-        print(f"Creating new sqlite file {dest_path}")
-        new_connection = sqlite3.connect(dest_path)
-        cur = new_connection.cursor()
-        cur.execute(
-            """
-CREATE TABLE accounts (
-    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
-	name TEXT,
-	account_type TEXT DEFAULT ('Checking') NOT NULL
-);
-                    """
-        )
-        cur.execute(
-            """
-CREATE TABLE budget_categories(
-    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
-    name TEXT);
-                    """
-        )
-        cur.execute(
-            """
-CREATE TABLE budget_transactions(
-    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
-    amount INTEGER NOT NULL,
-	date INTEGER NOT NULL,
-    notes TEXT);
-                    """
-        )
-        cur.execute(
-            """
-CREATE TABLE spending_categories(
-    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
-    parent_category_id INTEGER NOT NULL,
-    name TEXT,
-    FOREIGN KEY(parent_category_id) REFERENCES budget_categories(id));
-                    """
-        )
-        cur.execute(
-            """
-INSERT INTO budget_categories (name) VALUES
-                    ('System Category')
-                    ,('Unknown Budget Category')
-                    """
-        )
-        cur.execute(
-            """
-INSERT INTO spending_categories(parent_category_id, name) VALUES
-                    (1, 'Starting Balance')
-                    ,(1, 'Unknown Spending Category');
-                    """
-        )
-        cur.execute(
-            """
-CREATE TABLE transactions (
-	id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
-	amount INTEGER NOT NULL,
-	date INTEGER NOT NULL,
-	transaction_type text DEFAULT ('Debit') NOT NULL,
-    account_id INTEGER NOT NULL,
-    merchant TEXT,
-    description TEXT,
-    notes TEXT,
-    budget_category_id INTEGER,
-    spending_category_id INTEGER,
-    transfer_account_id INTEGER
-    );
-                          """
-        )
-        cur.execute(
-            """
-INSERT INTO accounts (name,account_type) VALUES
-	 ('Checking','Checking'),
-	 ('Savings','Savings');
-                    """
-        )
-        transaction_datetime = time.mktime(
-            datetime.datetime.strptime("2024-04-01", "%Y-%m-%d").timetuple()
-        )
-        cur.execute(
-            """
-INSERT INTO transactions (amount, date, transaction_type, account_id, merchant, budget_category_id, spending_category_id) VALUES
-	 (10000, ?, 'Credit', 1, 'Starting Balance', 1, 1),
-	 (50000, ?, 'Credit', 2, 'Starting Balance', 1, 1);
-                    """,
-            (transaction_datetime, transaction_datetime),
-        )
-
-        new_connection.commit()
-        print(f"Successfully created sqlite file {dest_path}")
+        self.date_range_start_input = toga.TextInput(placeholder="MM/DD/YYYY", style=Pack(width=110, padding_left=5))
+        self.date_range_end_input = toga.TextInput(placeholder="MM/DD/YYYY", style=Pack(width=110, padding_left=5))
+        self.date_range_apply_button = toga.Button(
+            "Apply", on_press=self.apply_transaction_filter_callback, style=Pack(padding_left=5)
+        )
+        self.date_range_status_label = toga.Label("", style=Pack(padding_left=5))
+        self.custom_date_range_box = toga.Box(style=Pack(direction=ROW, visibility=HIDDEN))
+        self.custom_date_range_box.add(
+            self.date_range_start_input,
+            toga.Label("to", style=Pack(padding_left=5)),
+            self.date_range_end_input,
+            self.date_range_apply_button,
+        )
+        date_range_box.add(self.date_range_selection, self.custom_date_range_box, self.date_range_status_label)
+        filter_box.add(search_box, date_range_box)
+        return filter_box
+
+    def transaction_date_range(self):
+        """(start, end) day numbers of the chosen range, both inclusive; None is open."""
+        choice = self.date_range_selection.value
+        today = dates.today()
+        if choice == "This month":
+            day = dates.to_date(today)
+            start = dates.month_start(day.year, day.month)
+            return start, dates.month_start(*checkpoints.next_month(day.year, day.month)) - 1
+        if choice == "Last 90 days":
+            return today - 89, today
+        if choice == "Custom":
+            start_text = self.date_range_start_input.value.strip()
+            end_text = self.date_range_end_input.value.strip()
+            return (
+                dates.parse_day(start_text) if start_text else None,
+                dates.parse_day(end_text) if end_text else None,
+            )
+        return None, None
+
+    async def date_range_change_callback(self, widget):
+        custom = self.date_range_selection.value == "Custom"
+        self.custom_date_range_box.style.visibility = VISIBLE if custom else HIDDEN
+        if not custom:
+            await self.apply_transaction_filter_callback(widget)
+
+    def transaction_search_change_callback(self, widget):
+        # Search as the user types, once they pause.
+        if self.transaction_search_timer is not None:
+            self.transaction_search_timer.cancel()
+        self.transaction_search_timer = self.loop.call_later(SEARCH_DELAY, self.search_transactions_soon)
+
+    def search_transactions_soon(self):
+        self.transaction_search_timer = None
+        self.loop.create_task(self.apply_transaction_filter_callback(None))
+
+    @timed
+    async def apply_transaction_filter_callback(self, widget):
+        """Show the transactions matching the search box and date range."""
+        if self.transaction_search_timer is not None:
+            self.transaction_search_timer.cancel()
+            self.transaction_search_timer = None
+        try:
+            start, end = self.transaction_date_range()
+        except ValueError:
+            self.date_range_status_label.text = "Enter dates as MM/DD/YYYY"
+            return
+        self.date_range_status_label.text = ""
+        await self.writes.flush()
+        # A page load still in flight for the old filter is dropped when it
+        # finishes; see load_transaction_page.
+        search_text = self.transaction_search_input.value.strip()
+        if search_text:
+            self.transaction_pager = SearchPager(search_text, start=start, end=end)
+        else:
+            self.transaction_pager = TransactionPager(start=start, end=end)
+        self.transaction_page_pending = False
+        self.transaction_source.clear()
+        await self.load_transaction_page()
+
+    @timed
+    async def refresh_transaction_rows(self, changed):
+        """
+        Bring the loaded rows up to date after writes to transactions. The
+        rows written are read again by id, in one query, and updated,
+        moved or dropped; nothing else is read. When the changes cannot be
+        placed row by row (a category renamed, a bulk import, a search's
+        ranked order, or simply too many rows), the list starts again from
+        its first page.
+        """
+        ids = set(change.row_id for change in changed if change.table == "transactions")
+        pager = self.transaction_pager
+        if (
+            None in ids
+            or any(change.table != "transactions" for change in changed)
+            or not isinstance(pager, TransactionPager)
+            or len(ids) > pager.page_size
+        ):
+            await self.restart_transaction_list()
+            return
+
+        async with self.transaction_list_lock:
+            rows = await self.db.read(pager.loaded_rows, sorted(ids))
+            if pager is not self.transaction_pager:
+                return
+            source = self.transaction_source
+            fresh = {data["id"]: data for data in self.transaction_rows_data(rows)}
+            loaded = source.loaded()
+            for index in range(len(loaded) - 1, -1, -1):
+                row = loaded[index]
+                if row.id not in ids:
+                    continue
+                data = fresh.get(row.id)
+                if data is not None and data["key"] == row.key:
+                    # Still in the same place: change the text in place.
+                    fresh.pop(row.id)
+                    for accessor, value in data.items():
+                        if getattr(row, accessor) != value:
+                            setattr(row, accessor, value)
+                else:
+                    del source[index]
+                    del loaded[index]
+            keys = [row.key for row in loaded]
+            for data in sorted(fresh.values(), key=lambda data: data["key"]):
+                index = bisect.bisect(keys, data["key"])
+                keys.insert(index, data["key"])
+                source.insert(index, data)
+
+    @timed
+    async def restart_transaction_list(self):
+        """Show the first page again, patching the rows it shares with the list."""
+        async with self.transaction_list_lock:
+            pager = self.transaction_pager
+            pager.reset()
+            page = await self.db.read(pager.next_page)
+            if pager is self.transaction_pager:
+                patch_rows(self.transaction_source, self.transaction_rows_data(page), "id")
+
+    def request_transaction_page(self):
+        """
+        Queue a load of the next page of transactions. Called by the list
+        source while the widget is reading rows, so the load is deferred
+        until the widget has finished.
+        """
+        if self.transaction_page_pending or self.transaction_pager.exhausted:
+            return
+        self.transaction_page_pending = True
+        self.loop.create_task(self.load_transaction_page())
+
+    @timed
+    async def load_transaction_page(self):
+        async with self.transaction_list_lock:
+            pager = self.transaction_pager
+            rows = await self.db.read(pager.next_page)
+            if pager is not self.transaction_pager:
+                return
+            for data in self.transaction_rows_data(rows):
+                self.transaction_source.append(data)
+            self.transaction_page_pending = False
+
+    def transaction_rows_data(self, page):
+        """List rows for a page of transactions; its amounts and dates are formatted together."""
+        amount_texts = self.money.format_many([trans_row[pagination.AMOUNT] for trans_row in page])
+        date_texts = dates.format_days([trans_row[pagination.DATE] for trans_row in page])
+        rows = []
+        for trans_row, amount_text, date_text in zip(page, amount_texts, date_texts):
+            title_parts = [
+                trans_row[pagination.MERCHANT],
+                trans_row[pagination.DESCRIPTION],
+                trans_row[pagination.NOTES],
+                trans_row[pagination.BUDGET_CATEGORY],
+                trans_row[pagination.SPENDING_CATEGORY],
+            ]
+            rows.append(
+                {
+                    "id": trans_row[pagination.ID],
+                    # Where the row goes in the list; not shown.
+                    "key": (trans_row[pagination.DATE], trans_row[pagination.ID]),
+                    "title": " ".join(str(part) for part in title_parts if part),
+                    "subtitle": f"{amount_text} Date: {date_text}",
+                }
+            )
+        return rows
 
     def button_handler(self, widget):
-        print("button press")
+        logger.debug("button press")
 
 
 def main():
@@ -0,0 +1,78 @@
+"""
+Per-account running balances.
+
+``account_balances`` holds one row per account with the sum of its
+transaction amounts. Triggers on ``transactions`` (see
+``sqltest.migrations``) keep it current, so reading every balance costs
+one row per account rather than a pass over the ledger.
+"""
+
+COMPUTED_BALANCES_SQL = """
+SELECT account_id, SUM(amount), COUNT(*) FROM transactions GROUP BY account_id
+"""
+
+
+def rebuild_account_balances(con):
+    """Recompute every balance from the ledger."""
+    con.execute("DELETE FROM account_balances")
+    con.execute(
+        f"INSERT INTO account_balances (account_id, balance, transaction_count) {COMPUTED_BALANCES_SQL}"
+    )
+
+
+def verify_account_balances(con):
+    """
+    Compare the stored balances with the ledger. Returns a list of
+    (account_id, stored balance, actual balance) for accounts that differ.
+    """
+    stored = {
+        account_id: (balance, count)
+        for account_id, balance, count in con.execute(
+            "SELECT account_id, balance, transaction_count FROM account_balances"
+        )
+    }
+    actual = {
+        account_id: (balance, count)
+        for account_id, balance, count in con.execute(COMPUTED_BALANCES_SQL)
+    }
+    mismatches = []
+    for account_id in sorted(stored.keys() | actual.keys()):
+        stored_balance, stored_count = stored.get(account_id, (0, 0))
+        actual_balance, actual_count = actual.get(account_id, (0, 0))
+        if stored_balance != actual_balance or stored_count != actual_count:
+            mismatches.append((account_id, stored_balance, actual_balance))
+    return mismatches
+
+
+def get_account_balances(con, account_ids=None):
+    """Return (id, name, balance) for every account, or those in ``account_ids``, ordered by name."""
+    where = ""
+    if account_ids is not None:
+        account_ids = list(account_ids)
+        where = f"WHERE a.id IN ({', '.join('?' * len(account_ids))})"
+    return con.execute(
+        f"""
+SELECT a.id, a.name, COALESCE(b.balance, 0)
+FROM accounts a LEFT JOIN account_balances b ON b.account_id = a.id
+{where}
+ORDER BY a.name
+""",
+        account_ids or [],
+    ).fetchall()
+
+
+def add_inserted_balances(con, after_id):
+    """
+    Add the transactions with ids above ``after_id`` to the stored balances.
+    Used after a bulk load, which runs without the per-row triggers.
+    """
+    con.execute(
+        """
+INSERT INTO account_balances (account_id, balance, transaction_count)
+SELECT account_id, SUM(amount), COUNT(*) FROM transactions WHERE id > ? GROUP BY account_id
+ON CONFLICT(account_id) DO UPDATE SET
+    balance = balance + excluded.balance,
+    transaction_count = transaction_count + excluded.transaction_count
+""",
+        [after_id],
+    )
@@ -0,0 +1,67 @@
+"""
+Budget funding.
+
+A budget category is funded per month: ``budget_transactions`` holds at most
+one row per (budget_category_id, period_start), where period_start is the
+day number of the first of the month, and ``date`` is the day the funding
+was entered as of. Funding a category for a month sets that month's
+amount and date. A submission of the budgets form becomes a single
+``executemany``, so it is one statement however many categories and months
+it covers.
+"""
+
+import datetime
+
+from sqltest.checkpoints import next_month
+from sqltest.dates import day_number, month_start
+
+SET_FUNDING_SQL = """
+INSERT INTO budget_transactions (budget_category_id, period_start, date, amount)
+values (?, ?, ?, ?)
+ON CONFLICT (budget_category_id, period_start) DO UPDATE SET
+    amount = excluded.amount, date = excluded.date
+"""
+
+
+def funding_periods(day, months=1):
+    """Start days of ``months`` consecutive months, from the month of ``day``."""
+    periods = []
+    year, month = day.year, day.month
+    for _ in range(months):
+        periods.append(month_start(year, month))
+        year, month = next_month(year, month)
+    return periods
+
+
+def funding_rows(entries, months=1, date_format="%m/%d/%Y"):
+    """
+    Rows for SET_FUNDING_SQL from (budget_category_id, date text, amount)
+    entries. Every entry is applied to ``months`` months from its date,
+    and each of its rows keeps that date. A form usually repeats the same
+    date, so each one is parsed once.
+    """
+    periods_for = {}
+    rows = []
+    for budget_category_id, date_text, amount in entries:
+        parsed = periods_for.get(date_text)
+        if parsed is None:
+            day = datetime.datetime.strptime(date_text, date_format).date()
+            parsed = periods_for[date_text] = (day_number(day), funding_periods(day, months))
+        entered, periods = parsed
+        for period_start in periods:
+            rows.append((budget_category_id, period_start, entered, amount))
+    return rows
+
+
+def set_funding(con, rows):
+    """Write funding rows; months that were already funded get the new amount."""
+    con.executemany(SET_FUNDING_SQL, rows)
+    return len(rows)
+
+
+def get_funding(con, budget_category_id):
+    """Return (period_start, amount) for a budget category, by month."""
+    return con.execute(
+        "SELECT period_start, amount FROM budget_transactions WHERE budget_category_id = ? ORDER BY period_start",
+        [budget_category_id],
+    ).fetchall()
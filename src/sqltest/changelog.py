@@ -0,0 +1,78 @@
+"""
+The change log.
+
+Triggers on the tables the app shows (see ``migrations.add_change_log``)
+add a row to ``change_log`` for each row written: the table, the
+operation, the row's id, and the account and categories it touches. Writes
+from any connection are logged the same way, whether they come from this
+app or from another process such as the CLI.
+
+This module reads and trims the log. It imports nothing beyond the
+standard library's basics, so the migrations, the importers and the CLI
+can use it without paying for asyncio; ``sqltest.changes`` publishes what
+the log gains to the app's views.
+
+The log is cut back to its last ``LOG_SIZE`` entries when the file is
+opened (``migrations.prepare``), and by the app's watcher as it reads
+(``sqltest.changes.ChangeWatcher``).
+A reader that falls further behind than that gets a single ``RESYNC``
+change instead.
+"""
+
+from collections import namedtuple
+
+LOG_SIZE = 10000
+
+Change = namedtuple(
+    "Change", ["table", "operation", "row_id", "account_id", "budget_category_id", "spending_category_id"]
+)
+# Anything may have changed; sent to every subscriber.
+RESYNC = Change(None, "resync", None, None, None, None)
+
+READ_SQL = """
+SELECT seq, table_name, operation, row_id, account_id, budget_category_id, spending_category_id
+FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?
+"""
+
+
+def latest(con):
+    """The sequence number of the last entry in the log."""
+    return con.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+
+def read_changes(con, after_seq, limit=LOG_SIZE):
+    """
+    The Changes logged after ``after_seq``, and the sequence number to
+    read from next time. Entries that have already been pruned, or more
+    than ``limit`` of them, come back as [RESYNC].
+    """
+    first = con.execute("SELECT MIN(seq) FROM change_log").fetchone()[0]
+    if first is not None and first > after_seq + 1:
+        return latest(con), [RESYNC]
+    rows = con.execute(READ_SQL, [after_seq, limit + 1]).fetchall()
+    if not rows:
+        return after_seq, []
+    if len(rows) > limit:
+        return latest(con), [RESYNC]
+    return rows[-1][0], [Change(*row[1:]) for row in rows]
+
+
+def log_inserted(con, after_id):
+    """
+    Log the transactions with ids above ``after_id``, once per account and
+    category they touch. Used after a bulk load, which runs without the
+    per-row triggers; the entries have no row id.
+    """
+    con.execute(
+        """
+INSERT INTO change_log (table_name, operation, account_id, budget_category_id, spending_category_id)
+SELECT DISTINCT 'transactions', 'insert', account_id, budget_category_id, spending_category_id
+FROM transactions WHERE id > ?
+""",
+        [after_id],
+    )
+
+
+def prune(con, keep=LOG_SIZE):
+    """Drop all but the last ``keep`` entries of the log. Does not commit."""
+    con.execute("DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?", [keep])
@@ -0,0 +1,124 @@
+"""
+Change notifications.
+
+The triggers behind ``sqltest.changelog`` log every row written to the
+tables the app shows, from any connection. ``ChangeWatcher`` polls
+``data_version`` on the writer connection, which reads no pages. When the
+version moves, the watcher reads the log entries after the last one it
+saw and publishes them on a ``ChangeBus``. Views
+subscribe to the tables they show and refresh only what the changes
+touch. The app also asks the watcher to check straight after its own
+writes, so those show up without waiting for the next poll.
+
+Once the watcher has read another ``LOG_SIZE`` entries, it cuts the log
+back to the last ``LOG_SIZE``, so the log stays bounded however long the
+app runs. If a watcher falls further behind than the log keeps, it
+publishes a single ``RESYNC`` change instead, and views refresh in full.
+"""
+
+import asyncio
+import inspect
+import logging
+
+from sqltest.changelog import LOG_SIZE, latest, prune, read_changes
+from sqltest.db import data_version
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for writes by other processes.
+POLL_INTERVAL = 1.0
+
+
+class ChangeBus:
+    def __init__(self):
+        self.subscribers = []
+
+    def subscribe(self, callback, tables=None):
+        """
+        Call ``callback(changes)`` with the changes to ``tables`` (a set of
+        table names; None for every table). RESYNC reaches every callback.
+        The callback may be a coroutine function.
+        """
+        self.subscribers.append((callback, tables))
+
+    def unsubscribe(self, callback):
+        self.subscribers = [(subscriber, tables) for subscriber, tables in self.subscribers if subscriber != callback]
+
+    async def publish(self, changes):
+        for callback, tables in list(self.subscribers):
+            wanted = [change for change in changes if tables is None or change.table is None or change.table in tables]
+            if not wanted:
+                continue
+            try:
+                result = callback(wanted)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                # One view failing to refresh should not keep the rest stale.
+                logger.exception("Change subscriber %s failed", getattr(callback, "__name__", callback))
+
+
+class ChangeWatcher:
+    """Publishes what the change log gains, checking every ``interval`` seconds or when asked."""
+
+    def __init__(self, service, bus, interval=POLL_INTERVAL, keep=LOG_SIZE):
+        self.service = service
+        self.bus = bus
+        self.interval = interval
+        self.keep = keep
+        # Only read and set on the database thread, in _read.
+        self.version = None
+        self.seq = None
+        # The entry the log was last pruned at.
+        self.pruned_seq = None
+        self.timer = None
+        self.task = None
+        self.lock = asyncio.Lock()
+
+    def _read(self, con):
+        version = data_version(con)
+        if version == self.version:
+            return []
+        # The version is read first: a commit made after it is read again
+        # next time rather than missed.
+        self.version = version
+        if self.seq is None:
+            # The first check only finds where the log is up to.
+            self.seq = self.pruned_seq = latest(con)
+            return []
+        self.seq, changes = read_changes(con, self.seq)
+        return changes
+
+    async def check(self):
+        """Publish whatever has changed since the last check."""
+        async with self.lock:
+            changes = await self.service.run(self._read)
+            if changes:
+                await self.bus.publish(changes)
+            if self.seq is not None and self.seq - self.pruned_seq >= self.keep:
+                # Everything up to self.seq has been published.
+                await self.service.write(prune, self.keep)
+                self.pruned_seq = self.seq
+
+    def check_soon(self):
+        """Schedule a check; for callers that cannot wait for one."""
+        self.task = asyncio.ensure_future(self.check())
+
+    def start(self):
+        """Check every ``interval`` seconds from now on. Call from the event loop."""
+        self.timer = asyncio.get_running_loop().call_later(self.interval, self._poll)
+
+    def _poll(self):
+        self.task = asyncio.ensure_future(self._poll_and_wait())
+
+    async def _poll_and_wait(self):
+        try:
+            await self.check()
+        finally:
+            if self.timer is not None:
+                self.start()
+
+    def stop(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
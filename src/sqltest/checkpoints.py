@@ -0,0 +1,108 @@
+"""
+Point-in-time account balances.
+
+``balance_checkpoints`` stores, per account, the balance at the start of
+each month that has transactions before it. ``as_of`` answers a date from
+the nearest earlier checkpoint plus a range scan of at most about a month
+on the ``transactions(account_id, date)`` index.
+
+Triggers drop the checkpoints of an account from the month of a changed
+transaction onwards, so a backdated entry only invalidates later months.
+``build_checkpoints`` fills the gaps back in incrementally; the app runs
+it for the accounts in each batch of transaction changes.
+"""
+
+from sqltest.dates import day_number, month_start
+
+
+def next_month(year, month):
+    if month == 12:
+        return year + 1, 1
+    return year, month + 1
+
+
+def build_checkpoints(con, account_ids=None):
+    """
+    Add any missing monthly checkpoints for the given accounts, or for
+    every account with transactions. Only months after an account's latest
+    checkpoint are computed.
+    """
+    if account_ids is None:
+        account_ids = [
+            row[0] for row in con.execute("SELECT account_id FROM account_balances")
+        ]
+
+    for account_id in account_ids:
+        latest = con.execute(
+            "SELECT period_start, balance FROM balance_checkpoints WHERE account_id = ? ORDER BY period_start DESC LIMIT 1",
+            [account_id],
+        ).fetchone()
+        if latest is None:
+            since, balance = None, 0
+            where = "account_id = ?"
+            params = [account_id]
+        else:
+            since, balance = latest
+            where = "account_id = ? AND date >= ?"
+            params = [account_id, since]
+
+        monthly_totals = con.execute(
+            f"""
+SELECT CAST(strftime('%Y', date * 86400, 'unixepoch') AS INTEGER),
+       CAST(strftime('%m', date * 86400, 'unixepoch') AS INTEGER),
+       SUM(amount)
+FROM transactions WHERE {where}
+GROUP BY 1, 2 ORDER BY 1, 2
+""",
+            params,
+        ).fetchall()
+
+        checkpoints = []
+        for year, month, total in monthly_totals:
+            balance += total
+            period_start = month_start(*next_month(year, month))
+            if since is None or period_start > since:
+                checkpoints.append((account_id, period_start, balance))
+        con.executemany(
+            "INSERT OR REPLACE INTO balance_checkpoints (account_id, period_start, balance) values (?, ?, ?)",
+            checkpoints,
+        )
+
+
+def invalidate_inserted(con, after_id):
+    """
+    Drop the checkpoints made stale by transactions with ids above
+    ``after_id``. Used after a bulk load, which runs without the per-row
+    triggers.
+    """
+    earliest = con.execute(
+        # NOT INDEXED keeps this a rowid range scan over the new rows only.
+        "SELECT account_id, MIN(date) FROM transactions NOT INDEXED WHERE id > ? GROUP BY account_id",
+        [after_id],
+    ).fetchall()
+    con.executemany(
+        "DELETE FROM balance_checkpoints WHERE account_id = ? AND period_start > ?",
+        earliest,
+    )
+
+
+def as_of(con, account_id, day):
+    """Return the balance of an account at the end of ``day`` (a datetime.date)."""
+    end = day_number(day) + 1
+    checkpoint = con.execute(
+        "SELECT period_start, balance FROM balance_checkpoints WHERE account_id = ? AND period_start <= ? ORDER BY period_start DESC LIMIT 1",
+        [account_id, end],
+    ).fetchone()
+    if checkpoint is None:
+        since, balance = None, 0
+        total = con.execute(
+            "SELECT SUM(amount) FROM transactions WHERE account_id = ? AND date < ?",
+            [account_id, end],
+        ).fetchone()[0]
+    else:
+        since, balance = checkpoint
+        total = con.execute(
+            "SELECT SUM(amount) FROM transactions WHERE account_id = ? AND date >= ? AND date < ?",
+            [account_id, since, end],
+        ).fetchone()[0]
+    return balance + (total or 0)
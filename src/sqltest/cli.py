@@ -0,0 +1,378 @@
+"""
+Headless command line for the budget file.
+
+    python -m sqltest cli [--db PATH] COMMAND ...
+
+Commands: ``import`` a statement into an account, ``export`` the ledger,
+show or check account ``balance``s, print the category ``report`` or
+the category-by-month spending ``pivot``, ``post`` the recurring transactions that have come due, ``forecast``
+balances, ``vacuum`` the file, or take a ``backup`` of it while it is in
+use. The file is the one the app uses (see
+``sqltest.paths``) unless ``--db`` or ``CASHFLOWER_DB`` names another.
+
+Toga is never imported, and each command imports only the modules it
+uses, so a run costs little more than the interpreter's own start-up;
+this is meant for cron jobs and shell pipelines. Output that other tools
+might read (``balance --csv``, ``report --csv``, ``pivot --csv``) has amounts as plain
+"-12.34" decimals.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from sqltest import paths
+
+
+class CommandError(Exception):
+    """A problem with what was asked for; reported without a traceback."""
+
+
+def open_budget(path, create=False):
+    """A writer connection to the budget file, brought up to date."""
+    from sqltest import db, migrations
+
+    path = Path(path)
+    new_database = not path.exists()
+    if new_database and not create:
+        raise CommandError(f"{path} does not exist")
+    con = db.connect(path)
+    migrations.prepare(con, new_database)
+    return con
+
+
+def parse_day(text):
+    import datetime
+
+    try:
+        return datetime.date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{text!r} is not a YYYY-MM-DD date")
+
+
+def parse_month(text):
+    import datetime
+
+    try:
+        return datetime.datetime.strptime(text, "%Y-%m").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{text!r} is not a YYYY-MM month")
+
+
+def find_account(con, account):
+    """The id of an account given by id or by name."""
+    row = con.execute(
+        "SELECT id FROM accounts WHERE name = ? OR CAST(id AS TEXT) = ? ORDER BY name = ? DESC LIMIT 1",
+        [account, account, account],
+    ).fetchone()
+    if row is None:
+        raise CommandError(f"no account named {account!r}")
+    return row[0]
+
+
+def write_table(out, rows, csv_output):
+    """Rows as CSV, or as text columns lined up for reading."""
+    if csv_output:
+        import csv
+
+        csv.writer(out, lineterminator="\n").writerows(rows)
+        return
+    widths = [max(len(str(row[column])) for row in rows) for column in range(len(rows[0]))]
+    for row in rows:
+        cells = [str(cell).ljust(width) for cell, width in zip(row, widths)]
+        out.write("  ".join(cells).rstrip() + "\n")
+
+
+def money_formatter(csv_output):
+    """Format minor units for output: plain decimals for CSV, else in the user's locale."""
+    from sqltest import money
+
+    if csv_output:
+        return lambda amount: str(money.from_minor(amount))
+    import locale
+
+    try:
+        locale.setlocale(locale.LC_MONETARY, "")
+    except locale.Error:
+        pass
+    return money.MoneyFormatter().format
+
+
+def import_command(args, out):
+    from sqltest import importers
+
+    con = open_budget(args.db, create=True)
+    try:
+        account_id = find_account(con, args.account)
+        for statement in args.statements:
+            try:
+                result = importers.import_statement(con, statement, account_id)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"{statement}: {error}")
+            out.write(f"{statement}: {result.inserted} imported, {result.skipped} already there\n")
+    finally:
+        con.close()
+    return 0
+
+
+def export_command(args, out):
+    from sqltest import exporter
+
+    con = open_budget(args.db)
+    try:
+        account_ids = [find_account(con, account) for account in args.account] or None
+        export_filter = exporter.ExportFilter(start=args.start, end=args.end, account_ids=account_ids)
+        try:
+            count = exporter.export_ledger(con, args.output, export_filter)
+        except ValueError as error:
+            raise CommandError(str(error))
+    finally:
+        con.close()
+    out.write(f"Exported {count} transactions to {args.output}\n")
+    return 0
+
+
+def balance_command(args, out):
+    from sqltest import balances, checkpoints
+
+    con = open_budget(args.db)
+    try:
+        if args.rebuild:
+            balances.rebuild_account_balances(con)
+            con.commit()
+        mismatches = balances.verify_account_balances(con) if args.verify else []
+        accounts = balances.get_account_balances(con)
+        if args.as_of is not None:
+            accounts = [
+                (account_id, name, checkpoints.as_of(con, account_id, args.as_of))
+                for account_id, name, _ in accounts
+            ]
+    finally:
+        con.close()
+
+    format_amount = money_formatter(args.csv)
+    rows = [("account", "balance")] + [(name, format_amount(balance)) for _, name, balance in accounts]
+    write_table(out, rows, args.csv)
+    for account_id, stored, actual in mismatches:
+        sys.stderr.write(
+            f"account {account_id}: stored balance {stored} does not match the ledger ({actual}); "
+            "run with --rebuild\n"
+        )
+    return 1 if mismatches else 0
+
+
+def report_command(args, out):
+    from sqltest import rollups
+
+    con = open_budget(args.db)
+    try:
+        report_rows = rollups.category_rollups(con)
+    finally:
+        con.close()
+
+    format_amount = money_formatter(args.csv)
+    rows = [("budget category", "spending category", "remaining", "spent")]
+    for budget_name, spending_name, remaining, spent in report_rows:
+        rows.append(
+            (
+                budget_name,
+                spending_name,
+                "" if remaining is None else format_amount(remaining),
+                format_amount(spent),
+            )
+        )
+    write_table(out, rows, args.csv)
+    return 0
+
+
+def pivot_command(args, out):
+    import datetime
+
+    from sqltest import pivot
+
+    last = pivot.month_number(datetime.date.today())
+    first_month = last - args.months + 1 if args.start is None else pivot.month_number(args.start)
+    con = open_budget(args.db)
+    try:
+        pivot_rows = pivot.spending_pivot(con, first_month, args.months)
+    finally:
+        con.close()
+
+    format_amount = money_formatter(args.csv)
+    labels = [pivot.month_label(first_month + index) for index in range(args.months)]
+    rows = [("budget category", "spending category", *labels, "total")]
+    for budget_name, spending_name, *amounts in pivot_rows:
+        rows.append((budget_name, spending_name, *[format_amount(amount) for amount in amounts]))
+    write_table(out, rows, args.csv)
+    return 0
+
+
+def post_command(args, out):
+    from sqltest import dates, recurring
+
+    con = open_budget(args.db)
+    try:
+        today = None if args.through is None else dates.day_number(args.through)
+        count = recurring.post_due(con, today)
+        con.commit()
+    finally:
+        con.close()
+    out.write(f"Posted {count} recurring transactions\n")
+    return 0
+
+
+def forecast_command(args, out):
+    from sqltest import dates, forecast, recurring
+
+    con = open_budget(args.db)
+    try:
+        names = dict(con.execute("SELECT id, name FROM accounts"))
+        try:
+            projection = recurring.forecast_ledger(con, forecast.horizon_days(args.years))
+        except ValueError as error:
+            raise CommandError(str(error))
+    finally:
+        con.close()
+
+    overdrawn = {}
+    for account_id, first, _, _ in projection.shortfalls():
+        overdrawn.setdefault(account_id, first)
+    format_amount = money_formatter(args.csv)
+    rows = [("account", "lowest balance", "on", "first below zero")]
+    for account_id, day, balance in projection.lowest():
+        first = overdrawn.get(account_id)
+        rows.append(
+            (
+                names[account_id],
+                format_amount(balance),
+                dates.to_date(day).isoformat(),
+                "" if first is None else dates.to_date(first).isoformat(),
+            )
+        )
+    write_table(out, rows, args.csv)
+    return 1 if args.check and overdrawn else 0
+
+
+def vacuum_command(args, out):
+    con = open_budget(args.db)
+    try:
+        before = Path(args.db).stat().st_size
+        con.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('optimize')")
+        con.commit()
+        con.execute("VACUUM")
+        con.execute("PRAGMA optimize")
+        con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        con.close()
+    after = Path(args.db).stat().st_size
+    out.write(f"Vacuumed {args.db}: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB\n")
+    return 0
+
+
+def backup_command(args, out):
+    import sqlite3
+
+    destination = Path(args.destination)
+    if destination.exists():
+        raise CommandError(f"{destination} already exists")
+    con = open_budget(args.db)
+    try:
+        target = sqlite3.connect(destination)
+        try:
+            # Copied in steps, so the app can keep writing while it runs.
+            con.backup(target, pages=1024)
+        finally:
+            target.close()
+    finally:
+        con.close()
+    out.write(f"Backed up {args.db} to {destination}\n")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m sqltest cli", description="Work with the budget file without the GUI."
+    )
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=None,
+        help=f"budget file (default: ${paths.DB_ENV} or {paths.budget_path(environ={})})",
+    )
+    commands = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+
+    command = commands.add_parser("import", help="import CSV, OFX/QFX or QIF statements into an account")
+    command.add_argument("account", help="account name or id")
+    command.add_argument("statements", nargs="+", type=Path, help="statement files")
+    command.set_defaults(run=import_command)
+
+    command = commands.add_parser("export", help="export the ledger to CSV, Parquet or Arrow")
+    command.add_argument("output", type=Path, help="file to write; the format comes from its extension")
+    command.add_argument("--start", type=parse_day, help="first date to include (YYYY-MM-DD)")
+    command.add_argument("--end", type=parse_day, help="last date to include (YYYY-MM-DD)")
+    command.add_argument(
+        "--account", action="append", default=[], help="only this account (name or id); may be repeated"
+    )
+    command.set_defaults(run=export_command)
+
+    command = commands.add_parser("balance", help="show account balances")
+    command.add_argument("--as-of", type=parse_day, help="balances at the end of this date (YYYY-MM-DD)")
+    command.add_argument(
+        "--verify", action="store_true", help="check the stored balances against the ledger; exit 1 if they differ"
+    )
+    command.add_argument("--rebuild", action="store_true", help="recompute the stored balances from the ledger")
+    command.add_argument("--csv", action="store_true", help="write CSV")
+    command.set_defaults(run=balance_command)
+
+    command = commands.add_parser("report", help="spent and remaining per budget and spending category")
+    command.add_argument("--csv", action="store_true", help="write CSV")
+    command.set_defaults(run=report_command)
+
+    command = commands.add_parser("pivot", help="spending per category and month")
+    command.add_argument("--start", type=parse_month, help="first month (YYYY-MM; default: so the last is this month)")
+    command.add_argument("--months", type=int, choices=range(1, 61), default=12, metavar="1-60", help="how many months (default 12)")
+    command.add_argument("--csv", action="store_true", help="write CSV")
+    command.set_defaults(run=pivot_command)
+
+    command = commands.add_parser("post", help="post the recurring transactions that have come due")
+    command.add_argument("--through", type=parse_day, help="post those due by this date (default today)")
+    command.set_defaults(run=post_command)
+
+    command = commands.add_parser("forecast", help="project balances and find the days they go below zero")
+    command.add_argument(
+        "--years", type=int, choices=range(1, 6), default=1, metavar="1-5", help="how far ahead (default 1)"
+    )
+    command.add_argument("--check", action="store_true", help="exit 1 if any account goes below zero")
+    command.add_argument("--csv", action="store_true", help="write CSV")
+    command.set_defaults(run=forecast_command)
+
+    command = commands.add_parser("vacuum", help="compact the budget file")
+    command.set_defaults(run=vacuum_command)
+
+    command = commands.add_parser("backup", help="copy the budget file, safely even while the app is open")
+    command.add_argument("destination", type=Path, help="new file to write")
+    command.set_defaults(run=backup_command)
+    return parser
+
+
+def main(argv=None, out=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.db is None:
+        args.db = paths.budget_path()
+    if out is None:
+        out = sys.stdout
+
+    from sqltest import instrumentation
+
+    instrumentation.configure()
+    try:
+        return args.run(args, out)
+    except CommandError as error:
+        parser.exit(2, f"{parser.prog} {args.command}: error: {error}\n")
+    except BrokenPipeError:
+        # Piped into `head` or the like, which has stopped reading.
+        import os
+
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
@@ -0,0 +1,49 @@
+"""
+Stored dates.
+
+A transaction's date is stored as a day number: whole days since
+1970-01-01, for the calendar date the user entered. It is not a moment in
+time, so it does not move with the timezone, and it compares and indexes
+as a plain integer. ``format_days`` turns a page of day numbers into
+"YYYY-MM-DD" text at once, using NumPy when it is installed.
+"""
+
+import datetime
+
+from sqltest.money import optional_numpy
+
+EPOCH = datetime.date(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+DATE_FORMAT = "%m/%d/%Y"
+
+
+def day_number(day):
+    """The day number of a datetime.date."""
+    return day.toordinal() - EPOCH_ORDINAL
+
+
+def to_date(number):
+    """The datetime.date for a day number."""
+    return datetime.date.fromordinal(number + EPOCH_ORDINAL)
+
+
+def parse_day(text, date_format=DATE_FORMAT):
+    """The day number for date text such as "04/01/2024"."""
+    return day_number(datetime.datetime.strptime(text, date_format).date())
+
+
+def today():
+    return day_number(datetime.date.today())
+
+
+def month_start(year, month):
+    return day_number(datetime.date(year, month, 1))
+
+
+def format_days(numbers):
+    """"YYYY-MM-DD" text for each of a sequence of day numbers."""
+    np = optional_numpy()
+    if len(numbers) < 2 or np is None:
+        return [to_date(number).isoformat() for number in numbers]
+    days = np.asarray(numbers, dtype=np.int64).astype("datetime64[D]")
+    return np.datetime_as_string(days, unit="D").tolist()
@@ -0,0 +1,76 @@
+"""
+Helpers shared by the data layer.
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+
+from sqltest import instrumentation
+
+# Page cache per connection, in KiB (a negative cache_size is in KiB).
+CACHE_SIZE_KIB = 32 * 1024
+MMAP_SIZE = 256 * 1024 * 1024
+# Prepared statements kept per connection by the sqlite3 module.
+CACHED_STATEMENTS = 256
+
+
+def connect(path, read_only=False):
+    """
+    Open a budget file with the app's settings.
+
+    The writer puts the file in WAL mode, so readers never wait for it and
+    it never waits for them; with WAL, synchronous=NORMAL only risks the
+    last commits on power loss, never corruption. A read-only connection can
+    be closed from another thread, so a pool can shut it down. Statements
+    are timed when query tracing is on (see instrumentation).
+    """
+    factory = instrumentation.connection_factory()
+    if read_only:
+        con = sqlite3.connect(
+            Path(path).resolve().as_uri() + "?mode=ro",
+            uri=True,
+            cached_statements=CACHED_STATEMENTS,
+            check_same_thread=False,
+            factory=factory,
+        )
+        con.execute("PRAGMA query_only = ON")
+    else:
+        con = sqlite3.connect(path, cached_statements=CACHED_STATEMENTS, factory=factory)
+        con.execute("PRAGMA journal_mode = WAL")
+        con.execute("PRAGMA synchronous = NORMAL")
+        con.execute("PRAGMA foreign_keys = ON")
+    con.execute(f"PRAGMA cache_size = {-int(CACHE_SIZE_KIB)}")
+    con.execute(f"PRAGMA mmap_size = {int(MMAP_SIZE)}")
+    return con
+
+
+def data_version(con):
+    """
+    A value that changes whenever the database changes.
+
+    PRAGMA data_version only moves when another connection commits, so it is
+    paired with this connection's own change counter.
+    """
+    return (con.execute("PRAGMA data_version").fetchone()[0], con.total_changes)
+
+
+@contextmanager
+def bulk_load(con, table="transactions"):
+    """
+    Drop the triggers on ``table`` for the rest of the current transaction
+    and put them back afterwards. DDL is transactional in SQLite, so other
+    connections never see the triggers missing. The caller must bring the
+    tables those triggers maintain up to date before committing.
+    """
+    triggers = con.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?",
+        [table],
+    ).fetchall()
+    for name, _ in triggers:
+        con.execute(f'DROP TRIGGER "{name}"')
+    try:
+        yield
+    finally:
+        for _, trigger_sql in triggers:
+            con.execute(trigger_sql)
@@ -0,0 +1,199 @@
+"""
+Streaming export of the ledger to CSV, Parquet or Arrow.
+
+Rows are read from a single cursor ``CHUNK_SIZE`` at a time and written out
+before the next chunk is fetched, so memory use does not grow with the size
+of the ledger. Date and account filters are applied in SQL. Amounts are
+written in dollars and cents ("-12.34"); Parquet and Arrow get them as a
+two-place decimal. Dates are read as day numbers, which Parquet and Arrow
+take as they are (date32) and CSV gets as "YYYY-MM-DD", a chunk at a time.
+
+Parquet and Arrow output need pyarrow; CSV does not.
+"""
+
+import csv
+from collections import namedtuple
+from pathlib import Path
+
+from sqltest import dates
+
+CHUNK_SIZE = 50000
+
+COLUMNS = [
+    "id",
+    "date",
+    "amount",
+    "transaction_type",
+    "account",
+    "merchant",
+    "description",
+    "notes",
+    "budget_category",
+    "spending_category",
+    "transfer_account",
+]
+
+EXPORT_SQL = """
+SELECT t.id, t.date, printf('%.2f', t.amount / 100.0), t.transaction_type,
+       a.name, t.merchant, t.description, t.notes, b.name, s.name, ta.name
+FROM transactions t
+LEFT JOIN accounts a ON a.id = t.account_id
+LEFT JOIN budget_categories b ON b.id = t.budget_category_id
+LEFT JOIN spending_categories s ON s.id = t.spending_category_id
+LEFT JOIN accounts ta ON ta.id = t.transfer_account_id
+{where}
+ORDER BY t.date, t.id
+"""
+
+ExportFilter = namedtuple(
+    "ExportFilter", ["start", "end", "account_ids"], defaults=[None, None, None]
+)
+
+
+def filter_sql(export_filter):
+    """
+    The WHERE clause and parameters for a filter. ``start`` and ``end`` are
+    datetime.dates and both are inclusive.
+    """
+    clauses = []
+    params = []
+    if export_filter.start is not None:
+        clauses.append("t.date >= ?")
+        params.append(dates.day_number(export_filter.start))
+    if export_filter.end is not None:
+        clauses.append("t.date <= ?")
+        params.append(dates.day_number(export_filter.end))
+    if export_filter.account_ids:
+        placeholders = ", ".join("?" for _ in export_filter.account_ids)
+        clauses.append(f"t.account_id IN ({placeholders})")
+        params.extend(export_filter.account_ids)
+    if not clauses:
+        return "", params
+    return "WHERE " + " AND ".join(clauses), params
+
+
+def iter_chunks(con, export_filter=ExportFilter(), chunk_size=CHUNK_SIZE):
+    """Yield lists of at most ``chunk_size`` ledger rows, in COLUMNS order."""
+    where, params = filter_sql(export_filter)
+    cur = con.cursor()
+    try:
+        cur.execute(EXPORT_SQL.format(where=where), params)
+        while True:
+            chunk = cur.fetchmany(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        cur.close()
+
+
+def export_csv(con, path, export_filter=ExportFilter(), chunk_size=CHUNK_SIZE):
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as output:
+        writer = csv.writer(output)
+        writer.writerow(COLUMNS)
+        for chunk in iter_chunks(con, export_filter, chunk_size):
+            days = dates.format_days([row[1] for row in chunk])
+            writer.writerows(row[:1] + (day,) + row[2:] for row, day in zip(chunk, days))
+            count += len(chunk)
+    return count
+
+
+def _arrow_batches(con, export_filter, chunk_size):
+    import pyarrow as pa
+
+    schema = pa.schema(
+        [
+            ("id", pa.int64()),
+            ("date", pa.date32()),
+            ("amount", pa.decimal128(18, 2)),
+            ("transaction_type", pa.string()),
+            ("account", pa.string()),
+            ("merchant", pa.string()),
+            ("description", pa.string()),
+            ("notes", pa.string()),
+            ("budget_category", pa.string()),
+            ("spending_category", pa.string()),
+            ("transfer_account", pa.string()),
+        ]
+    )
+
+    def batches():
+        for chunk in iter_chunks(con, export_filter, chunk_size):
+            columns = list(zip(*chunk))
+            yield pa.RecordBatch.from_arrays(
+                [
+                    pa.array(column, type=pa.string()).cast(field.type)
+                    if field.name == "amount"
+                    else pa.array(column, type=field.type)
+                    for column, field in zip(columns, schema)
+                ],
+                schema=schema,
+            )
+
+    return schema, batches()
+
+
+def export_parquet(con, path, export_filter=ExportFilter(), chunk_size=CHUNK_SIZE):
+    import pyarrow.parquet as pq
+
+    schema, batches = _arrow_batches(con, export_filter, chunk_size)
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            count += batch.num_rows
+    return count
+
+
+def export_arrow(con, path, export_filter=ExportFilter(), chunk_size=CHUNK_SIZE):
+    import pyarrow as pa
+
+    schema, batches = _arrow_batches(con, export_filter, chunk_size)
+    count = 0
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            count += batch.num_rows
+    return count
+
+
+EXPORTERS = {
+    ".csv": export_csv,
+    ".parquet": export_parquet,
+    ".arrow": export_arrow,
+    ".feather": export_arrow,
+}
+
+ARROW_FORMATS = {".parquet", ".arrow", ".feather"}
+
+
+def arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def available_formats():
+    """File extensions (without dots) that can be exported to right now."""
+    return [
+        suffix[1:]
+        for suffix in EXPORTERS
+        if suffix not in ARROW_FORMATS or arrow_available()
+    ]
+
+
+def export_ledger(con, path, export_filter=ExportFilter(), chunk_size=CHUNK_SIZE):
+    """
+    Export the ledger to ``path``; the format is chosen by its extension.
+    Returns the number of rows written.
+    """
+    suffix = Path(path).suffix.lower()
+    exporter = EXPORTERS.get(suffix)
+    if exporter is None:
+        raise ValueError(f"{path}: unsupported export format")
+    if suffix in ARROW_FORMATS and not arrow_available():
+        raise ValueError(f"{path}: exporting to {suffix} needs pyarrow, which is not installed")
+    return exporter(con, path, export_filter, chunk_size)
@@ -0,0 +1,264 @@
+"""
+Cash-flow forecasting.
+
+A forecast projects the end-of-day balance of every account over the days
+ahead. It starts from each account's balance before the first day, adds the
+transactions already entered with later dates, and adds every occurrence
+of the recurring rules. The result is one (accounts x days) array of
+balances in minor units, built in a single vectorized pass: occurrences
+are generated for all rules at once, summed into a flow per account and
+day, and accumulated along the days.
+
+A rule is a tuple ``(account_id, amount, frequency, interval, start,
+until, after)``: ``frequency`` is one of ``FREQUENCIES`` as in an
+iCalendar RRULE, and ``start``, ``until`` and ``after`` are day numbers.
+Only occurrences later than ``after``, the day the rule has already been
+posted to the ledger through, are projected. ``until`` and ``after`` may
+be None. ``sqltest.recurring`` reads the rules from the budget file.
+A monthly or yearly rule that starts on a day some months do not have
+(the 31st, or 29 February) falls on the last day of those months.
+
+Forecasting needs NumPy.
+"""
+
+from sqltest import dates
+from sqltest.money import optional_numpy
+
+DAILY = "DAILY"
+WEEKLY = "WEEKLY"
+MONTHLY = "MONTHLY"
+YEARLY = "YEARLY"
+
+# For each frequency: whether it counts in months rather than days, and
+# how many of them one interval is.
+FREQUENCIES = {
+    DAILY: (False, 1),
+    WEEKLY: (False, 7),
+    MONTHLY: (True, 1),
+    YEARLY: (True, 12),
+}
+
+DAYS = 365
+
+OPENING_BALANCES_SQL = """
+SELECT a.id, COALESCE(b.balance, 0)
+FROM accounts a LEFT JOIN account_balances b ON b.account_id = a.id
+ORDER BY a.id
+"""
+
+SCHEDULED_SQL = "SELECT account_id, date, amount FROM transactions WHERE date >= ?"
+
+
+def _numpy():
+    np = optional_numpy()
+    if np is None:
+        raise ValueError("Forecasting needs NumPy, which is not installed")
+    return np
+
+
+def _months(np, days):
+    # Months since January 1970 of each day number.
+    return np.asarray(days, dtype=np.int64).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+
+def _month_starts(np, months):
+    # The day number of the first of each month.
+    return np.asarray(months, dtype=np.int64).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+
+
+def occurrences(rules, first_day, last_day):
+    """
+    Every occurrence of ``rules`` from ``first_day`` to ``last_day``, both
+    inclusive, as two arrays: the index of the rule in ``rules`` and the
+    day number it falls on.
+    """
+    np = _numpy()
+    if not rules:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    _, _, frequencies, intervals, starts, untils, afters = zip(*rules)
+    starts = np.array(starts, dtype=np.int64)
+    firsts = np.array([first_day if after is None else max(after + 1, first_day) for after in afters], dtype=np.int64)
+    ends = np.array([last_day if until is None else min(until, last_day) for until in untils], dtype=np.int64)
+    in_months = np.array([FREQUENCIES[frequency][0] for frequency in frequencies])
+    steps = np.array(intervals, dtype=np.int64) * [FREQUENCIES[frequency][1] for frequency in frequencies]
+
+    # Count each rule in its own unit: days, or months since 1970.
+    start_units = np.where(in_months, _months(np, starts), starts)
+    first_units = np.where(in_months, _months(np, firsts), firsts)
+    end_units = np.where(in_months, _months(np, ends), ends)
+    first_steps = np.maximum(0, -((start_units - first_units) // steps))
+    counts = np.maximum(0, (end_units - start_units) // steps - first_steps + 1)
+
+    rule_index = np.repeat(np.arange(len(rules)), counts)
+    step_number = (
+        np.arange(counts.sum())
+        - np.repeat(np.cumsum(counts) - counts, counts)
+        + first_steps[rule_index]
+    )
+    units = start_units[rule_index] + step_number * steps[rule_index]
+
+    days = units
+    monthly = in_months[rule_index]
+    if monthly.any():
+        month_starts = _month_starts(np, units[monthly])
+        month_lengths = _month_starts(np, units[monthly] + 1) - month_starts
+        day_of_month = (starts - _month_starts(np, start_units))[rule_index[monthly]]
+        days = units.copy()
+        days[monthly] = month_starts + np.minimum(day_of_month, month_lengths - 1)
+
+    # The first and last months of a monthly rule can overhang the window.
+    keep = (days >= firsts[rule_index]) & (days <= ends[rule_index])
+    return rule_index[keep], days[keep]
+
+
+def rule_flows(rules, first_day, last_day):
+    """The occurrences of ``rules`` as arrays of account id, day number and amount."""
+    np = _numpy()
+    rule_index, days = occurrences(rules, first_day, last_day)
+    account_ids = np.array([rule[0] for rule in rules], dtype=np.int64)
+    amounts = np.array([rule[1] for rule in rules], dtype=np.int64)
+    return account_ids[rule_index], days, amounts[rule_index]
+
+
+class Forecast:
+    """
+    End-of-day balances: ``balances[i, d]`` is the balance of
+    ``account_ids[i]`` at the end of day ``first_day + d``.
+    """
+
+    def __init__(self, account_ids, first_day, balances):
+        self.account_ids = account_ids
+        self.first_day = first_day
+        self.balances = balances
+
+    @property
+    def days(self):
+        return self.first_day + _numpy().arange(self.balances.shape[1])
+
+    def balance_on(self, account_id, day):
+        row = self.account_ids.tolist().index(account_id)
+        return int(self.balances[row, day - self.first_day])
+
+    def lowest(self):
+        """(account_id, day, balance) of each account's lowest balance, at its first occurrence."""
+        np = _numpy()
+        if not self.balances.size:
+            return []
+        positions = self.balances.argmin(axis=1)
+        lows = self.balances[np.arange(len(self.account_ids)), positions]
+        return list(zip(self.account_ids.tolist(), (positions + self.first_day).tolist(), lows.tolist()))
+
+    def shortfalls(self):
+        """
+        (account_id, first day, last day, lowest balance) for each run of
+        days an account spends below zero, by account then date.
+        """
+        np = _numpy()
+        accounts, days = self.balances.shape
+        negative = np.zeros((accounts, days + 2), dtype=np.int8)
+        negative[:, 1:-1] = self.balances < 0
+        edges = np.diff(negative, axis=1)
+        # Both in row-major order, so the n-th start pairs with the n-th end.
+        rows, starts = np.nonzero(edges == 1)
+        _, ends = np.nonzero(edges == -1)
+        if not len(rows):
+            return []
+
+        flat = np.append(self.balances.ravel(), 0)
+        bounds = np.empty(2 * len(rows), dtype=np.int64)
+        bounds[0::2] = rows * days + starts
+        bounds[1::2] = rows * days + ends
+        lows = np.minimum.reduceat(flat, bounds)[0::2]
+        return list(
+            zip(
+                self.account_ids[rows].tolist(),
+                (starts + self.first_day).tolist(),
+                (ends - 1 + self.first_day).tolist(),
+                lows.tolist(),
+            )
+        )
+
+
+def _rows(np, account_ids, ids):
+    # The row of each id in the sorted account_ids, and whether it is there at all.
+    ids = np.asarray(ids, dtype=np.int64)
+    rows = np.minimum(np.searchsorted(account_ids, ids), max(len(account_ids) - 1, 0))
+    if not len(account_ids):
+        return rows, np.zeros(len(ids), dtype=bool)
+    return rows, account_ids[rows] == ids
+
+
+def project(account_ids, opening, flow_accounts, flow_days, flow_amounts, first_day, days):
+    """
+    Balances for ``days`` days from ``first_day``: ``opening`` balances of
+    the sorted ``account_ids`` plus flows given as parallel arrays of
+    account id, day number and amount. Flows outside the window or for
+    other accounts are ignored.
+    """
+    np = _numpy()
+    account_ids = np.asarray(account_ids, dtype=np.int64)
+    offsets = np.asarray(flow_days, dtype=np.int64) - first_day
+    rows, known = _rows(np, account_ids, flow_accounts)
+    keep = known & (offsets >= 0) & (offsets < days)
+
+    flows = np.zeros(len(account_ids) * days, dtype=np.int64)
+    np.add.at(flows, rows[keep] * days + offsets[keep], np.asarray(flow_amounts, dtype=np.int64)[keep])
+    balances = np.cumsum(flows.reshape(len(account_ids), days), axis=1)
+    balances += np.asarray(opening, dtype=np.int64)[:, None]
+    return Forecast(account_ids, first_day, balances)
+
+
+def horizon_days(years, first_day=None):
+    """The number of days from ``first_day`` (today by default) to the same date ``years`` on."""
+    if first_day is None:
+        first_day = dates.today()
+    first = dates.to_date(first_day)
+    try:
+        end = first.replace(year=first.year + years)
+    except ValueError:
+        # From 29 February to the 28th.
+        end = first.replace(year=first.year + years, day=28)
+    return (end - first).days
+
+
+def forecast(con, rules=(), days=DAYS, first_day=None, snapshot=None):
+    """
+    Forecast every account for ``days`` days from ``first_day`` (today by
+    default), from the ledger on ``con`` and the given recurring rules.
+    With a ``sqltest.snapshot.LedgerSnapshot``, the balances and dated
+    transactions come from it rather than from SQL.
+    """
+    np = _numpy()
+    if first_day is None:
+        first_day = dates.today()
+
+    if snapshot is None:
+        opening = np.array(con.execute(OPENING_BALANCES_SQL).fetchall(), dtype=np.int64).reshape(-1, 2)
+        scheduled = np.array(con.execute(SCHEDULED_SQL, [first_day]).fetchall(), dtype=np.int64).reshape(-1, 3)
+        scheduled = scheduled.T
+    else:
+        snapshot.refresh(con)
+        totals = snapshot.totals(("account_id",))
+        opening = np.array(
+            [(row[0], 0) for row in con.execute("SELECT id FROM accounts ORDER BY id")], dtype=np.int64
+        ).reshape(-1, 2)
+        rows, known = _rows(np, opening[:, 0], [row[0] for row in totals])
+        opening[rows[known], 1] = np.array([row[1] for row in totals], dtype=np.int64)[known]
+        scheduled = snapshot.flows(start=first_day)
+    account_ids = opening[:, 0]
+    # Stored balances include transactions already entered for later dates.
+    balances = opening[:, 1].copy()
+    rows, known = _rows(np, account_ids, scheduled[0])
+    np.subtract.at(balances, rows[known], scheduled[2][known])
+
+    rule_accounts, rule_days, rule_amounts = rule_flows(rules, first_day, first_day + days - 1)
+    return project(
+        account_ids,
+        balances,
+        np.concatenate([scheduled[0], rule_accounts]),
+        np.concatenate([scheduled[1], rule_days]),
+        np.concatenate([scheduled[2], rule_amounts]),
+        first_day,
+        days,
+    )
@@ -0,0 +1,288 @@
+"""
+Streaming import of bank statements (CSV, OFX/QFX and QIF).
+
+Each reader is a generator of StatementRow, so a statement is never held in
+memory. ``import_statement`` converts the rows in batches and writes them
+with ``executemany`` inside a single transaction. Every row carries a
+content hash that is unique in ``transactions``; rows already imported are
+skipped, so importing the same file twice adds nothing the second time.
+"""
+
+import csv
+import datetime
+import hashlib
+import re
+from collections import namedtuple
+from itertools import islice
+from operator import itemgetter
+from pathlib import Path
+
+from sqltest import balances, changelog, checkpoints, dates, money, pivot, search
+from sqltest.db import bulk_load
+
+BATCH_SIZE = 10000
+
+StatementRow = namedtuple(
+    "StatementRow", ["date", "amount", "merchant", "description", "reference"]
+)
+
+ImportResult = namedtuple("ImportResult", ["read", "inserted", "skipped"])
+
+INSERT_SQL = """
+INSERT OR IGNORE INTO transactions
+    (date, transaction_type, amount, account_id, merchant, description, import_hash)
+values (?, ?, ?, ?, ?, ?, ?)
+"""
+
+DATE_FORMATS = ["%m/%d/%Y", "%Y-%m-%d", "%m/%d/%y", "%d.%m.%Y", "%Y%m%d"]
+
+
+def read_csv(path):
+    """
+    Rows from a CSV export. The columns are found by their headings; either
+    a signed Amount column or separate Debit and Credit columns is accepted.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as statement:
+        reader = csv.reader(statement)
+        headings = [heading.strip().lower() for heading in next(reader, [])]
+
+        def column(*names):
+            for name in names:
+                if name in headings:
+                    return headings.index(name)
+            return None
+
+        date_col = column("date", "posted date", "posting date", "transaction date")
+        amount_col = column("amount")
+        debit_col = column("debit", "withdrawal")
+        credit_col = column("credit", "deposit")
+        merchant_col = column("merchant", "payee", "name")
+        description_col = column("description", "memo")
+        reference_col = column("reference", "id", "transaction id")
+        if date_col is None or (amount_col is None and debit_col is None):
+            raise ValueError(f"{path}: could not find date and amount columns")
+
+        # Short records are padded, plus one extra blank cell that stands in
+        # for the columns this statement does not have.
+        width = len(headings)
+        pick = itemgetter(
+            *[
+                width if col is None else col
+                for col in (
+                    date_col,
+                    amount_col,
+                    debit_col,
+                    credit_col,
+                    merchant_col,
+                    description_col,
+                    reference_col,
+                )
+            ]
+        )
+        for record in reader:
+            if not record:
+                continue
+            if len(record) < width:
+                record.extend([""] * (width - len(record)))
+            record.append("")
+            date, amount, debit, credit, merchant, description, reference = pick(record)
+            if amount_col is None:
+                debit = debit.strip()
+                amount = f"-{debit}" if debit else credit
+            yield StatementRow(
+                date.strip(),
+                amount.strip(),
+                merchant.strip(),
+                description.strip(),
+                reference.strip(),
+            )
+
+
+OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+def _ofx_tags(statement, chunk_size=65536):
+    """Yield (closing, tag, text) from an OFX file, a chunk at a time."""
+    pending = ""
+    while True:
+        chunk = statement.read(chunk_size)
+        pending += chunk
+        # Until the end of the file, hold back everything from the last "<":
+        # that tag and its text may continue in the next chunk.
+        end = max(pending.rfind("<"), 0) if chunk else len(pending)
+        for match in OFX_TAG.finditer(pending, 0, end):
+            yield match.group(1) == "/", match.group(2).upper(), match.group(3).strip()
+        if not chunk:
+            return
+        pending = pending[end:]
+
+
+def read_ofx(path):
+    """Rows from the STMTTRN records of an OFX or QFX download."""
+    with open(path, encoding="utf-8", errors="replace") as statement:
+        record = None
+        for closing, tag, text in _ofx_tags(statement):
+            if tag == "STMTTRN":
+                if closing and record is not None:
+                    yield StatementRow(
+                        record.get("DTPOSTED", "")[:8],
+                        record.get("TRNAMT", ""),
+                        record.get("NAME", ""),
+                        record.get("MEMO", ""),
+                        record.get("FITID", ""),
+                    )
+                    record = None
+                elif not closing:
+                    record = {}
+            elif record is not None and not closing and text:
+                record[tag] = text
+
+
+def read_qif(path):
+    """Rows from a QIF file; each record ends with a ^ line."""
+    with open(path, encoding="utf-8", errors="replace") as statement:
+        record = {}
+        for line in statement:
+            line = line.rstrip("\r\n")
+            if not line:
+                continue
+            code, value = line[0], line[1:].strip()
+            if code == "^":
+                if "D" in record:
+                    yield StatementRow(
+                        record["D"].replace("'", "/").replace(" ", ""),
+                        record.get("T", record.get("U", "")),
+                        record.get("P", ""),
+                        record.get("M", ""),
+                        record.get("N", ""),
+                    )
+                record = {}
+            elif code != "!":
+                record[code] = value
+
+
+READERS = {
+    ".csv": read_csv,
+    ".ofx": read_ofx,
+    ".qfx": read_ofx,
+    ".qif": read_qif,
+}
+
+
+def read_statement(path):
+    reader = READERS.get(Path(path).suffix.lower())
+    if reader is None:
+        raise ValueError(f"{path}: unsupported statement type")
+    return reader(path)
+
+
+class RowConverter:
+    """
+    Turns StatementRows into transactions rows. Statements repeat the same
+    few hundred dates many times, so parsed dates are memoized.
+    """
+
+    def __init__(self, account_id):
+        self.account_id = account_id
+        self.hash_salt = str(account_id).encode()[:16]
+        self.dates = {}
+        self.seen_date = None
+        self.seen = {}
+
+    def parse_date(self, text):
+        parsed = self.dates.get(text)
+        if parsed is None:
+            for date_format in DATE_FORMATS:
+                try:
+                    day = datetime.datetime.strptime(text, date_format)
+                    break
+                except ValueError:
+                    continue
+            else:
+                raise ValueError(f"Unrecognised date {text!r}")
+            parsed = dates.day_number(day.date())
+            self.dates[text] = parsed
+        return parsed
+
+    def parse_amount(self, text):
+        cleaned = text.replace(",", "").replace("$", "")
+        if cleaned.startswith("(") and cleaned.endswith(")"):
+            cleaned = "-" + cleaned[1:-1]
+        try:
+            return money.to_minor(cleaned)
+        except ValueError:
+            raise ValueError(f"Unrecognised amount {text!r}")
+
+    def content_hash(self, row):
+        # Identical rows in one statement are real, separate transactions
+        # (two coffees on the same day); number them so each gets its own
+        # hash, and the same numbering comes out on a re-import. Statements
+        # are in date order, so only the current date's rows are remembered.
+        if row.date != self.seen_date:
+            self.seen_date = row.date
+            self.seen = {}
+        occurrence = self.seen.get(row, 0)
+        self.seen[row] = occurrence + 1
+
+        key = "\x1f".join(row)
+        if occurrence:
+            key = f"{key}\x1f{occurrence}"
+        return hashlib.blake2b(
+            key.encode(), digest_size=16, salt=self.hash_salt
+        ).digest()
+
+    def convert(self, rows):
+        converted = []
+        for row in rows:
+            amount = self.parse_amount(row.amount)
+            converted.append(
+                (
+                    self.parse_date(row.date),
+                    "Credit" if amount > 0 else "Debit",
+                    amount,
+                    self.account_id,
+                    row.merchant or None,
+                    row.description or None,
+                    self.content_hash(row),
+                )
+            )
+        return converted
+
+
+def import_rows(con, rows, account_id, batch_size=BATCH_SIZE):
+    """Write StatementRows for one account in a single transaction."""
+    converter = RowConverter(account_id)
+    rows = iter(rows)
+    read = inserted = 0
+    cur = con.cursor()
+    if con.in_transaction:
+        con.commit()
+    con.execute("BEGIN")
+    try:
+        last_id = con.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+        with bulk_load(con):
+            while True:
+                batch = converter.convert(islice(rows, batch_size))
+                if not batch:
+                    break
+                cur.executemany(INSERT_SQL, batch)
+                read += len(batch)
+                inserted += cur.rowcount
+            balances.add_inserted_balances(con, last_id)
+            checkpoints.invalidate_inserted(con, last_id)
+            search.add_inserted(con, last_id)
+            pivot.mark_inserted(con, last_id)
+            changelog.log_inserted(con, last_id)
+        checkpoints.build_checkpoints(con, [account_id])
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        cur.close()
+    return ImportResult(read, inserted, read - inserted)
+
+
+def import_statement(con, path, account_id, batch_size=BATCH_SIZE):
+    """Import a CSV, OFX/QFX or QIF statement into an account."""
+    return import_rows(con, read_statement(path), account_id, batch_size)
@@ -0,0 +1,197 @@
+"""
+Timing for the app's hot paths, and its logging setup.
+
+Two tables of timings are kept: ``queries``, per SQL statement, and
+``callbacks``, per Toga callback and window build. The diagnostics view
+shows the slowest entries of each.
+
+``configure`` reads the environment:
+
+CASHFLOWER_TRACE
+    Comma-separated list of what to time: ``callbacks`` (the default),
+    ``queries``, ``all`` or ``off``. Query timing wraps every cursor, so it
+    is off unless asked for; connections opened before it is turned on are
+    not timed.
+CASHFLOWER_LOG
+    Logging level name for the app's messages (default INFO).
+"""
+
+import functools
+import inspect
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TRACE_ENV = "CASHFLOWER_TRACE"
+LOG_ENV = "CASHFLOWER_LOG"
+
+
+class Timings:
+    """Count, total and worst time per name. Safe to record from any thread."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def record(self, name, seconds, count=1):
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is None:
+                self.entries[name] = [count, seconds, seconds]
+            else:
+                entry[0] += count
+                entry[1] += seconds
+                if seconds > entry[2]:
+                    entry[2] = seconds
+
+    def slowest(self, limit=20):
+        """Return (name, count, total seconds, worst seconds), most total time first."""
+        with self.lock:
+            rows = [(name, *entry) for name, entry in self.entries.items()]
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows[:limit]
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+
+
+queries = Timings()
+callbacks = Timings()
+trace_queries = False
+trace_callbacks = True
+
+
+def configure(environ=os.environ):
+    """Set what is timed and the logging level from the environment."""
+    global trace_queries, trace_callbacks
+    parts = set(part.strip().lower() for part in environ.get(TRACE_ENV, "callbacks").split(","))
+    trace_queries = bool(parts & {"queries", "all"})
+    trace_callbacks = bool(parts & {"callbacks", "all"})
+
+    level = environ.get(LOG_ENV, "INFO").upper()
+    logging.basicConfig(
+        level=getattr(logging, level, logging.INFO),
+        format="%(asctime)s %(name)s %(levelname)s: %(message)s",
+    )
+
+
+def timed(fn):
+    """Record how long each call of a callback or window build takes."""
+    name = fn.__qualname__
+
+    if inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def timed_coroutine(*args, **kwargs):
+            if not trace_callbacks:
+                return await fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                callbacks.record(name, time.perf_counter() - started)
+
+        return timed_coroutine
+
+    @functools.wraps(fn)
+    def timed_function(*args, **kwargs):
+        if not trace_callbacks:
+            return fn(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            callbacks.record(name, time.perf_counter() - started)
+
+    return timed_function
+
+
+def statement_name(sql):
+    return " ".join(sql.split())
+
+
+class TimedCursor(sqlite3.Cursor):
+    """
+    A cursor that records the time spent executing a statement and fetching
+    its rows; fetch time is added to the statement without counting a call.
+    """
+
+    statement = None
+
+    def execute(self, sql, parameters=()):
+        self.statement = statement_name(sql)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            queries.record(self.statement, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        self.statement = statement_name(sql)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            queries.record(self.statement, time.perf_counter() - started)
+
+    def _fetched(self, started):
+        if self.statement is not None:
+            queries.record(self.statement, time.perf_counter() - started, count=0)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self._fetched(started)
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            self._fetched(started)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._fetched(started)
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            return super().__next__()
+        finally:
+            self._fetched(started)
+
+
+class TimedConnection(sqlite3.Connection):
+    """A connection whose statements and commits are recorded in ``queries``."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            queries.record("COMMIT", time.perf_counter() - started)
+
+
+def connection_factory():
+    """The sqlite3 connection class to open connections with."""
+    return TimedConnection if trace_queries else sqlite3.Connection
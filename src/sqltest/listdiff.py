@@ -0,0 +1,73 @@
+"""
+Row-level updates for a toga ListSource.
+
+``patch_rows`` turns a source into a new list of rows with as few inserts,
+in-place updates and removals as it can, so a widget showing the source
+redraws only the rows that changed instead of being rebuilt.
+``update_rows`` sets new values on some rows and leaves the others alone.
+"""
+
+from collections import namedtuple
+
+PatchResult = namedtuple("PatchResult", ["inserted", "updated", "removed"])
+
+
+def patch_rows(source, rows, key):
+    """
+    Make ``source`` hold ``rows`` (dicts, in display order). Rows are
+    matched on the ``key`` accessor; a matched row has only its changed
+    values set. Returns a PatchResult with the number of rows touched.
+    """
+    wanted = set(row[key] for row in rows)
+    removed = 0
+    for index in range(len(source) - 1, -1, -1):
+        if getattr(source[index], key) not in wanted:
+            del source[index]
+            removed += 1
+
+    inserted = updated = 0
+    for index, data in enumerate(rows):
+        if index < len(source) and getattr(source[index], key) == data[key]:
+            row = source[index]
+            changed = False
+            for accessor, value in data.items():
+                if getattr(row, accessor, None) != value:
+                    setattr(row, accessor, value)
+                    changed = True
+            updated += changed
+            continue
+        # The row is new here, or has moved: take out any later copy of it
+        # and insert it at its place.
+        for later in range(index + 1, len(source)):
+            if getattr(source[later], key) == data[key]:
+                del source[later]
+                removed += 1
+                break
+        source.insert(index, data)
+        inserted += 1
+    # Only left over when the source had a key more often than ``rows`` has.
+    while len(source) > len(rows):
+        del source[len(source) - 1]
+        removed += 1
+    return PatchResult(inserted, updated, removed)
+
+
+def update_rows(source, rows, key):
+    """
+    Set the values of ``rows`` (dicts) on the rows of ``source`` with the
+    same ``key``; rows not in ``source`` are ignored. Returns the number of
+    rows changed.
+    """
+    wanted = {row[key]: row for row in rows}
+    updated = 0
+    for row in source:
+        data = wanted.get(getattr(row, key))
+        if data is None:
+            continue
+        changed = False
+        for accessor, value in data.items():
+            if getattr(row, accessor, None) != value:
+                setattr(row, accessor, value)
+                changed = True
+        updated += changed
+    return updated
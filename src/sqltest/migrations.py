@@ -0,0 +1,573 @@
+"""
+Versioned schema migrations.
+
+The schema version of a budget file is kept in ``PRAGMA user_version``.
+A file made by ``create_schema`` is version 0; each entry in ``MIGRATIONS``
+moves it up by one. ``migrate`` runs whatever a file is missing, each step
+in its own transaction, so an interrupted upgrade resumes where it stopped.
+"""
+
+import datetime
+import logging
+import sqlite3
+import time
+
+from sqltest import balances, changelog, checkpoints, pagination, pivot, rollups
+from sqltest.schema import create_schema
+
+logger = logging.getLogger(__name__)
+
+
+def add_query_indexes(con):
+    """Indexes for the transaction list, per-account lookups and category joins."""
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS idx_transactions_date_id ON transactions(date, id)"
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS idx_transactions_account_date ON transactions(account_id, date)"
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS idx_transactions_categories ON transactions(budget_category_id, spending_category_id)"
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS idx_spending_categories_parent ON spending_categories(parent_category_id)"
+    )
+
+
+def add_account_balances(con):
+    """Materialized per-account balances, kept current by triggers."""
+    con.execute(
+        """
+CREATE TABLE IF NOT EXISTS account_balances (
+    account_id INTEGER NOT NULL PRIMARY KEY,
+    balance INTEGER NOT NULL DEFAULT 0,
+    transaction_count INTEGER NOT NULL DEFAULT 0)
+"""
+    )
+    con.execute(
+        """
+CREATE TRIGGER IF NOT EXISTS account_balances_insert AFTER INSERT ON transactions
+BEGIN
+    INSERT INTO account_balances (account_id, balance, transaction_count)
+    VALUES (NEW.account_id, NEW.amount, 1)
+    ON CONFLICT(account_id) DO UPDATE SET
+        balance = balance + excluded.balance,
+        transaction_count = transaction_count + 1;
+END
+"""
+    )
+    con.execute(
+        """
+CREATE TRIGGER IF NOT EXISTS account_balances_delete AFTER DELETE ON transactions
+BEGIN
+    UPDATE account_balances
+    SET balance = balance - OLD.amount, transaction_count = transaction_count - 1
+    WHERE account_id = OLD.account_id;
+END
+"""
+    )
+    con.execute(
+        """
+CREATE TRIGGER IF NOT EXISTS account_balances_update AFTER UPDATE OF amount, account_id ON transactions
+BEGIN
+    UPDATE account_balances
+    SET balance = balance - OLD.amount, transaction_count = transaction_count - 1
+    WHERE account_id = OLD.account_id;
+    INSERT INTO account_balances (account_id, balance, transaction_count)
+    VALUES (NEW.account_id, NEW.amount, 1)
+    ON CONFLICT(account_id) DO UPDATE SET
+        balance = balance + excluded.balance,
+        transaction_count = transaction_count + 1;
+END
+"""
+    )
+    balances.rebuild_account_balances(con)
+
+
+def add_balance_checkpoints(con):
+    """Monthly per-account balance snapshots for point-in-time queries."""
+    con.execute(
+        """
+CREATE TABLE IF NOT EXISTS balance_checkpoints (
+    account_id INTEGER NOT NULL,
+    period_start INTEGER NOT NULL,
+    balance INTEGER NOT NULL,
+    PRIMARY KEY (account_id, period_start)) WITHOUT ROWID
+"""
+    )
+    con.execute(
+        """
+CREATE TRIGGER IF NOT EXISTS balance_checkpoints_insert AFTER INSERT ON transactions
+BEGIN
+    DELETE FROM balance_checkpoints
+    WHERE account_id = NEW.account_id AND period_start > NEW.date;
+END
+"""
+    )
+    con.execute(
+        """
+CREATE TRIGGER IF NOT EXISTS balance_checkpoints_delete AFTER DELETE ON transactions
+BEGIN
+    DELETE FROM balance_checkpoints
+    WHERE account_id = OLD.account_id AND period_start > OLD.date;
+END
+"""
+    )
+    con.execute(
+        """
+CREATE TRIGGER IF NOT EXISTS balance_checkpoints_update AFTER UPDATE OF amount, date, account_id ON transactions
+BEGIN
+    DELETE FROM balance_checkpoints
+    WHERE account_id = OLD.account_id AND period_start > OLD.date;
+    DELETE FROM balance_checkpoints
+    WHERE account_id = NEW.account_id AND period_start > NEW.date;
+END
+"""
+    )
+
+
+def add_budget_transaction_category(con):
+    """Record which budget category a funding entry is for."""
+    con.execute(
+        "ALTER TABLE budget_transactions ADD COLUMN budget_category_id INTEGER REFERENCES budget_categories(id)"
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS idx_budget_transactions_category ON budget_transactions(budget_category_id)"
+    )
+
+
+def cover_category_totals(con):
+    """
+    Widen the category index so the category rollups are answered from the
+    index alone, without visiting the table.
+    """
+    con.execute("DROP INDEX IF EXISTS idx_transactions_categories")
+    con.execute(
+        "CREATE INDEX idx_transactions_categories ON transactions(budget_category_id, spending_category_id, transaction_type, amount)"
+    )
+
+
+def add_import_hash(con):
+    """Content hash of imported statement rows, unique so re-imports are skipped."""
+    con.execute("ALTER TABLE transactions ADD COLUMN import_hash BLOB")
+    con.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_import_hash ON transactions(import_hash) WHERE import_hash IS NOT NULL"
+    )
+
+
+def key_budget_funding_by_period(con):
+    """
+    Give each funding row the month it is for, merge rows for the same
+    category and month, and make (category, month) unique. Rows written
+    with the amount and date swapped are put right first.
+    """
+    # The first version of the app wrote funding rows without a category and
+    # with the amount and date swapped, so the amount holds a timestamp: over
+    # a billion dollars, which no real funding row comes near.
+    con.execute(
+        "UPDATE budget_transactions SET amount = date, date = amount WHERE budget_category_id IS NULL AND amount >= 1000000000"
+    )
+    con.execute("ALTER TABLE budget_transactions ADD COLUMN period_start INTEGER")
+    periods = {}
+    updates = []
+    for row_id, date in con.execute("SELECT id, date FROM budget_transactions").fetchall():
+        day = datetime.date.fromtimestamp(date)
+        period_start = periods.get((day.year, day.month))
+        if period_start is None:
+            # Dates were local-midnight timestamps at this version.
+            period_start = time.mktime(datetime.date(day.year, day.month, 1).timetuple())
+            periods[(day.year, day.month)] = period_start
+        updates.append((period_start, row_id))
+    con.executemany("UPDATE budget_transactions SET period_start = ? WHERE id = ?", updates)
+    con.execute(
+        """
+UPDATE budget_transactions SET amount = (
+    SELECT SUM(other.amount) FROM budget_transactions other
+    WHERE other.budget_category_id = budget_transactions.budget_category_id
+      AND other.period_start = budget_transactions.period_start)
+WHERE budget_category_id IS NOT NULL AND id IN (
+    SELECT MIN(id) FROM budget_transactions
+    WHERE budget_category_id IS NOT NULL
+    GROUP BY budget_category_id, period_start HAVING COUNT(*) > 1)
+"""
+    )
+    con.execute(
+        """
+DELETE FROM budget_transactions
+WHERE budget_category_id IS NOT NULL AND id NOT IN (
+    SELECT MIN(id) FROM budget_transactions
+    WHERE budget_category_id IS NOT NULL
+    GROUP BY budget_category_id, period_start)
+"""
+    )
+    con.execute("DROP INDEX IF EXISTS idx_budget_transactions_category")
+    con.execute(
+        "CREATE UNIQUE INDEX idx_budget_transactions_period ON budget_transactions(budget_category_id, period_start)"
+    )
+
+
+def amounts_in_minor_units(con):
+    """
+    Store amounts in cents rather than whole dollars. The update triggers
+    and the category index (which holds the amount) are dropped while the
+    ledger is rescaled, so they are not maintained row by row, then put
+    back and the derived balances rescaled to match.
+    """
+    con.execute("DROP TRIGGER IF EXISTS account_balances_update")
+    con.execute("DROP TRIGGER IF EXISTS balance_checkpoints_update")
+    con.execute("DROP INDEX IF EXISTS idx_transactions_categories")
+    con.execute("UPDATE transactions SET amount = amount * 100")
+    cover_category_totals(con)
+    con.execute("UPDATE budget_transactions SET amount = amount * 100")
+    con.execute("UPDATE balance_checkpoints SET balance = balance * 100")
+    add_account_balances(con)
+    add_balance_checkpoints(con)
+
+
+# A local-midnight timestamp, as dates were stored up to version 8, to the
+# day number of its calendar date.
+TIMESTAMP_TO_DAY = "CAST(julianday(date({column}, 'unixepoch', 'localtime')) - 2440587.5 AS INTEGER)"
+
+
+def dates_as_day_numbers(con):
+    """
+    Store dates as day numbers (days since 1970-01-01) instead of local
+    timestamps. The date indexes and the checkpoint update trigger are
+    dropped while the ledger is rewritten, then put back.
+    """
+    con.execute("DROP TRIGGER IF EXISTS balance_checkpoints_update")
+    con.execute("DROP INDEX IF EXISTS idx_transactions_date_id")
+    con.execute("DROP INDEX IF EXISTS idx_transactions_account_date")
+    con.execute(f"UPDATE transactions SET date = {TIMESTAMP_TO_DAY.format(column='date')}")
+    con.execute(
+        f"""
+UPDATE budget_transactions SET
+    date = {TIMESTAMP_TO_DAY.format(column='date')},
+    period_start = {TIMESTAMP_TO_DAY.format(column='period_start')}
+"""
+    )
+    con.execute(
+        f"UPDATE balance_checkpoints SET period_start = {TIMESTAMP_TO_DAY.format(column='period_start')}"
+    )
+    add_query_indexes(con)
+    add_balance_checkpoints(con)
+
+
+def add_transaction_search(con):
+    """
+    An FTS5 index over merchant, description and notes, kept in step by
+    triggers.
+    """
+    con.execute(
+        """
+CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+    merchant, description, notes,
+    content='transactions', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3')
+"""
+    )
+    con.execute(
+        """
+CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions
+BEGIN
+    INSERT INTO transactions_fts (rowid, merchant, description, notes)
+    VALUES (NEW.id, NEW.merchant, NEW.description, NEW.notes);
+END
+"""
+    )
+    con.execute(
+        """
+CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions
+BEGIN
+    INSERT INTO transactions_fts (transactions_fts, rowid, merchant, description, notes)
+    VALUES ('delete', OLD.id, OLD.merchant, OLD.description, OLD.notes);
+END
+"""
+    )
+    con.execute(
+        """
+CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF merchant, description, notes ON transactions
+BEGIN
+    INSERT INTO transactions_fts (transactions_fts, rowid, merchant, description, notes)
+    VALUES ('delete', OLD.id, OLD.merchant, OLD.description, OLD.notes);
+    INSERT INTO transactions_fts (rowid, merchant, description, notes)
+    VALUES (NEW.id, NEW.merchant, NEW.description, NEW.notes);
+END
+"""
+    )
+    con.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+
+def add_recurring_rules(con):
+    """Transactions that repeat; see ``sqltest.recurring``."""
+    con.execute(
+        """
+CREATE TABLE IF NOT EXISTS recurring_rules (
+    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    account_id INTEGER NOT NULL,
+    amount INTEGER NOT NULL,
+    transaction_type TEXT DEFAULT ('Debit') NOT NULL,
+    frequency TEXT NOT NULL CHECK (frequency IN ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')),
+    interval INTEGER DEFAULT (1) NOT NULL CHECK (interval > 0),
+    start_date INTEGER NOT NULL,
+    until_date INTEGER,
+    merchant TEXT,
+    description TEXT,
+    notes TEXT,
+    budget_category_id INTEGER,
+    spending_category_id INTEGER,
+    transfer_account_id INTEGER,
+    posted_through INTEGER,
+    FOREIGN KEY(account_id) REFERENCES accounts(id))
+"""
+    )
+
+
+def add_changed_months(con):
+    """
+    A change log of months: triggers stamp the month of each transaction
+    written with a rising ``change_seq``, so ``sqltest.pivot`` can regroup
+    only the months that changed since it last looked.
+    """
+    con.execute(
+        """
+CREATE TABLE IF NOT EXISTS changed_months (
+    month INTEGER NOT NULL PRIMARY KEY,
+    change_seq INTEGER NOT NULL)
+"""
+    )
+
+    def stamp(row):
+        return f"""
+    INSERT INTO changed_months (month, change_seq)
+    VALUES ((CAST(strftime('%Y', {row}.date * 86400, 'unixepoch') AS INTEGER) - 1970) * 12
+            + CAST(strftime('%m', {row}.date * 86400, 'unixepoch') AS INTEGER) - 1,
+            (SELECT COALESCE(MAX(change_seq), 0) + 1 FROM changed_months))
+    ON CONFLICT (month) DO UPDATE SET change_seq = excluded.change_seq;"""
+
+    con.execute(
+        f"""
+CREATE TRIGGER IF NOT EXISTS changed_months_insert AFTER INSERT ON transactions
+BEGIN{stamp("NEW")}
+END
+"""
+    )
+    con.execute(
+        f"""
+CREATE TRIGGER IF NOT EXISTS changed_months_delete AFTER DELETE ON transactions
+BEGIN{stamp("OLD")}
+END
+"""
+    )
+    con.execute(
+        f"""
+CREATE TRIGGER IF NOT EXISTS changed_months_update
+AFTER UPDATE OF date, amount, transaction_type, budget_category_id, spending_category_id ON transactions
+BEGIN{stamp("OLD")}{stamp("NEW")}
+END
+"""
+    )
+
+
+def add_change_log(con):
+    """
+    A log of the rows written to the tables the app shows, for change
+    notifications; see ``sqltest.changelog``.
+    """
+    con.execute(
+        """
+CREATE TABLE IF NOT EXISTS change_log (
+    seq INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    operation TEXT NOT NULL,
+    row_id INTEGER,
+    account_id INTEGER,
+    budget_category_id INTEGER,
+    spending_category_id INTEGER)
+"""
+    )
+    # Each table, and the columns of a row that give its id, account,
+    # budget category and spending category.
+    logged_tables = {
+        "transactions": ("id", "account_id", "budget_category_id", "spending_category_id"),
+        "accounts": ("id", "id", "NULL", "NULL"),
+        "budget_categories": ("id", "NULL", "id", "NULL"),
+        "spending_categories": ("id", "NULL", "parent_category_id", "id"),
+        "budget_transactions": ("id", "NULL", "budget_category_id", "NULL"),
+        "recurring_rules": ("id", "account_id", "budget_category_id", "spending_category_id"),
+    }
+
+    def log(table, operation, row, columns):
+        values = ", ".join(column if column == "NULL" else f"{row}.{column}" for column in columns)
+        return f"""
+    INSERT INTO change_log (table_name, operation, row_id, account_id, budget_category_id, spending_category_id)
+    VALUES ('{table}', '{operation}', {values});"""
+
+    for table, columns in logged_tables.items():
+        con.execute(
+            f"""
+CREATE TRIGGER IF NOT EXISTS {table}_log_insert AFTER INSERT ON {table}
+BEGIN{log(table, "insert", "NEW", columns)}
+END
+"""
+        )
+        con.execute(
+            f"""
+CREATE TRIGGER IF NOT EXISTS {table}_log_delete AFTER DELETE ON {table}
+BEGIN{log(table, "delete", "OLD", columns)}
+END
+"""
+        )
+        # Both sides, as an update can move a row to another account or category.
+        con.execute(
+            f"""
+CREATE TRIGGER IF NOT EXISTS {table}_log_update AFTER UPDATE ON {table}
+BEGIN{log(table, "update", "OLD", columns)}{log(table, "update", "NEW", columns)}
+END
+"""
+        )
+
+
+MIGRATIONS = [
+    add_query_indexes,
+    add_account_balances,
+    add_balance_checkpoints,
+    add_budget_transaction_category,
+    cover_category_totals,
+    add_import_hash,
+    key_budget_funding_by_period,
+    amounts_in_minor_units,
+    dates_as_day_numbers,
+    add_transaction_search,
+    add_recurring_rules,
+    add_changed_months,
+    add_change_log,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def current_version(con):
+    return con.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(con):
+    """
+    Bring the database up to SCHEMA_VERSION. Returns the version the file
+    was at before migrating.
+    """
+    start_version = current_version(con)
+    if start_version > SCHEMA_VERSION:
+        logger.warning(
+            "Database schema version %s is newer than this app (%s); not migrating",
+            start_version,
+            SCHEMA_VERSION,
+        )
+        return start_version
+
+    if con.in_transaction:
+        con.commit()
+    for version in range(start_version + 1, SCHEMA_VERSION + 1):
+        migration = MIGRATIONS[version - 1]
+        logger.info("Migrating database to version %s: %s", version, migration.__name__)
+        con.execute("BEGIN")
+        try:
+            migration(con)
+            # PRAGMA does not take bound parameters; version is always an int.
+            con.execute(f"PRAGMA user_version = {int(version)}")
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+    return start_version
+
+
+# The queries the app runs most, with the index each of them should use.
+HOT_QUERIES = [
+    (
+        "transaction list, first page",
+        pagination.TRANSACTION_PAGE_SQL.format(where=""),
+        [200],
+        "idx_transactions_date_id",
+    ),
+    (
+        "transaction list, next page",
+        pagination.TRANSACTION_PAGE_SQL.format(where="WHERE (t.date, t.id) > (?, ?)"),
+        [0, 0, 200],
+        "idx_transactions_date_id",
+    ),
+    (
+        "transaction list, date range",
+        pagination.TRANSACTION_PAGE_SQL.format(
+            where="WHERE t.date >= ? AND t.date <= ? AND (t.date, t.id) > (?, ?)"
+        ),
+        [0, 0, 0, 0, 200],
+        "idx_transactions_date_id (date>? AND date<?)",
+    ),
+    (
+        "transactions for an account",
+        "SELECT id, amount, date FROM transactions WHERE account_id = ? ORDER BY date",
+        [1],
+        "idx_transactions_account_date",
+    ),
+    (
+        "transactions in a budget category",
+        "SELECT spending_category_id, SUM(amount) FROM transactions WHERE budget_category_id = ? GROUP BY spending_category_id",
+        [1],
+        "idx_transactions_categories",
+    ),
+    (
+        "category rollups",
+        rollups.CATEGORY_TOTALS_SQL,
+        [],
+        "COVERING INDEX idx_transactions_categories",
+    ),
+    (
+        "spending pivot",
+        pivot.PIVOT_SQL,
+        [0, 0],
+        "idx_transactions_date_id (date>? AND date<?)",
+    ),
+    (
+        "categories table",
+        "SELECT b.name, s.name FROM budget_categories b LEFT JOIN spending_categories s ON s.parent_category_id = b.id",
+        [],
+        "idx_spending_categories_parent",
+    ),
+]
+
+
+def check_query_plans(con):
+    """
+    Run EXPLAIN QUERY PLAN over HOT_QUERIES and return a list of
+    (query name, plan) for each query that does not use its index.
+    """
+    problems = []
+    for name, sql, params, index_name in HOT_QUERIES:
+        try:
+            plan_rows = con.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        except sqlite3.OperationalError as error:
+            problems.append((name, str(error)))
+            continue
+        plan = "; ".join(row[-1] for row in plan_rows)
+        if index_name not in plan:
+            problems.append((name, plan))
+    return problems
+
+
+def prepare(con, new_database=False):
+    """
+    Make a budget file ready to use: create the schema if it is new, bring
+    it up to the current version, fill in any missing checkpoints and trim
+    the change log.
+    """
+    if new_database:
+        logger.info("Creating new budget database")
+        create_schema(con)
+        con.commit()
+    migrate(con)
+    for query_name, plan in check_query_plans(con):
+        logger.warning("Query '%s' is not using its index: %s", query_name, plan)
+    checkpoints.build_checkpoints(con)
+    changelog.prune(con)
+    con.commit()
@@ -0,0 +1,184 @@
+"""
+Money amounts and their display.
+
+Amounts are stored as whole numbers of minor units (cents): 1234 is $12.34.
+``to_minor`` turns what the user typed, or what a statement says, into
+minor units without going through a float.
+
+MoneyFormatter reads the locale's currency conventions once, when it is
+made, and formats amounts from them the way ``locale.currency(...,
+grouping=True)`` would. ``format_many`` renders a page of amounts in one
+go; with NumPy installed the sign and unit split is done on the whole page
+at once and each distinct amount is only formatted once.
+"""
+
+import locale
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+MINOR_UNITS = 100
+FRACTION_DIGITS = 2
+
+# Used when the current locale has no currency conventions (the C locale).
+US_CONVENTIONS = {
+    "currency_symbol": "$",
+    "mon_decimal_point": ".",
+    "mon_thousands_sep": ",",
+    "mon_grouping": [3, 3, 0],
+    "positive_sign": "",
+    "negative_sign": "-",
+    "frac_digits": 2,
+    "p_cs_precedes": 1,
+    "p_sep_by_space": 0,
+    "n_cs_precedes": 1,
+    "n_sep_by_space": 0,
+    "p_sign_posn": 1,
+    "n_sign_posn": 1,
+}
+
+# localeconv's CHAR_MAX: the value is not set, or grouping stops here.
+CHAR_MAX = 127
+
+_numpy = None
+
+
+def optional_numpy():
+    """The numpy module, or None if it is not installed."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            _numpy = False
+        else:
+            _numpy = numpy
+    return _numpy or None
+
+
+def to_minor(value):
+    """
+    Minor units for an amount given as a Decimal, int, float or text such
+    as "-12.34". Half a cent rounds away from zero.
+    """
+    if value is None:
+        raise ValueError("No amount given")
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"Unrecognised amount {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Unrecognised amount {value!r}")
+    return int((amount * MINOR_UNITS).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def from_minor(amount):
+    """The amount in major units, as an exact Decimal."""
+    return Decimal(amount).scaleb(-FRACTION_DIGITS)
+
+
+def _template(conv, symbol, negative):
+    # The same assembly as locale.currency, with "{}" where the number goes.
+    prefix = "n_" if negative else "p_"
+    text = "<{}>"
+    separator = " " if conv[prefix + "sep_by_space"] == 1 else ""
+    if conv[prefix + "cs_precedes"]:
+        text = symbol + separator + text
+    else:
+        text = text + separator + symbol
+    sign = conv["negative_sign" if negative else "positive_sign"]
+    sign_position = conv[prefix + "sign_posn"]
+    if sign_position == 0:
+        text = "(" + text + ")"
+    elif sign_position == 2:
+        text = text + sign
+    elif sign_position == 3:
+        text = text.replace("<", sign)
+    elif sign_position == 4:
+        text = text.replace(">", sign)
+    else:
+        text = sign + text
+    return text.replace("<", "").replace(">", "")
+
+
+class MoneyFormatter:
+    def __init__(self, conv=None):
+        if conv is None:
+            conv = locale.localeconv()
+        if conv["frac_digits"] == CHAR_MAX:
+            conv = US_CONVENTIONS
+        self.digits = conv["frac_digits"]
+        self.point = conv["mon_decimal_point"] or "."
+        self.separator = conv["mon_thousands_sep"]
+        self.grouping = list(conv["mon_grouping"])
+        self.positive = _template(conv, conv["currency_symbol"], False)
+        self.negative = _template(conv, conv["currency_symbol"], True)
+        # Amounts are stored in hundredths; a locale that shows another
+        # number of digits gets them rounded or padded.
+        self.shift = FRACTION_DIGITS - self.digits
+        # Most locales group in threes all the way, which str.format does.
+        self.threes = self.grouping[:1] == [3] and all(size in (0, 3) for size in self.grouping)
+
+    def _group(self, units):
+        if not self.separator or not self.grouping:
+            return str(units)
+        if self.threes:
+            return f"{units:,}".replace(",", self.separator)
+        digits = str(units)
+        groups = []
+        size = None
+        for entry in self.grouping:
+            if entry == CHAR_MAX:
+                break
+            if entry != 0:
+                size = entry
+            if len(digits) <= size:
+                break
+            groups.append(digits[-size:])
+            digits = digits[:-size]
+            if entry == 0:
+                break
+        if size and self.grouping[-1] == 0:
+            while len(digits) > size:
+                groups.append(digits[-size:])
+                digits = digits[:-size]
+        groups.append(digits)
+        return self.separator.join(reversed(groups))
+
+    def _split(self, amount):
+        # (units, fraction) of a non-negative amount in minor units.
+        if self.shift > 0:
+            scale = 10**self.shift
+            amount = (amount + scale // 2) // scale
+        elif self.shift < 0:
+            amount *= 10**-self.shift
+        return divmod(amount, 10**self.digits)
+
+    def _number(self, units, fraction):
+        if self.digits:
+            return f"{self._group(units)}{self.point}{fraction:0{self.digits}d}"
+        return self._group(units)
+
+    def format(self, amount):
+        """Text for an amount in minor units, as locale.currency would give it."""
+        template = self.negative if amount < 0 else self.positive
+        return template.format(self._number(*self._split(abs(amount))))
+
+    def format_many(self, amounts):
+        """Text for each of a sequence of amounts in minor units."""
+        np = optional_numpy()
+        if len(amounts) < 2 or np is None:
+            return [self.format(amount) for amount in amounts]
+        values, positions = np.unique(np.asarray(amounts, dtype=np.int64), return_inverse=True)
+        magnitudes = np.abs(values)
+        if self.shift > 0:
+            scale = 10**self.shift
+            magnitudes = (magnitudes + scale // 2) // scale
+        elif self.shift < 0:
+            magnitudes = magnitudes * 10**-self.shift
+        units, fractions = np.divmod(magnitudes, 10**self.digits)
+        texts = [
+            (self.negative if negative else self.positive).format(self._number(unit, fraction))
+            for negative, unit, fraction in zip(
+                (values < 0).tolist(), units.tolist(), fractions.tolist()
+            )
+        ]
+        return np.array(texts, dtype=object)[positions.reshape(-1)].tolist()
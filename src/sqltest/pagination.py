@@ -0,0 +1,105 @@
+"""
+Keyset pagination over the transaction ledger.
+
+Pages are read in ``(date, id)`` order. Each page continues from the key of
+the last row already returned, so reading page N costs the same as reading
+page 1 no matter how large the ledger is. A date range narrows the same
+seek on the ``(date, id)`` index; dates come back as day numbers, for the
+caller to format a page at a time.
+"""
+
+TRANSACTION_PAGE_SQL = """
+SELECT t.id, t.amount, t.date, t.account_id,
+       t.merchant, t.description, t.notes, b.name, s.name
+FROM transactions t
+LEFT JOIN budget_categories b ON b.id = t.budget_category_id
+LEFT JOIN spending_categories s ON s.id = t.spending_category_id
+{where}
+ORDER BY t.date, t.id
+LIMIT ?
+"""
+
+# Column positions in rows returned by TransactionPager.next_page
+ID = 0
+AMOUNT = 1
+DATE = 2
+ACCOUNT_ID = 3
+MERCHANT = 4
+DESCRIPTION = 5
+NOTES = 6
+BUDGET_CATEGORY = 7
+SPENDING_CATEGORY = 8
+
+
+class TransactionPager:
+    """
+    Hands out successive pages of transactions, oldest first.
+
+    Uncategorized transactions and transfers are included; their category
+    columns are None. ``start`` and ``end`` are day numbers, both inclusive;
+    either may be None.
+    """
+
+    def __init__(self, page_size=200, start=None, end=None):
+        self.page_size = page_size
+        self.start = start
+        self.end = end
+        self.reset()
+
+    def reset(self):
+        """Start again from the first page."""
+        self.last_key = None
+        self.exhausted = False
+
+    def _range(self):
+        clauses = []
+        params = []
+        if self.start is not None:
+            clauses.append("t.date >= ?")
+            params.append(self.start)
+        if self.end is not None:
+            clauses.append("t.date <= ?")
+            params.append(self.end)
+        return clauses, params
+
+    def next_page(self, con):
+        """Return the next page of rows, or an empty list once exhausted."""
+        if self.exhausted:
+            return []
+
+        clauses, params = self._range()
+        if self.last_key is not None:
+            clauses.append("(t.date, t.id) > (?, ?)")
+            params.extend(self.last_key)
+        params.append(self.page_size)
+        where = "WHERE " + " AND ".join(clauses) if clauses else ""
+
+        cur = con.cursor()
+        rows = cur.execute(TRANSACTION_PAGE_SQL.format(where=where), params).fetchall()
+        cur.close()
+
+        if len(rows) < self.page_size:
+            self.exhausted = True
+        if rows:
+            last = rows[-1]
+            self.last_key = (last[DATE], last[ID])
+        return rows
+
+    def loaded_rows(self, con, ids):
+        """
+        The rows with these ids that belong in the pages handed out so far:
+        in the date range, and not past the last key returned. One query,
+        however many pages have been read; rows that are gone, or now fall
+        outside, are left out.
+        """
+        if not ids or (self.last_key is None and not self.exhausted):
+            return []
+        clauses, params = self._range()
+        clauses.append(f"t.id IN ({', '.join('?' * len(ids))})")
+        params.extend(ids)
+        if not self.exhausted:
+            clauses.append("(t.date, t.id) <= (?, ?)")
+            params.extend(self.last_key)
+        params.append(len(ids))
+        where = "WHERE " + " AND ".join(clauses)
+        return con.execute(TRANSACTION_PAGE_SQL.format(where=where), params).fetchall()
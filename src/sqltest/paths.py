@@ -0,0 +1,39 @@
+"""
+Where the budget file lives.
+
+The GUI keeps it in Toga's per-user data directory. The command line finds
+the same file without importing Toga, so the platform rules are repeated
+here from the Toga backends the app is built with. ``CASHFLOWER_DB``
+overrides both.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+DB_ENV = "CASHFLOWER_DB"
+DB_NAME = "budget"
+
+# The app's metadata, as in pyproject.toml.
+APP_ID = "com.example.sqltest"
+APP_NAME = "sqltest"
+FORMAL_NAME = "Cashflower"
+AUTHOR = "Kenny Drobnack"
+
+
+def default_data_dir(platform=sys.platform):
+    """The data directory Toga gives the app on this platform."""
+    if platform == "darwin":
+        return Path.home() / "Library" / "Application Support" / APP_ID
+    if platform == "win32":
+        return Path.home() / "AppData" / "Local" / AUTHOR / FORMAL_NAME / "Data"
+    return Path.home() / ".local" / "share" / APP_NAME
+
+
+def budget_path(data_dir=None, environ=os.environ):
+    """The budget file: $CASHFLOWER_DB if set, otherwise ``budget`` in the data directory."""
+    if environ.get(DB_ENV):
+        return Path(environ[DB_ENV])
+    if data_dir is None:
+        data_dir = default_data_dir()
+    return Path(data_dir) / DB_NAME
@@ -0,0 +1,191 @@
+"""
+Spending per category and month.
+
+``spending_pivot`` sums what was spent in each budget and spending category
+in each month of a window with one grouped pass over ``transactions`` (or
+over a ``sqltest.snapshot.LedgerSnapshot``), and lays it out as a row per
+category with a column per month. Months are numbered from January 1970,
+as the snapshot numbers them.
+
+``PivotCache`` keeps the last few windows asked for, and serves them again
+until ``change_log`` gains an entry (see ``sqltest.changelog``; its last
+sequence number means the same on every connection, so the reader threads
+share one cache). Then it asks ``changed_months``, which the triggers on ``transactions`` stamp with the
+month of every row written, which months of the window have changed since,
+and groups only those again.
+"""
+
+import threading
+from collections import OrderedDict
+
+from sqltest.changelog import latest
+from sqltest.dates import month_start, to_date
+from sqltest.rollups import CATEGORY_NAMES_SQL
+
+MONTH_SQL = """(CAST(strftime('%Y', date * 86400, 'unixepoch') AS INTEGER) - 1970) * 12
+     + CAST(strftime('%m', date * 86400, 'unixepoch') AS INTEGER) - 1"""
+
+PIVOT_SQL = f"""
+SELECT budget_category_id, spending_category_id, {MONTH_SQL}, -SUM(amount)
+FROM transactions
+WHERE transaction_type != 'Transfer' AND amount < 0 AND date >= ? AND date <= ?
+GROUP BY 1, 2, 3
+"""
+
+CHANGE_SEQ_SQL = "SELECT COALESCE(MAX(change_seq), 0) FROM changed_months"
+
+
+def month_number(day):
+    """The month a datetime.date falls in, counted from January 1970."""
+    return (day.year - 1970) * 12 + day.month - 1
+
+
+def month_day(month):
+    """The day number of the first day of a month."""
+    year, index = divmod(month, 12)
+    return month_start(1970 + year, index + 1)
+
+
+def month_label(month):
+    """"YYYY-MM" text for a month."""
+    return to_date(month_day(month)).strftime("%Y-%m")
+
+
+def month_totals(con, first_month, last_month, snapshot=None):
+    """
+    What was spent from ``first_month`` to ``last_month`` (both inclusive),
+    as {(budget_category_id, spending_category_id, month): amount}.
+    Only debits count as spending; transfers and credits are left out.
+    """
+    first_day, last_day = month_day(first_month), month_day(last_month + 1) - 1
+    if snapshot is None:
+        rows = con.execute(PIVOT_SQL, [first_day, last_day])
+    else:
+        snapshot.refresh(con)
+        rows = [
+            (budget_category_id or None, spending_category_id or None, month, -total)
+            for budget_category_id, spending_category_id, month, total, _ in snapshot.totals(
+                ("budget_category_id", "spending_category_id", "month"), first_day, last_day, transfers=False, debits=True
+            )
+        ]
+    return {(budget_id, spending_id, month): spent for budget_id, spending_id, month, spent in rows}
+
+
+def pivot_rows(con, cells, first_month, months):
+    """
+    Table rows of (budget category, spending category, one amount per
+    month, total). Each budget category has a total row, with an empty
+    spending category, followed by a row per spending category.
+    """
+    by_category = {}
+    for (budget_category_id, spending_category_id, month), spent in cells.items():
+        index = month - first_month
+        for key in ((budget_category_id, None), (budget_category_id, spending_category_id)):
+            amounts = by_category.setdefault(key, [0] * months)
+            amounts[index] += spent
+            if spending_category_id is None:
+                break
+
+    rows = []
+    current_budget_id = None
+    for budget_id, budget_name, spending_id, spending_name in con.execute(CATEGORY_NAMES_SQL):
+        if budget_id != current_budget_id:
+            current_budget_id = budget_id
+            amounts = by_category.get((budget_id, None), [0] * months)
+            rows.append((budget_name, "", *amounts, sum(amounts)))
+        if spending_id is not None:
+            amounts = by_category.get((budget_id, spending_id), [0] * months)
+            rows.append((budget_name, spending_name, *amounts, sum(amounts)))
+    return rows
+
+
+def spending_pivot(con, first_month, months, snapshot=None):
+    """pivot_rows for ``months`` months from ``first_month``, uncached."""
+    cells = month_totals(con, first_month, first_month + months - 1, snapshot)
+    return pivot_rows(con, cells, first_month, months)
+
+
+def mark_inserted(con, after_id):
+    """
+    Stamp ``changed_months`` for transactions with ids above ``after_id``.
+    Used after a bulk load, which runs without the per-row triggers; every
+    month from the earliest new date to the latest is marked.
+    """
+    first_day, last_day = con.execute(
+        "SELECT MIN(date), MAX(date) FROM transactions WHERE id > ?", [after_id]
+    ).fetchone()
+    if first_day is None:
+        return
+    change_seq = con.execute(CHANGE_SEQ_SQL).fetchone()[0] + 1
+    first_month, last_month = month_number(to_date(first_day)), month_number(to_date(last_day))
+    con.executemany(
+        """
+INSERT INTO changed_months (month, change_seq) VALUES (?, ?)
+ON CONFLICT (month) DO UPDATE SET change_seq = excluded.change_seq
+""",
+        [(month, change_seq) for month in range(first_month, last_month + 1)],
+    )
+
+
+def runs(months):
+    """Sorted month numbers as [first, last] runs of consecutive months."""
+    spans = []
+    for month in months:
+        if spans and spans[-1][1] == month - 1:
+            spans[-1][1] = month
+        else:
+            spans.append([month, month])
+    return spans
+
+
+class PivotCache:
+    """
+    Caches spending_pivot by window, for the ``size`` windows used last.
+    A window is served from memory until the database changes, and then
+    only its changed months are grouped again.
+    """
+
+    def __init__(self, snapshot=None, size=8):
+        self.snapshot = snapshot
+        self.size = size
+        # (first_month, months) -> [version, change_seq, cells, rows]
+        self.windows = OrderedDict()
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.windows.clear()
+
+    def get(self, con, first_month, months):
+        with self.lock:
+            key = (first_month, months)
+            last_month = first_month + months - 1
+            version = latest(con)
+            window = self.windows.pop(key, None)
+            if window is None:
+                change_seq = con.execute(CHANGE_SEQ_SQL).fetchone()[0]
+                cells = month_totals(con, first_month, last_month, self.snapshot)
+                window = [version, change_seq, cells, pivot_rows(con, cells, first_month, months)]
+            elif window[0] != version:
+                _, seen, cells, _ = window
+                # Read before regrouping: a write from another process in
+                # between is then picked up next time rather than missed.
+                change_seq = con.execute(CHANGE_SEQ_SQL).fetchone()[0]
+                changed = [
+                    month
+                    for month, in con.execute(
+                        "SELECT month FROM changed_months WHERE change_seq > ? AND month BETWEEN ? AND ? ORDER BY month",
+                        [seen, first_month, last_month],
+                    )
+                ]
+                for first, last in runs(changed):
+                    for cell in [cell for cell in cells if first <= cell[2] <= last]:
+                        del cells[cell]
+                    cells.update(month_totals(con, first, last, self.snapshot))
+                # Categories may have been added or renamed, so the rows are
+                # laid out again even when no month changed.
+                window = [version, change_seq, cells, pivot_rows(con, cells, first_month, months)]
+            self.windows[key] = window
+            while len(self.windows) > self.size:
+                self.windows.popitem(last=False)
+            return window[3]
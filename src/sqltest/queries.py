@@ -0,0 +1,56 @@
+"""
+Reads and writes behind the app's forms and lists.
+
+Every function takes an open connection as its first argument, so it can be
+handed to the DataService and run on the database thread. Writers do not
+commit; the caller decides where the transaction ends.
+"""
+
+TRANSACTION_INSERT_SQL = """
+INSERT INTO transactions (date, transaction_type, amount, account_id, merchant, description, notes, budget_category_id, spending_category_id, transfer_account_id)
+values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def get_budget_categories(con):
+    """Return (id, name) for every budget category, ordered by name."""
+    return con.execute("SELECT id, name FROM budget_categories ORDER BY Name").fetchall()
+
+
+def get_spending_categories(con):
+    """Return (id, name, parent_category_id) for every spending category."""
+    return con.execute(
+        "SELECT id, name, parent_category_id FROM spending_categories ORDER BY Name"
+    ).fetchall()
+
+
+def add_account(con, name, account_type):
+    return con.execute(
+        "INSERT INTO accounts (name, account_type) values (?, ?)", (name, account_type)
+    ).lastrowid
+
+
+def add_budget_category(con, name):
+    return con.execute(
+        "INSERT INTO budget_categories (name) values (?)", [name]
+    ).lastrowid
+
+
+def add_spending_category(con, name, parent_category_id):
+    return con.execute(
+        "INSERT INTO spending_categories (name, parent_category_id) values (?, ?)",
+        [name, parent_category_id],
+    ).lastrowid
+
+
+def add_transaction(con, values, transfer_values=None):
+    """
+    Insert a transaction given as a tuple in TRANSACTION_INSERT_SQL order.
+    For a transfer, ``transfer_values`` is the other side, written in the
+    same transaction. Returns the new row ids.
+    """
+    ids = [con.execute(TRANSACTION_INSERT_SQL, values).lastrowid]
+    if transfer_values is not None:
+        ids.append(con.execute(TRANSACTION_INSERT_SQL, transfer_values).lastrowid)
+    return ids
+
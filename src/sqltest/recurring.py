@@ -0,0 +1,249 @@
+"""
+Recurring transactions.
+
+A row of ``recurring_rules`` is a transaction that repeats: rent on the
+1st of every month, pay every other Friday. Rules are never expanded into
+rows for dates still to come. ``RecurringRule.occurrences`` yields the
+dates in whatever window is asked for, one at a time, and the forecast
+expands every rule at once with NumPy (``sqltest.forecast``); both place a
+monthly rule that starts on the 31st on the last day of shorter months.
+
+``post_due`` writes the occurrences that have come due as ordinary
+transactions, all of them with one executemany in the caller's
+transaction, and moves each rule's ``posted_through`` up to the day it
+posted to, so nothing is posted twice.
+"""
+
+import calendar
+
+from sqltest import dates, forecast, queries
+
+FREQUENCIES = list(forecast.FREQUENCIES)
+
+RULE_COLUMNS = """
+id, account_id, amount, transaction_type, frequency, interval, start_date, until_date,
+merchant, description, notes, budget_category_id, spending_category_id, transfer_account_id, posted_through
+"""
+
+
+class RecurringRule:
+    def __init__(
+        self,
+        id,
+        account_id,
+        amount,
+        transaction_type,
+        frequency,
+        interval,
+        start_date,
+        until_date=None,
+        merchant=None,
+        description=None,
+        notes=None,
+        budget_category_id=None,
+        spending_category_id=None,
+        transfer_account_id=None,
+        posted_through=None,
+    ):
+        self.id = id
+        self.account_id = account_id
+        self.amount = amount
+        self.transaction_type = transaction_type
+        self.frequency = frequency
+        self.interval = interval
+        self.start_date = start_date
+        self.until_date = until_date
+        self.merchant = merchant
+        self.description = description
+        self.notes = notes
+        self.budget_category_id = budget_category_id
+        self.spending_category_id = spending_category_id
+        self.transfer_account_id = transfer_account_id
+        self.posted_through = posted_through
+
+    def occurrences(self, first_day=None, last_day=None):
+        """
+        Yield the day numbers the rule falls on from ``first_day`` to
+        ``last_day``, both inclusive. Without a ``last_day`` it goes on to
+        the rule's end date, or for ever.
+        """
+        if first_day is None or first_day < self.start_date:
+            first_day = self.start_date
+        if self.until_date is not None and (last_day is None or self.until_date < last_day):
+            last_day = self.until_date
+        in_months, size = forecast.FREQUENCIES[self.frequency]
+        step = self.interval * size
+
+        if not in_months:
+            day = self.start_date + -((self.start_date - first_day) // step) * step
+            while last_day is None or day <= last_day:
+                yield day
+                day += step
+            return
+
+        start = dates.to_date(self.start_date)
+        first = dates.to_date(first_day)
+        start_month = start.year * 12 + start.month - 1
+        month = start_month + max(0, -((start_month - (first.year * 12 + first.month - 1)) // step)) * step
+        while True:
+            year, month_index = divmod(month, 12)
+            days_in_month = calendar.monthrange(year, month_index + 1)[1]
+            day = dates.month_start(year, month_index + 1) + min(start.day, days_in_month) - 1
+            if last_day is not None and day > last_day:
+                return
+            if day >= first_day:
+                yield day
+            month += step
+
+    def due(self, today):
+        """The occurrences not yet posted, up to and including ``today``."""
+        first_day = None if self.posted_through is None else self.posted_through + 1
+        return self.occurrences(first_day, today)
+
+    def transactions(self, day):
+        """
+        The transaction rows for an occurrence, in TRANSACTION_INSERT_SQL
+        order: one, or both sides of a transfer.
+        """
+        rows = [
+            (
+                day,
+                self.transaction_type,
+                self.amount,
+                self.account_id,
+                self.merchant,
+                self.description,
+                self.notes,
+                self.budget_category_id,
+                self.spending_category_id,
+                self.transfer_account_id,
+            )
+        ]
+        if self.transfer_account_id is not None:
+            rows.append(
+                (
+                    day,
+                    self.transaction_type,
+                    -self.amount,
+                    self.transfer_account_id,
+                    self.merchant,
+                    self.description,
+                    self.notes,
+                    self.budget_category_id,
+                    self.spending_category_id,
+                    self.account_id,
+                )
+            )
+        return rows
+
+    def forecast_rules(self):
+        """The rule in the form ``sqltest.forecast`` takes, once per account it moves money in."""
+        rules = [
+            (
+                self.account_id,
+                self.amount,
+                self.frequency,
+                self.interval,
+                self.start_date,
+                self.until_date,
+                self.posted_through,
+            )
+        ]
+        if self.transfer_account_id is not None:
+            rules.append(
+                (
+                    self.transfer_account_id,
+                    -self.amount,
+                    self.frequency,
+                    self.interval,
+                    self.start_date,
+                    self.until_date,
+                    self.posted_through,
+                )
+            )
+        return rules
+
+
+def add_rule(
+    con,
+    account_id,
+    amount,
+    frequency,
+    start_date,
+    interval=1,
+    until_date=None,
+    transaction_type="Debit",
+    merchant=None,
+    description=None,
+    notes=None,
+    budget_category_id=None,
+    spending_category_id=None,
+    transfer_account_id=None,
+):
+    """Add a rule; nothing is posted until ``post_due`` runs. Returns the new id."""
+    if frequency not in forecast.FREQUENCIES:
+        raise ValueError(f"Unknown frequency {frequency!r}")
+    if interval < 1:
+        raise ValueError("A rule must repeat at least every 1 period")
+    return con.execute(
+        """
+INSERT INTO recurring_rules (account_id, amount, transaction_type, frequency, interval, start_date, until_date,
+                             merchant, description, notes, budget_category_id, spending_category_id, transfer_account_id)
+values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+""",
+        [
+            account_id,
+            amount,
+            transaction_type,
+            frequency,
+            interval,
+            start_date,
+            until_date,
+            merchant,
+            description,
+            notes,
+            budget_category_id,
+            spending_category_id,
+            transfer_account_id,
+        ],
+    ).lastrowid
+
+
+def delete_rule(con, rule_id):
+    """Stop a rule; what it has already posted stays in the ledger."""
+    con.execute("DELETE FROM recurring_rules WHERE id = ?", [rule_id])
+
+
+def load_rules(con):
+    return [RecurringRule(*row) for row in con.execute(f"SELECT {RULE_COLUMNS} FROM recurring_rules ORDER BY id")]
+
+
+def forecast_rules(con):
+    """Every rule, in the form ``sqltest.forecast.forecast`` takes."""
+    return [rule for recurring_rule in load_rules(con) for rule in recurring_rule.forecast_rules()]
+
+
+def forecast_ledger(con, days=forecast.DAYS, first_day=None, snapshot=None):
+    """``sqltest.forecast.forecast`` with the rules in the budget file."""
+    return forecast.forecast(con, forecast_rules(con), days, first_day, snapshot)
+
+
+def post_due(con, today=None):
+    """
+    Insert every occurrence due by ``today`` (a day number, today by
+    default) that has not been posted yet. Does not commit. Returns the
+    number of transactions written.
+    """
+    if today is None:
+        today = dates.today()
+    rows = []
+    posted = []
+    for rule in load_rules(con):
+        if rule.posted_through is not None and rule.posted_through >= today:
+            continue
+        for day in rule.due(today):
+            rows.extend(rule.transactions(day))
+        posted.append((today, rule.id))
+    con.executemany(queries.TRANSACTION_INSERT_SQL, rows)
+    con.executemany("UPDATE recurring_rules SET posted_through = ? WHERE id = ?", posted)
+    return len(rows)
@@ -0,0 +1,62 @@
+"""
+In-memory copy of the small tables every window reads: accounts, budget
+categories and spending categories.
+
+Each part is read once and kept until a write that changes it invalidates
+it, so switching windows does not query the database again. Spending
+categories are also indexed by their parent budget category.
+"""
+
+from sqltest import balances, queries
+
+
+class ReferenceData:
+    def __init__(self):
+        self.accounts = None
+        self.budget_categories = None
+        self.spending_categories = None
+        self.spending_by_parent = {}
+
+    def loaded(self):
+        return (
+            self.accounts is not None
+            and self.budget_categories is not None
+            and self.spending_categories is not None
+        )
+
+    def load(self, con):
+        """Read whatever is not cached. Runs on the database thread."""
+        if self.accounts is None:
+            self.accounts = balances.get_account_balances(con)
+        if self.budget_categories is None:
+            self.budget_categories = queries.get_budget_categories(con)
+        if self.spending_categories is None:
+            spending_categories = queries.get_spending_categories(con)
+            spending_by_parent = {}
+            for row in spending_categories:
+                if row[2]:
+                    spending_by_parent.setdefault(row[2], []).append(row)
+            self.spending_categories = spending_categories
+            self.spending_by_parent = spending_by_parent
+
+    def children(self, budget_category_id):
+        """The (id, name, parent_category_id) rows under a budget category, by name."""
+        return self.spending_by_parent.get(budget_category_id, [])
+
+    def update_accounts(self, rows):
+        """Put in new (id, name, balance) rows for some accounts, if accounts are cached."""
+        if self.accounts is None:
+            return
+        updated = {row[0]: row for row in rows}
+        self.accounts = [updated.get(row[0], row) for row in self.accounts]
+
+    def invalidate_accounts(self):
+        """An account was added, or a balance changed."""
+        self.accounts = None
+
+    def invalidate_budget_categories(self):
+        self.budget_categories = None
+
+    def invalidate_spending_categories(self):
+        self.spending_categories = None
+        self.spending_by_parent = {}
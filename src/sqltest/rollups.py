@@ -0,0 +1,133 @@
+"""
+Spent and remaining amounts per budget and spending category.
+
+What was spent is the sum of the debits (amounts below zero, transfers
+aside); credits such as refunds or a starting balance are not counted.
+All the totals come from one grouped statement over ``transactions`` and
+``budget_transactions``; the result is cached until the change log moves on.
+Given a ``sqltest.snapshot.LedgerSnapshot``, the spending totals are
+grouped in memory instead, and only the funding is read with SQL.
+"""
+
+import threading
+
+from sqltest.changelog import latest
+
+CATEGORY_NAMES_SQL = """
+SELECT b.id, b.name, s.id, s.name
+FROM budget_categories b LEFT JOIN spending_categories s ON s.parent_category_id = b.id
+ORDER BY b.name, b.id, s.name
+"""
+
+CATEGORY_TOTALS_SQL = """
+SELECT 'spent', budget_category_id, spending_category_id, -SUM(amount)
+FROM transactions
+WHERE transaction_type != 'Transfer' AND amount < 0
+GROUP BY budget_category_id, spending_category_id
+UNION ALL
+SELECT 'funded', budget_category_id, NULL, SUM(amount)
+FROM budget_transactions
+GROUP BY budget_category_id
+"""
+
+
+# CATEGORY_TOTALS_SQL for some budget categories; {ids} is their placeholders.
+BUDGET_TOTALS_SQL = """
+SELECT 'spent', budget_category_id, spending_category_id, -SUM(amount)
+FROM transactions
+WHERE transaction_type != 'Transfer' AND amount < 0 AND budget_category_id IN ({ids})
+GROUP BY budget_category_id, spending_category_id
+UNION ALL
+SELECT 'funded', budget_category_id, NULL, SUM(amount)
+FROM budget_transactions
+WHERE budget_category_id IN ({ids})
+GROUP BY budget_category_id
+"""
+
+FUNDED_TOTALS_SQL = """
+SELECT 'funded', budget_category_id, NULL, SUM(amount)
+FROM budget_transactions
+GROUP BY budget_category_id
+"""
+
+
+def snapshot_totals(con, snapshot):
+    """CATEGORY_TOTALS_SQL's rows, with the spending side from the snapshot."""
+    snapshot.refresh(con)
+    rows = [
+        ("spent", budget_category_id or None, spending_category_id or None, -total)
+        for budget_category_id, spending_category_id, total, _ in snapshot.totals(
+            ("budget_category_id", "spending_category_id"), transfers=False, debits=True
+        )
+    ]
+    return rows + con.execute(FUNDED_TOTALS_SQL).fetchall()
+
+
+def category_rollups(con, snapshot=None, budget_category_ids=None):
+    """
+    Return table rows of (budget category, spending category, amount
+    remaining, amount spent). Each budget category has a total row, with an
+    empty spending category, followed by a row per spending category.
+    Given ``budget_category_ids``, only the rows of those budget categories
+    are worked out, from the category index rather than the snapshot.
+    """
+    spent = {}
+    budget_spent = {}
+    funded = {}
+    if budget_category_ids is not None:
+        budget_category_ids = list(budget_category_ids)
+        placeholders = ", ".join("?" * len(budget_category_ids))
+        totals = con.execute(BUDGET_TOTALS_SQL.format(ids=placeholders), budget_category_ids * 2)
+    elif snapshot is None:
+        totals = con.execute(CATEGORY_TOTALS_SQL)
+    else:
+        totals = snapshot_totals(con, snapshot)
+    for kind, budget_category_id, spending_category_id, amount in totals:
+        if kind == "funded":
+            funded[budget_category_id] = amount
+        else:
+            spent[(budget_category_id, spending_category_id)] = amount
+            budget_spent[budget_category_id] = (
+                budget_spent.get(budget_category_id, 0) + amount
+            )
+
+    rows = []
+    current_budget_id = None
+    for budget_id, budget_name, spending_id, spending_name in con.execute(
+        CATEGORY_NAMES_SQL
+    ):
+        if budget_category_ids is not None and budget_id not in budget_category_ids:
+            continue
+        if budget_id != current_budget_id:
+            current_budget_id = budget_id
+            total_spent = budget_spent.get(budget_id, 0)
+            rows.append(
+                (budget_name, "", funded.get(budget_id, 0) - total_spent, total_spent)
+            )
+        if spending_id is not None:
+            rows.append(
+                (budget_name, spending_name, None, spent.get((budget_id, spending_id), 0))
+            )
+    return rows
+
+
+class CategoryRollups:
+    """
+    Caches category_rollups until ``change_log`` gains an entry. Its last
+    sequence number is the same on every connection, so one cache serves
+    all the reader threads; they take turns.
+    """
+
+    def __init__(self, snapshot=None):
+        self.snapshot = snapshot
+        self.version = None
+        self.rows = None
+        self.lock = threading.Lock()
+
+    def get(self, con):
+        with self.lock:
+            version = latest(con)
+            if self.rows is None or version != self.version:
+                self.rows = category_rollups(con, self.snapshot)
+                self.version = version
+            return self.rows
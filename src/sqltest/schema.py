@@ -0,0 +1,98 @@
+"""
+Schema for a new, empty budget database.
+"""
+
+import datetime
+import time
+
+
+def create_schema(con):
+    """
+    Create the budget tables on an open connection and seed the
+    system categories and starting accounts.
+    """
+    cur = con.cursor()
+    cur.execute(
+        """
+CREATE TABLE accounts (
+    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+	name TEXT,
+	account_type TEXT DEFAULT ('Checking') NOT NULL
+);
+                    """
+    )
+    cur.execute(
+        """
+CREATE TABLE budget_categories(
+    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    name TEXT);
+                    """
+    )
+    cur.execute(
+        """
+CREATE TABLE budget_transactions(
+    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    amount INTEGER NOT NULL,
+	date INTEGER NOT NULL,
+    notes TEXT);
+                    """
+    )
+    cur.execute(
+        """
+CREATE TABLE spending_categories(
+    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    parent_category_id INTEGER NOT NULL,
+    name TEXT,
+    FOREIGN KEY(parent_category_id) REFERENCES budget_categories(id));
+                    """
+    )
+    cur.execute(
+        """
+INSERT INTO budget_categories (name) VALUES
+                    ('System Category')
+                    ,('Unknown Budget Category')
+                    """
+    )
+    cur.execute(
+        """
+INSERT INTO spending_categories(parent_category_id, name) VALUES
+                    (1, 'Starting Balance')
+                    ,(1, 'Unknown Spending Category');
+                    """
+    )
+    cur.execute(
+        """
+CREATE TABLE transactions (
+	id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+	amount INTEGER NOT NULL,
+	date INTEGER NOT NULL,
+	transaction_type text DEFAULT ('Debit') NOT NULL,
+    account_id INTEGER NOT NULL,
+    merchant TEXT,
+    description TEXT,
+    notes TEXT,
+    budget_category_id INTEGER,
+    spending_category_id INTEGER,
+    transfer_account_id INTEGER
+    );
+                          """
+    )
+    cur.execute(
+        """
+INSERT INTO accounts (name,account_type) VALUES
+	 ('Checking','Checking'),
+	 ('Savings','Savings');
+                    """
+    )
+    transaction_datetime = time.mktime(
+        datetime.datetime.strptime("2024-04-01", "%Y-%m-%d").timetuple()
+    )
+    cur.execute(
+        """
+INSERT INTO transactions (amount, date, transaction_type, account_id, merchant, budget_category_id, spending_category_id) VALUES
+	 (10000, ?, 'Credit', 1, 'Starting Balance', 1, 1),
+	 (50000, ?, 'Credit', 2, 'Starting Balance', 1, 1);
+                    """,
+        (transaction_datetime, transaction_datetime),
+    )
+    cur.close()
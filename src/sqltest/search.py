@@ -0,0 +1,166 @@
+"""
+Full-text search over transactions.
+
+``transactions_fts`` is an FTS5 index of the merchant, description and
+notes of each transaction. It is an external-content table: it stores the
+index only and reads the text back from ``transactions`` by rowid. Triggers
+(see ``sqltest.migrations``) keep it in step with the ledger; a bulk load,
+which runs without them, indexes its new rows with ``add_inserted``.
+
+Each word the user types is matched as a prefix, and every word must
+match. Ranking every match of a common word ("coffee" on a ledger of
+millions) would cost as much as a scan, so only the newest ``RANK_WINDOW``
+matches are ranked, by bm25 with merchant matches counted highest. They
+come first; older matches follow, newest first, read a page at a time by
+rowid from the index. Either way a page costs about the same however many
+rows match.
+"""
+
+import re
+
+RANK_WINDOW = 1000
+
+# bm25 weights for merchant, description and notes.
+WEIGHTS = "10.0, 4.0, 1.0"
+
+PAGE_COLUMNS = """
+SELECT t.id, t.amount, t.date, t.account_id,
+       t.merchant, t.description, t.notes, b.name, s.name
+"""
+
+CATEGORY_JOINS = """
+LEFT JOIN budget_categories b ON b.id = t.budget_category_id
+LEFT JOIN spending_categories s ON s.id = t.spending_category_id
+"""
+
+RANKED_PAGE_SQL = f"""
+{PAGE_COLUMNS}
+FROM (
+    SELECT transactions_fts.rowid AS id, bm25(transactions_fts, {WEIGHTS}) AS score
+    FROM transactions_fts JOIN transactions t ON t.id = transactions_fts.rowid
+    WHERE transactions_fts MATCH ?{{where}}
+    ORDER BY transactions_fts.rowid DESC
+    LIMIT ?
+) hits
+JOIN transactions t ON t.id = hits.id
+{CATEGORY_JOINS}
+ORDER BY hits.score, hits.id DESC
+LIMIT ? OFFSET ?
+"""
+
+OLDER_PAGE_SQL = f"""
+{PAGE_COLUMNS}
+FROM transactions_fts
+JOIN transactions t ON t.id = transactions_fts.rowid
+{CATEGORY_JOINS}
+WHERE transactions_fts MATCH ? AND transactions_fts.rowid < ?{{where}}
+ORDER BY transactions_fts.rowid DESC
+LIMIT ?
+"""
+
+WINDOW_FLOOR_SQL = """
+SELECT MIN(id) FROM (
+    SELECT transactions_fts.rowid AS id
+    FROM transactions_fts JOIN transactions t ON t.id = transactions_fts.rowid
+    WHERE transactions_fts MATCH ?{where}
+    ORDER BY transactions_fts.rowid DESC
+    LIMIT ?
+)
+"""
+
+WORD = re.compile(r"\w+")
+
+
+def match_expression(text):
+    """
+    An FTS5 query for what the user typed: each word as a quoted prefix,
+    so punctuation in the text cannot change the query's meaning. Returns
+    None when there is nothing to search for.
+    """
+    words = WORD.findall(text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def add_inserted(con, after_id):
+    """Index transactions with ids above ``after_id``; used after a bulk load."""
+    con.execute(
+        """
+INSERT INTO transactions_fts (rowid, merchant, description, notes)
+SELECT id, merchant, description, notes FROM transactions WHERE id > ?
+""",
+        [after_id],
+    )
+
+
+def rebuild_index(con):
+    """Index the whole ledger again from scratch."""
+    con.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+
+class SearchPager:
+    """
+    Hands out successive pages of the transactions matching ``text``, in
+    the columns of ``pagination.TRANSACTION_PAGE_SQL``. ``start`` and
+    ``end`` are day numbers, both inclusive; either may be None.
+    """
+
+    def __init__(self, text, page_size=200, start=None, end=None, rank_window=RANK_WINDOW):
+        self.expression = match_expression(text)
+        self.page_size = page_size
+        self.rank_window = rank_window
+        self.where = ""
+        self.range_params = []
+        if start is not None:
+            self.where += " AND t.date >= ?"
+            self.range_params.append(start)
+        if end is not None:
+            self.where += " AND t.date <= ?"
+            self.range_params.append(end)
+        self.reset()
+
+    def reset(self):
+        """Start again from the first page."""
+        self.offset = 0
+        # Below the ranked window, the rowid the next older page starts under.
+        self.below = None
+        self.exhausted = self.expression is None
+
+    def next_page(self, con):
+        """Return the next page of rows, or an empty list once exhausted."""
+        if self.exhausted:
+            return []
+
+        cur = con.cursor()
+        try:
+            rows = []
+            if self.below is None:
+                rows = cur.execute(
+                    RANKED_PAGE_SQL.format(where=self.where),
+                    [self.expression, *self.range_params, self.rank_window, self.page_size, self.offset],
+                ).fetchall()
+                self.offset += len(rows)
+                if len(rows) == self.page_size:
+                    return rows
+                if self.offset < self.rank_window:
+                    # Every match fitted in the window.
+                    self.exhausted = True
+                    return rows
+                self.below = cur.execute(
+                    WINDOW_FLOOR_SQL.format(where=self.where),
+                    [self.expression, *self.range_params, self.rank_window],
+                ).fetchone()[0]
+
+            wanted = self.page_size - len(rows)
+            older = cur.execute(
+                OLDER_PAGE_SQL.format(where=self.where),
+                [self.expression, self.below, *self.range_params, wanted],
+            ).fetchall()
+        finally:
+            cur.close()
+        if older:
+            self.below = older[-1][0]
+        if len(older) < wanted:
+            self.exhausted = True
+        return rows + older
@@ -0,0 +1,100 @@
+"""
+Database access off the UI thread.
+
+DataService owns one writer connection on a single worker thread, and a
+small pool of read-only connections on threads of their own. Work is handed
+over as a function that takes a connection as its first argument, and the
+awaitable methods hand its result back to the event loop.
+
+Writes (and anything that must see the writer's uncommitted state) go
+through ``run`` and ``write``, which run one at a time in the order they
+were made. Reads that only need committed data go through ``read``; the
+file is in WAL mode, so they run while a write is in progress.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqltest import db
+
+READERS = 2
+
+
+def _fetchall(con, sql, params):
+    return con.execute(sql, params).fetchall()
+
+
+def _in_transaction(con, fn, args):
+    try:
+        result = fn(con, *args)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return result
+
+
+class DataService:
+    def __init__(self, path, readers=READERS):
+        self.path = path
+        self.con = None
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="cashflower-db"
+        )
+        self.read_executor = ThreadPoolExecutor(
+            max_workers=readers, thread_name_prefix="cashflower-read"
+        )
+        self.reader = threading.local()
+        self.reader_connections = []
+        self.reader_lock = threading.Lock()
+
+    def _call(self, fn, args):
+        # Runs on the worker thread, which is the only one to touch self.con.
+        if self.con is None:
+            self.con = db.connect(self.path)
+        return fn(self.con, *args)
+
+    def _read(self, fn, args):
+        # Each reader thread opens its own connection the first time.
+        con = getattr(self.reader, "con", None)
+        if con is None:
+            con = db.connect(self.path, read_only=True)
+            self.reader.con = con
+            with self.reader_lock:
+                self.reader_connections.append(con)
+        return fn(con, *args)
+
+    def call(self, fn, *args):
+        """Run fn(con, *args) on the database thread and wait for it."""
+        return self.executor.submit(self._call, fn, args).result()
+
+    async def run(self, fn, *args):
+        """Run fn(con, *args) on the database thread and return its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._call, fn, args)
+
+    async def read(self, fn, *args):
+        """Run fn(con, *args) on a read-only connection and return its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.read_executor, self._read, fn, args)
+
+    async def query(self, sql, params=()):
+        return await self.read(_fetchall, sql, params)
+
+    async def write(self, fn, *args):
+        """Run fn(con, *args) and commit, or roll back if it raises."""
+        return await self.run(_in_transaction, fn, args)
+
+    def close(self):
+        def close_connection(con):
+            con.close()
+            self.con = None
+
+        self.read_executor.shutdown(wait=True)
+        for con in self.reader_connections:
+            con.close()
+        self.reader_connections = []
+        if self.con is not None:
+            self.call(close_connection)
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,38 @@
+"""
+Cold start timing.
+
+``timer`` starts counting when this module is first imported, which
+``__main__`` does before anything else, so the first mark covers importing
+toga and the app. The app marks the later milestones as it reaches them and
+prints ``report()`` once the data has loaded.
+"""
+
+import time
+
+
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.marks = []
+
+    def mark(self, name):
+        """Record that startup has reached ``name``; only the first mark of a name counts."""
+        if name not in dict(self.marks):
+            self.marks.append((name, time.perf_counter() - self.started))
+
+    def elapsed(self, name):
+        return dict(self.marks).get(name)
+
+    def report(self):
+        """One line per milestone: time since start, and since the previous milestone."""
+        lines = []
+        previous = 0.0
+        for name, seconds in self.marks:
+            lines.append(
+                f"{name:>12}: {seconds * 1000:7.1f} ms (+{(seconds - previous) * 1000:.1f} ms)"
+            )
+            previous = seconds
+        return "\n".join(lines)
+
+
+timer = StartupTimer()
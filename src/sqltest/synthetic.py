@@ -0,0 +1,207 @@
+"""
+Deterministic synthetic budget files for benchmarks.
+
+``generate_ledger`` writes a budget file with the app's schema (the one
+``create_schema`` makes, migrated to the current version), a handful of
+accounts, budget and spending categories, monthly funding, and the given
+number of transactions: everyday spending with merchants, paychecks, and
+transfers written as pairs. The same size and seed always give the same
+file.
+
+    python -m sqltest.synthetic 1m /tmp/budget-1m
+"""
+
+import argparse
+import datetime
+import random
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from sqltest import balances, budgets, checkpoints, dates, migrations, search
+from sqltest.db import bulk_load
+from sqltest.schema import create_schema
+
+SEED = 20240401
+BATCH_SIZE = 50000
+
+SIZES = {
+    "10k": 10000,
+    "1m": 1000000,
+    "10m": 10000000,
+}
+
+ACCOUNTS = [
+    ("Credit Card", "Credit Card"),
+    ("Cash", "Cash"),
+]
+
+# Budget category: [(spending category, weight, smallest amount, largest amount, merchants)]
+# The weight is how often the category comes up relative to the others.
+# Amounts are in whole dollars here and written in cents.
+CATEGORIES = {
+    "Housing": [
+        ("Rent", 1, 1200, 2200, ["Oak Street Properties"]),
+        ("Repairs", 2, 20, 400, ["Hardware Depot", "Handy Services"]),
+    ],
+    "Food": [
+        ("Groceries", 20, 15, 150, ["FreshMart", "Corner Grocer", "Bulk Foods Co"]),
+        ("Dining", 25, 8, 120, ["Noodle Bar", "Cafe Luna", "Pizza Place", "Taqueria"]),
+    ],
+    "Transport": [
+        ("Fuel", 8, 25, 90, ["Gas & Go", "Fuel Stop"]),
+        ("Transit", 10, 2, 60, ["City Transit"]),
+    ],
+    "Utilities": [
+        ("Electric", 1, 40, 180, ["Power & Light"]),
+        ("Internet", 1, 50, 90, ["FastNet"]),
+        ("Phone", 1, 30, 80, ["Mobile One"]),
+    ],
+    "Fun": [
+        ("Streaming", 3, 8, 25, ["StreamFlix", "TuneBox"]),
+        ("Hobbies", 5, 10, 150, ["Craft Supply", "Book Nook", "Game Shop"]),
+    ],
+    "Health": [
+        ("Pharmacy", 4, 5, 90, ["Corner Pharmacy"]),
+        ("Gym", 1, 25, 60, ["Iron Gym"]),
+    ],
+}
+
+PAYCHECK_SHARE = 0.04
+TRANSFER_SHARE = 0.04
+
+
+def parse_size(text):
+    """A size name from SIZES, or a plain number of transactions."""
+    if text.lower() in SIZES:
+        return SIZES[text.lower()]
+    return int(text.replace("_", ""))
+
+
+def _day_starts(first_day, days):
+    first = dates.day_number(first_day)
+    return list(range(first, first + days))
+
+
+def _add_reference_data(con):
+    account_ids = {"Checking": 1, "Savings": 2}
+    for name, account_type in ACCOUNTS:
+        account_ids[name] = con.execute(
+            "INSERT INTO accounts (name, account_type) values (?, ?)", (name, account_type)
+        ).lastrowid
+    spending = []
+    budget_ids = []
+    for budget_name, spending_categories in CATEGORIES.items():
+        budget_id = con.execute(
+            "INSERT INTO budget_categories (name) values (?)", [budget_name]
+        ).lastrowid
+        budget_ids.append(budget_id)
+        for name, weight, low, high, merchants in spending_categories:
+            spending_id = con.execute(
+                "INSERT INTO spending_categories (name, parent_category_id) values (?, ?)",
+                (name, budget_id),
+            ).lastrowid
+            spending.extend([(budget_id, spending_id, low, high, merchants)] * weight)
+    return account_ids, budget_ids, spending
+
+
+def _transactions(generator, count, day_starts, account_ids, spending):
+    """Yield transactions rows in date order; a transfer is two rows."""
+    checking, savings = account_ids["Checking"], account_ids["Savings"]
+    spend_accounts = [checking] * 5 + [account_ids["Credit Card"]] * 4 + [account_ids["Cash"]]
+    days = len(day_starts)
+    written = 0
+    while written < count:
+        date = day_starts[written * days // count]
+        roll = generator.random()
+        if roll < PAYCHECK_SHARE:
+            amount = generator.randint(180000, 320000)
+            yield (date, "Credit", amount, checking, "Employer Inc", "Paycheck", None, None, None, None)
+            written += 1
+        elif roll < PAYCHECK_SHARE + TRANSFER_SHARE and written + 1 < count:
+            target = savings if generator.random() < 0.5 else account_ids["Credit Card"]
+            amount = generator.randint(5000, 150000)
+            yield (date, "Transfer", -amount, checking, None, "Transfer", None, None, None, target)
+            yield (date, "Transfer", amount, target, None, "Transfer", None, None, None, checking)
+            written += 2
+        else:
+            budget_id, spending_id, low, high, merchants = generator.choice(spending)
+            notes = "receipt kept" if generator.random() < 0.01 else None
+            yield (
+                date,
+                "Debit",
+                -generator.randint(low * 100, high * 100),
+                generator.choice(spend_accounts),
+                generator.choice(merchants),
+                None,
+                notes,
+                budget_id,
+                spending_id,
+                None,
+            )
+            written += 1
+
+
+def generate_ledger(path, transactions, seed=SEED, last_day=datetime.date(2024, 3, 31)):
+    """
+    Write a new budget file at ``path`` with ``transactions`` transactions,
+    the last of them on ``last_day``.
+    """
+    path = Path(path)
+    if path.exists():
+        raise ValueError(f"{path} already exists")
+    generator = random.Random(seed)
+    # About 55 transactions a day, over two to twenty years.
+    days = min(max(transactions // 55, 730), 7305)
+    first_day = last_day - datetime.timedelta(days=days - 1)
+    day_starts = _day_starts(first_day, days)
+
+    con = sqlite3.connect(path)
+    try:
+        create_schema(con)
+        con.commit()
+        migrations.migrate(con)
+        con.execute("BEGIN")
+        account_ids, budget_ids, spending = _add_reference_data(con)
+        with bulk_load(con):
+            rows = _transactions(generator, transactions, day_starts, account_ids, spending)
+            while True:
+                batch = [row for _, row in zip(range(BATCH_SIZE), rows)]
+                if not batch:
+                    break
+                con.executemany(
+                    """
+INSERT INTO transactions (date, transaction_type, amount, account_id, merchant, description, notes, budget_category_id, spending_category_id, transfer_account_id)
+values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+""",
+                    batch,
+                )
+            balances.rebuild_account_balances(con)
+            con.execute("DELETE FROM balance_checkpoints")
+            search.rebuild_index(con)
+
+        months = (last_day.year - first_day.year) * 12 + last_day.month - first_day.month + 1
+        first_month = first_day.strftime("%m/%d/%Y")
+        funding = [(budget_id, first_month, generator.randint(10000, 80000)) for budget_id in budget_ids]
+        budgets.set_funding(con, budgets.funding_rows(funding, months))
+        checkpoints.build_checkpoints(con)
+        con.commit()
+    finally:
+        con.close()
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic budget file.")
+    parser.add_argument("size", help="10k, 1m, 10m, or a number of transactions")
+    parser.add_argument("path", help="where to write the budget file")
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args(argv)
+    started = time.perf_counter()
+    generate_ledger(args.path, parse_size(args.size), args.seed)
+    print(f"Wrote {args.path} in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Write-behind queue for data entry.
+
+Writes submitted within ``delay`` of each other are committed together in
+one transaction on the DataService writer, so keying in a stack of receipts
+costs one commit per batch rather than one per row. Each submitted write
+runs in its own savepoint: a write that fails is rolled back on its own,
+and one that succeeds (a transfer and its other side, say) is kept whole.
+
+The queue is flushed when its timer fires, when the app changes view and
+when it exits. Until then, queued rows are only in memory. ``on_commit``,
+if given, is called after each batch is committed.
+"""
+
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+FLUSH_DELAY = 0.25
+
+
+def apply_batch(con, batch):
+    """
+    Run (fn, args) writes in one transaction, each in a savepoint. Returns
+    (ok, result or exception) for each write.
+    """
+    results = []
+    if con.in_transaction:
+        con.commit()
+    con.execute("BEGIN")
+    try:
+        for fn, args in batch:
+            con.execute("SAVEPOINT queued_write")
+            try:
+                result = fn(con, *args)
+            except Exception as error:
+                con.execute("ROLLBACK TO queued_write")
+                con.execute("RELEASE queued_write")
+                results.append((False, error))
+            else:
+                con.execute("RELEASE queued_write")
+                results.append((True, result))
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return results
+
+
+class WriteQueue:
+    def __init__(self, service, delay=FLUSH_DELAY, on_commit=None):
+        self.service = service
+        self.delay = delay
+        self.on_commit = on_commit
+        self.pending = []
+        self.timer = None
+        self.flushing = None
+        # One batch commits at a time, so a flush that finds nothing pending
+        # still waits for a batch the timer has already taken.
+        self.lock = asyncio.Lock()
+
+    def submit(self, fn, *args):
+        """
+        Queue fn(con, *args). Returns a future that gets its result once the
+        batch it is in has been committed.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((fn, args, future))
+        if self.timer is None:
+            self.timer = loop.call_later(self.delay, self._flush_soon)
+        return future
+
+    def _flush_soon(self):
+        self.timer = None
+        self.flushing = asyncio.ensure_future(self.flush())
+
+    def _take_batch(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        return batch
+
+    async def flush(self):
+        """Commit everything queued so far."""
+        async with self.lock:
+            await self._commit(self._take_batch())
+
+    async def _commit(self, batch):
+        if not batch:
+            return
+        try:
+            results = await self.service.run(
+                apply_batch, [(fn, args) for fn, args, _ in batch]
+            )
+        except Exception as error:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, _, future), (ok, value) in zip(batch, results):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+        if self.on_commit is not None:
+            self.on_commit()
+
+    def close(self):
+        """Commit what is queued and wait for it; used on exit."""
+        batch = self._take_batch()
+        if not batch:
+            return
+        results = self.service.call(apply_batch, [(fn, args) for fn, args, _ in batch])
+        for (fn, args, _), (ok, value) in zip(batch, results):
+            if not ok:
+                logger.error("Queued write %s%r failed: %s", fn.__name__, args, value)
@@ -0,0 +1,15 @@
+import sqlite3
+
+import pytest
+
+from sqltest.schema import create_schema
+
+
+@pytest.fixture
+def con():
+    "An in-memory budget database with the starting accounts and categories"
+    connection = sqlite3.connect(":memory:")
+    create_schema(connection)
+    connection.commit()
+    yield connection
+    connection.close()
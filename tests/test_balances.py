@@ -0,0 +1,57 @@
+from sqltest import balances, migrations
+
+
+def add_transaction(con, account_id, amount):
+    return con.execute(
+        "INSERT INTO transactions (amount, date, account_id) values (?, ?, ?)",
+        (amount, 1712000000, account_id),
+    ).lastrowid
+
+
+def balance_of(con, account_id):
+    return dict((row[0], row[2]) for row in balances.get_account_balances(con))[account_id]
+
+
+def test_migration_backfills_balances(con):
+    migrations.migrate(con)
+    assert balance_of(con, 1) == 1000000
+    assert balance_of(con, 2) == 5000000
+
+
+def test_triggers_track_insert_update_delete(con):
+    migrations.migrate(con)
+    transaction_id = add_transaction(con, 1, -2500)
+    assert balance_of(con, 1) == 997500
+
+    con.execute("UPDATE transactions SET amount = -500 WHERE id = ?", [transaction_id])
+    assert balance_of(con, 1) == 999500
+
+    con.execute("UPDATE transactions SET account_id = 2 WHERE id = ?", [transaction_id])
+    assert balance_of(con, 1) == 1000000
+    assert balance_of(con, 2) == 4999500
+
+    con.execute("DELETE FROM transactions WHERE id = ?", [transaction_id])
+    assert balance_of(con, 2) == 5000000
+    assert balances.verify_account_balances(con) == []
+
+
+def test_both_sides_of_a_transfer(con):
+    migrations.migrate(con)
+    add_transaction(con, 1, -1000)
+    add_transaction(con, 2, 1000)
+    assert balance_of(con, 1) == 999000
+    assert balance_of(con, 2) == 5001000
+
+
+def test_verify_and_rebuild(con):
+    migrations.migrate(con)
+    con.execute("UPDATE account_balances SET balance = 1 WHERE account_id = 1")
+    assert balances.verify_account_balances(con) == [(1, 1, 1000000)]
+    balances.rebuild_account_balances(con)
+    assert balances.verify_account_balances(con) == []
+
+
+def test_account_without_transactions_has_zero_balance(con):
+    migrations.migrate(con)
+    con.execute("INSERT INTO accounts (name, account_type) values ('Wallet', 'Cash')")
+    assert balance_of(con, 3) == 0
@@ -0,0 +1,56 @@
+import datetime
+import time
+
+from sqltest import budgets, migrations, rollups
+from sqltest.dates import day_number, month_start
+
+
+def test_funding_periods_cross_the_year():
+    periods = budgets.funding_periods(datetime.date(2024, 11, 15), 3)
+    assert periods == [month_start(2024, 11), month_start(2024, 12), month_start(2025, 1)]
+
+
+def test_funding_rows_apply_to_each_month():
+    rows = budgets.funding_rows([(3, "11/15/2024", 500), (4, "11/15/2024", 200)], months=2)
+    entered = day_number(datetime.date(2024, 11, 15))
+    assert rows == [
+        (3, month_start(2024, 11), entered, 500),
+        (3, month_start(2024, 12), entered, 500),
+        (4, month_start(2024, 11), entered, 200),
+        (4, month_start(2024, 12), entered, 200),
+    ]
+
+
+def test_set_funding_replaces_a_months_amount(con):
+    migrations.migrate(con)
+    budgets.set_funding(con, budgets.funding_rows([(1, "05/01/2024", 500)], months=3))
+    budgets.set_funding(con, budgets.funding_rows([(1, "06/20/2024", 700)]))
+    assert budgets.get_funding(con, 1) == [
+        (month_start(2024, 5), 500),
+        (month_start(2024, 6), 700),
+        (month_start(2024, 7), 500),
+    ]
+    stored = con.execute(
+        "SELECT budget_category_id, period_start, date, amount FROM budget_transactions ORDER BY period_start"
+    ).fetchall()
+    assert stored == [
+        (1, month_start(2024, 5), day_number(datetime.date(2024, 5, 1)), 500),
+        (1, month_start(2024, 6), day_number(datetime.date(2024, 6, 20)), 700),
+        (1, month_start(2024, 7), day_number(datetime.date(2024, 5, 1)), 500),
+    ]
+    assert ("System Category", "", 1700, 0) in rollups.category_rollups(con)
+
+
+def test_migration_merges_funding_for_the_same_month(con):
+    "Funding entered before the migration is summed into one row per month"
+    for migration in migrations.MIGRATIONS[: migrations.MIGRATIONS.index(migrations.key_budget_funding_by_period)]:
+        migration(con)
+    # Dates were local-midnight timestamps at that version.
+    may = time.mktime(datetime.date(2024, 5, 1).timetuple())
+    for amount, day in [(100, 5), (250, 20)]:
+        con.execute(
+            "INSERT INTO budget_transactions (amount, date, budget_category_id) values (?, ?, 1)",
+            [amount, may + day * 86400],
+        )
+    migrations.key_budget_funding_by_period(con)
+    assert budgets.get_funding(con, 1) == [(may, 350)]
@@ -0,0 +1,51 @@
+import pytest
+
+from sqltest import changelog, db, migrations, queries
+from sqltest.changelog import Change
+
+SPENDING = (19813, "Debit", -1200, 1, "Cafe Luna", None, None, 2, 1, None)
+
+
+@pytest.fixture
+def migrated(con):
+    migrations.migrate(con)
+    return con
+
+
+def test_triggers_log_rows_with_their_account_and_categories(migrated):
+    seq = changelog.latest(migrated)
+    budget_id = queries.add_budget_category(migrated, "Food")
+    spending_id = queries.add_spending_category(migrated, "Groceries", budget_id)
+    (transaction_id,) = queries.add_transaction(migrated, SPENDING)
+    migrated.execute("UPDATE transactions SET account_id = 2 WHERE id = ?", [transaction_id])
+
+    seq, logged = changelog.read_changes(migrated, seq)
+    assert seq == changelog.latest(migrated)
+    assert logged == [
+        Change("budget_categories", "insert", budget_id, None, budget_id, None),
+        Change("spending_categories", "insert", spending_id, None, budget_id, spending_id),
+        Change("transactions", "insert", transaction_id, 1, 2, 1),
+        Change("transactions", "update", transaction_id, 1, 2, 1),
+        Change("transactions", "update", transaction_id, 2, 2, 1),
+    ]
+    assert changelog.read_changes(migrated, seq) == (seq, [])
+
+
+def test_bulk_loads_log_each_account_and_category(migrated):
+    last_id = migrated.execute("SELECT MAX(id) FROM transactions").fetchone()[0]
+    seq = changelog.latest(migrated)
+    with db.bulk_load(migrated):
+        for _ in range(3):
+            queries.add_transaction(migrated, SPENDING)
+        changelog.log_inserted(migrated, last_id)
+    assert changelog.read_changes(migrated, seq)[1] == [Change("transactions", "insert", None, 1, 2, 1)]
+
+
+def test_falling_behind_the_pruned_log_asks_for_a_resync(migrated):
+    for number in range(5):
+        queries.add_budget_category(migrated, f"Category {number}")
+    seq = changelog.latest(migrated)
+    changelog.prune(migrated, keep=2)
+    assert [change.row_id for change in changelog.read_changes(migrated, seq - 2)[1]] == [6, 7]
+    assert changelog.read_changes(migrated, seq - 3) == (seq, [changelog.RESYNC])
+    assert changelog.read_changes(migrated, seq - 2, limit=1) == (seq, [changelog.RESYNC])
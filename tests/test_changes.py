@@ -0,0 +1,88 @@
+import asyncio
+import sqlite3
+
+from sqltest import db, migrations, queries
+from sqltest.changelog import RESYNC, Change
+from sqltest.changes import ChangeBus, ChangeWatcher
+from sqltest.schema import create_schema
+from sqltest.service import DataService
+
+
+def test_bus_sends_each_subscriber_its_tables():
+    bus = ChangeBus()
+    accounts, everything = [], []
+
+    async def on_accounts(changed):
+        accounts.extend(changed)
+
+    bus.subscribe(on_accounts, {"accounts"})
+    bus.subscribe(everything.extend)
+    category = Change("budget_categories", "insert", 5, None, 5, None)
+    account = Change("accounts", "update", 1, 1, None, None)
+    asyncio.run(bus.publish([category, account]))
+    asyncio.run(bus.publish([RESYNC]))
+    assert accounts == [account, RESYNC]
+    assert everything == [category, account, RESYNC]
+
+    bus.unsubscribe(everything.extend)
+    asyncio.run(bus.publish([category]))
+    assert len(everything) == 3
+
+
+def test_watcher_sees_writes_from_another_process(tmp_path):
+    path = tmp_path / "budget"
+    con = db.connect(path)
+    create_schema(con)
+    migrations.prepare(con)
+    con.close()
+
+    service = DataService(path)
+    bus = ChangeBus()
+    published = []
+    bus.subscribe(published.extend)
+    watcher = ChangeWatcher(service, bus)
+
+    async def watch():
+        await watcher.check()
+        # Another connection stands in for the CLI.
+        other = sqlite3.connect(path)
+        queries.add_account(other, "Brokerage", "Investment")
+        other.commit()
+        other.close()
+        await watcher.check()
+        await watcher.check()
+
+    try:
+        asyncio.run(watch())
+    finally:
+        service.close()
+    assert [(change.table, change.operation) for change in published] == [("accounts", "insert")]
+
+
+def test_watcher_prunes_what_it_has_published(tmp_path):
+    path = tmp_path / "budget"
+    con = db.connect(path)
+    create_schema(con)
+    migrations.prepare(con)
+    con.close()
+
+    service = DataService(path)
+    published = []
+    bus = ChangeBus()
+    bus.subscribe(published.extend)
+    watcher = ChangeWatcher(service, bus, keep=3)
+
+    async def watch():
+        await watcher.check()
+        for number in range(5):
+            await service.write(queries.add_budget_category, f"Category {number}")
+        await watcher.check()
+        await watcher.check()
+        return await service.read(lambda con: con.execute("SELECT COUNT(*) FROM change_log").fetchone()[0])
+
+    try:
+        logged = asyncio.run(watch())
+    finally:
+        service.close()
+    assert len(published) == 5
+    assert logged == 3
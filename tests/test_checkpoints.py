@@ -0,0 +1,89 @@
+import datetime
+
+from sqltest import checkpoints, migrations
+from sqltest.dates import day_number
+
+
+def add_transaction(con, account_id, amount, day):
+    return con.execute(
+        "INSERT INTO transactions (amount, date, account_id) values (?, ?, ?)",
+        (amount, day_number(day), account_id),
+    ).lastrowid
+
+
+def summed_balance(con, account_id, day):
+    end = day_number(day) + 1
+    return con.execute(
+        "SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE account_id = ? AND date < ?",
+        [account_id, end],
+    ).fetchone()[0]
+
+
+def period_starts(con, account_id):
+    return [
+        row[0]
+        for row in con.execute(
+            "SELECT period_start FROM balance_checkpoints WHERE account_id = ? ORDER BY period_start",
+            [account_id],
+        )
+    ]
+
+
+def make_history(con):
+    migrations.migrate(con)
+    day = datetime.date(2024, 4, 15)
+    for i in range(300):
+        add_transaction(con, 1, -(i % 50), day + datetime.timedelta(days=i))
+    checkpoints.build_checkpoints(con)
+
+
+def test_as_of_matches_full_sum(con):
+    make_history(con)
+    assert period_starts(con, 1)
+    for offset in range(-20, 330, 7):
+        day = datetime.date(2024, 4, 1) + datetime.timedelta(days=offset)
+        assert checkpoints.as_of(con, 1, day) == summed_balance(con, 1, day)
+
+
+def test_backdated_insert_only_invalidates_later_checkpoints(con):
+    make_history(con)
+    before = period_starts(con, 1)
+    backdated = datetime.date(2024, 9, 10)
+    add_transaction(con, 1, -12345, backdated)
+
+    after = period_starts(con, 1)
+    cutoff = day_number(backdated)
+    assert after == [start for start in before if start <= cutoff]
+    assert period_starts(con, 2) != []
+
+    day = datetime.date(2024, 12, 31)
+    assert checkpoints.as_of(con, 1, day) == summed_balance(con, 1, day)
+    checkpoints.build_checkpoints(con, [1])
+    assert period_starts(con, 1) == before
+    assert checkpoints.as_of(con, 1, day) == summed_balance(con, 1, day)
+
+
+def test_build_is_incremental(con):
+    make_history(con)
+    before = con.execute("SELECT * FROM balance_checkpoints").fetchall()
+    checkpoints.build_checkpoints(con)
+    assert con.execute("SELECT * FROM balance_checkpoints").fetchall() == before
+
+
+def test_build_for_changed_accounts_matches_full_build(con):
+    make_history(con)
+    for i in range(40):
+        add_transaction(con, 2, 100 + i, datetime.date(2024, 5, 1) + datetime.timedelta(days=7 * i))
+    checkpoints.build_checkpoints(con)
+    full = con.execute("SELECT * FROM balance_checkpoints ORDER BY 1, 2").fetchall()
+
+    add_transaction(con, 1, -500, datetime.date(2024, 6, 3))
+    add_transaction(con, 2, 700, datetime.date(2024, 7, 9))
+    assert con.execute("SELECT * FROM balance_checkpoints ORDER BY 1, 2").fetchall() != full
+    checkpoints.build_checkpoints(con, [1, 2])
+    rebuilt = con.execute("SELECT * FROM balance_checkpoints ORDER BY 1, 2").fetchall()
+
+    con.execute("DELETE FROM balance_checkpoints")
+    checkpoints.build_checkpoints(con)
+    assert rebuilt == con.execute("SELECT * FROM balance_checkpoints ORDER BY 1, 2").fetchall()
+    assert len(rebuilt) == len(full)
@@ -0,0 +1,107 @@
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+from sqltest import cli, paths
+
+STATEMENT = """Date,Description,Amount,Payee
+04/02/2024,Weekly shop,-54.20,Corner Grocer
+04/03/2024,Paycheck,"1,200.00",Employer
+"""
+
+
+def run(*argv):
+    out = io.StringIO()
+    status = cli.main([str(arg) for arg in argv], out=out)
+    return status, out.getvalue()
+
+
+@pytest.fixture
+def budget(tmp_path):
+    statement = tmp_path / "statement.csv"
+    statement.write_text(STATEMENT)
+    path = tmp_path / "budget"
+    run("--db", path, "import", "Checking", statement)
+    return path
+
+
+def test_import_creates_the_file_and_skips_repeats(tmp_path, budget):
+    status, output = run("--db", budget, "import", "Checking", tmp_path / "statement.csv")
+    assert status == 0
+    assert output.endswith("0 imported, 2 already there\n")
+
+
+def test_balance_csv(budget):
+    status, output = run("--db", budget, "balance", "--csv", "--verify")
+    assert status == 0
+    assert "Checking,11145.80\n" in output
+
+
+def test_balance_as_of(budget):
+    status, output = run("--db", budget, "balance", "--csv", "--as-of", "2024-04-02")
+    assert "Checking,9945.80\n" in output
+
+
+def test_export(tmp_path, budget):
+    output = tmp_path / "out.csv"
+    status, message = run("--db", budget, "export", output, "--start", "2024-04-03", "--account", "Checking")
+    assert status == 0
+    assert message == f"Exported 1 transactions to {output}\n"
+    assert "2024-04-03,1200.00" in output.read_text()
+
+
+def test_backup(tmp_path, budget):
+    backup = tmp_path / "copy"
+    assert run("--db", budget, "backup", backup)[0] == 0
+    assert "Checking,11145.80\n" in run("--db", backup, "balance", "--csv")[1]
+    with pytest.raises(SystemExit) as exit:
+        run("--db", budget, "backup", backup)
+    assert exit.value.code == 2
+
+
+def test_missing_file_and_account(tmp_path, budget):
+    with pytest.raises(SystemExit) as exit:
+        run("--db", tmp_path / "missing", "balance")
+    assert exit.value.code == 2
+    with pytest.raises(SystemExit) as exit:
+        run("--db", budget, "import", "Nowhere", tmp_path / "statement.csv")
+    assert exit.value.code == 2
+
+
+def test_budget_path():
+    assert paths.budget_path(environ={paths.DB_ENV: "/tmp/other"}).as_posix() == "/tmp/other"
+    assert paths.budget_path("/data", environ={}).as_posix() == "/data/budget"
+    assert paths.default_data_dir("linux").parts[-3:] == (".local", "share", "sqltest")
+
+
+def test_cli_does_not_import_toga(budget):
+    code = (
+        "import sys; from sqltest.cli import main; "
+        f"main(['--db', {str(budget)!r}, 'balance']); "
+        "assert 'toga' not in sys.modules"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, env=env)
+
+
+def test_forecast(budget):
+    status, output = run("--db", budget, "forecast", "--csv", "--check")
+    assert status == 0
+    assert output.splitlines()[0] == "account,lowest balance,on,first below zero"
+
+
+def test_post(budget):
+    status, output = run("--db", budget, "post", "--through", "2024-05-01")
+    assert status == 0
+    assert output == "Posted 0 recurring transactions\n"
+
+
+def test_pivot(budget):
+    status, output = run("--db", budget, "pivot", "--start", "2024-03", "--months", "3", "--csv")
+    assert status == 0
+    lines = output.splitlines()
+    assert lines[0] == "budget category,spending category,2024-03,2024-04,2024-05,total"
+    assert "System Category,,0.00,0.00,0.00,0.00" in lines
@@ -0,0 +1,71 @@
+import csv
+import datetime
+
+import pytest
+
+from sqltest import exporter, migrations
+from sqltest.dates import day_number
+from sqltest.exporter import ExportFilter
+
+
+@pytest.fixture
+def ledger(con):
+    migrations.migrate(con)
+    for day in range(1, 31):
+        stamp = day_number(datetime.date(2024, 6, day))
+        con.execute(
+            "INSERT INTO transactions (amount, date, account_id, merchant, budget_category_id, spending_category_id) values (?, ?, ?, ?, ?, ?)",
+            (-day * 100 - 5, stamp, 1 + day % 2, f"Shop {day}", 2 if day % 3 else None, None),
+        )
+    return con
+
+
+def read_csv(path):
+    with open(path, newline="") as exported:
+        return list(csv.reader(exported))
+
+
+def test_csv_export_all_rows(ledger, tmp_path):
+    path = tmp_path / "ledger.csv"
+    assert exporter.export_ledger(ledger, path, chunk_size=7) == 32
+    rows = read_csv(path)
+    assert rows[0] == exporter.COLUMNS
+    assert len(rows) == 33
+    assert rows[1][4] == "Checking"
+    assert rows[-1][1:3] == ["2024-06-30", "-30.05"]
+
+
+def test_filters_are_applied(ledger, tmp_path):
+    path = tmp_path / "ledger.csv"
+    export_filter = ExportFilter(
+        start=datetime.date(2024, 6, 10), end=datetime.date(2024, 6, 19), account_ids=[1]
+    )
+    assert exporter.export_ledger(ledger, path, export_filter) == 5
+    dates = [row[1] for row in read_csv(path)[1:]]
+    assert dates == ["2024-06-10", "2024-06-12", "2024-06-14", "2024-06-16", "2024-06-18"]
+
+
+def test_chunks_are_bounded(ledger):
+    sizes = [len(chunk) for chunk in exporter.iter_chunks(ledger, chunk_size=10)]
+    assert sizes == [10, 10, 10, 2]
+
+
+def test_unknown_format(ledger, tmp_path):
+    with pytest.raises(ValueError):
+        exporter.export_ledger(ledger, tmp_path / "ledger.xlsx")
+
+
+def test_parquet_and_arrow(ledger, tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    assert exporter.export_ledger(ledger, tmp_path / "ledger.parquet", chunk_size=7) == 32
+    table = pq.read_table(tmp_path / "ledger.parquet")
+    assert table.column_names == exporter.COLUMNS
+    assert table.num_rows == 32
+    assert str(table.column("amount")[-1]) == "-30.05"
+    assert table.column("date")[-1].as_py() == datetime.date(2024, 6, 30)
+
+    assert exporter.export_ledger(ledger, tmp_path / "ledger.arrow", chunk_size=7) == 32
+    with pa.memory_map(str(tmp_path / "ledger.arrow")) as source:
+        assert pa.ipc.open_file(source).read_all().num_rows == 32
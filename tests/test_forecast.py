@@ -0,0 +1,72 @@
+import datetime
+
+import pytest
+
+from sqltest import forecast, migrations
+from sqltest.dates import day_number, to_date
+
+pytest.importorskip("numpy")
+
+APRIL_1 = day_number(datetime.date(2024, 4, 1))
+
+
+def days(rules, first, last):
+    rule_index, rule_days = forecast.occurrences(rules, day_number(first), day_number(last))
+    return list(zip(rule_index.tolist(), [to_date(day) for day in rule_days.tolist()]))
+
+
+def test_occurrences_clip_to_month_ends():
+    rules = [(1, -100, forecast.MONTHLY, 1, day_number(datetime.date(2024, 1, 31)), None, None)]
+    assert days(rules, datetime.date(2024, 2, 1), datetime.date(2024, 4, 30)) == [
+        (0, datetime.date(2024, 2, 29)),
+        (0, datetime.date(2024, 3, 31)),
+        (0, datetime.date(2024, 4, 30)),
+    ]
+
+
+def test_occurrences_respect_interval_and_until():
+    rules = [
+        (1, 50, forecast.WEEKLY, 2, day_number(datetime.date(2023, 12, 25)), day_number(datetime.date(2024, 2, 5)), None),
+        (2, 10, forecast.YEARLY, 1, day_number(datetime.date(2020, 2, 29)), None, None),
+    ]
+    assert days(rules, datetime.date(2024, 1, 1), datetime.date(2025, 12, 31)) == [
+        (0, datetime.date(2024, 1, 8)),
+        (0, datetime.date(2024, 1, 22)),
+        (0, datetime.date(2024, 2, 5)),
+        (1, datetime.date(2024, 2, 29)),
+        (1, datetime.date(2025, 2, 28)),
+    ]
+
+
+def test_forecast_adds_scheduled_transactions_and_rules(con):
+    migrations.migrate(con)
+    first = APRIL_1 - 10
+    rules = [(1, -400000, forecast.MONTHLY, 1, APRIL_1 + 4, None, None)]
+    projection = forecast.forecast(con, rules, days=90, first_day=first)
+
+    # The starting balances are dated after the first day, so they arrive later.
+    assert projection.balance_on(1, first) == 0
+    assert projection.balance_on(1, APRIL_1) == 1000000
+    assert projection.balance_on(1, APRIL_1 + 34) == 200000
+    assert projection.balance_on(2, first + 89) == 5000000
+
+
+def test_shortfalls_and_lowest(con):
+    migrations.migrate(con)
+    rules = [
+        (1, -900000, forecast.MONTHLY, 1, APRIL_1 + 1, None, None),
+        (1, 500000, forecast.MONTHLY, 1, APRIL_1 + 20, None, None),
+    ]
+    projection = forecast.forecast(con, rules, days=61, first_day=APRIL_1)
+
+    assert projection.shortfalls() == [
+        (1, APRIL_1 + 31, APRIL_1 + 49, -300000),
+    ]
+    assert projection.lowest()[0] == (1, APRIL_1 + 31, -300000)
+    assert projection.lowest()[1] == (2, APRIL_1, 5000000)
+
+
+def test_horizon_days():
+    assert forecast.horizon_days(1, day_number(datetime.date(2024, 3, 1))) == 365
+    assert forecast.horizon_days(1, day_number(datetime.date(2024, 2, 29))) == 365
+    assert forecast.horizon_days(5, day_number(datetime.date(2023, 1, 1))) == 1826
@@ -0,0 +1,106 @@
+import datetime
+import io
+
+import pytest
+
+from sqltest import balances, checkpoints, importers, migrations
+
+CSV_STATEMENT = """Date,Description,Amount,Payee
+04/02/2024,Weekly shop,-54.20,Corner Grocer
+04/02/2024,Coffee,-3.50,Cafe
+04/02/2024,Coffee,-3.50,Cafe
+04/03/2024,Paycheck,"1,200.00",Employer
+"""
+
+OFX_STATEMENT = """OFXHEADER:100
+DATA:OFXSGML
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240402120000<TRNAMT>-54.20<FITID>A1<NAME>Corner Grocer<MEMO>Weekly shop</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240403<TRNAMT>1200.00<FITID>A2<NAME>Employer</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+QIF_STATEMENT = """!Type:Bank
+D04/02/2024
+T-54.20
+PCorner Grocer
+MWeekly shop
+^
+D04/03'2024
+T1,200.00
+PEmployer
+^
+"""
+
+
+@pytest.fixture
+def migrated(con):
+    migrations.migrate(con)
+    return con
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return path
+
+
+def test_csv_import_is_idempotent(migrated, tmp_path):
+    path = write(tmp_path, "statement.csv", CSV_STATEMENT)
+    assert importers.import_statement(migrated, path, 1) == (4, 4, 0)
+    assert importers.import_statement(migrated, path, 1) == (4, 0, 4)
+
+    amounts = [row[0] for row in migrated.execute("SELECT amount FROM transactions WHERE import_hash IS NOT NULL ORDER BY id")]
+    assert amounts == [-5420, -350, -350, 120000]
+    assert balances.verify_account_balances(migrated) == []
+
+
+def test_csv_debit_and_credit_columns(tmp_path):
+    path = write(tmp_path, "statement.csv", "Posted Date,Payee,Debit,Credit\n2024-04-02,Cafe,3.50,\n2024-04-03,Employer,,1200\n")
+    rows = list(importers.read_csv(path))
+    assert [row.amount for row in rows] == ["-3.50", "1200"]
+
+
+def test_ofx_tags_split_across_chunks():
+    tags = list(importers._ofx_tags(io.StringIO(OFX_STATEMENT), chunk_size=7))
+    whole = list(importers._ofx_tags(io.StringIO(OFX_STATEMENT)))
+    assert tags == whole
+    assert (False, "TRNAMT", "-54.20") in tags
+
+
+def test_ofx_and_qif_read_the_same_rows(tmp_path):
+    ofx_rows = list(importers.read_statement(write(tmp_path, "statement.ofx", OFX_STATEMENT)))
+    qif_rows = list(importers.read_statement(write(tmp_path, "statement.qif", QIF_STATEMENT)))
+    assert [(row.merchant, row.amount) for row in ofx_rows] == [("Corner Grocer", "-54.20"), ("Employer", "1200.00")]
+    assert [(row.merchant, row.amount) for row in qif_rows] == [("Corner Grocer", "-54.20"), ("Employer", "1,200.00")]
+
+    converter = importers.RowConverter(1)
+    assert converter.parse_date(ofx_rows[0].date) == converter.parse_date(qif_rows[0].date)
+    assert converter.parse_date(qif_rows[1].date) == converter.parse_date("04/03/2024")
+
+
+def test_bad_rows_roll_back_the_import(migrated, tmp_path):
+    path = write(tmp_path, "statement.csv", "Date,Amount\n04/02/2024,-1\nyesterday,-2\n")
+    before = migrated.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+    with pytest.raises(ValueError):
+        importers.import_statement(migrated, path, 1)
+    assert migrated.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == before
+
+
+def test_unsupported_file_type(tmp_path):
+    with pytest.raises(ValueError):
+        importers.read_statement(tmp_path / "statement.xlsx")
+
+
+def test_import_keeps_balances_and_checkpoints_current(migrated, tmp_path):
+    checkpoints.build_checkpoints(migrated)
+    path = write(tmp_path, "statement.csv", "Date,Amount\n01/15/2024,-100\n06/15/2024,-200\n")
+    importers.import_statement(migrated, path, 1)
+
+    triggers = migrated.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'").fetchone()[0]
+    assert triggers == 30
+    assert balances.verify_account_balances(migrated) == []
+    assert checkpoints.as_of(migrated, 1, datetime.date(2024, 3, 1)) == -10000
+    assert checkpoints.as_of(migrated, 1, datetime.date(2024, 5, 1)) == 990000
+    assert checkpoints.as_of(migrated, 1, datetime.date(2024, 7, 1)) == 970000
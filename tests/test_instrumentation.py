@@ -0,0 +1,72 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from sqltest import instrumentation
+from sqltest.instrumentation import TimedConnection, Timings, timed
+
+
+@pytest.fixture
+def timings(monkeypatch):
+    "Fresh query and callback timings, with callbacks timed"
+    monkeypatch.setattr(instrumentation, "queries", Timings())
+    monkeypatch.setattr(instrumentation, "callbacks", Timings())
+    monkeypatch.setattr(instrumentation, "trace_queries", False)
+    monkeypatch.setattr(instrumentation, "trace_callbacks", True)
+    return instrumentation
+
+
+def test_slowest_orders_by_total_time():
+    timings = Timings()
+    timings.record("quick", 0.001)
+    timings.record("slow", 0.5)
+    timings.record("quick", 0.002)
+
+    assert timings.slowest() == [("slow", 1, 0.5, 0.5), ("quick", 2, 0.003, 0.002)]
+    timings.clear()
+    assert timings.slowest() == []
+
+
+def test_timed_records_sync_and_async_callbacks(timings):
+    @timed
+    def press(widget):
+        return widget
+
+    @timed
+    async def load(widget):
+        return widget
+
+    assert press("button") == "button"
+    assert asyncio.run(load("button")) == "button"
+    names = {row[0]: row[1] for row in timings.callbacks.slowest()}
+    assert names == {
+        "test_timed_records_sync_and_async_callbacks.<locals>.press": 1,
+        "test_timed_records_sync_and_async_callbacks.<locals>.load": 1,
+    }
+
+
+def test_timed_connection_records_statements_and_commits(timings):
+    con = sqlite3.connect(":memory:", factory=TimedConnection)
+    con.execute("CREATE TABLE t (x)")
+    con.executemany("INSERT INTO t values (?)", [(1,), (2,)])
+    con.commit()
+    for _ in range(2):
+        con.execute("SELECT   x\n  FROM t").fetchall()
+    con.close()
+
+    counts = {row[0]: row[1] for row in timings.queries.slowest()}
+    # Fetching the rows adds to the statement's time but not its count.
+    assert counts["SELECT x FROM t"] == 2
+    assert counts["INSERT INTO t values (?)"] == 1
+    assert counts["COMMIT"] == 1
+
+
+def test_configure_reads_the_environment(timings):
+    timings.configure({"CASHFLOWER_TRACE": "queries"})
+    assert timings.trace_queries and not timings.trace_callbacks
+    assert timings.connection_factory() is TimedConnection
+
+    timings.configure({"CASHFLOWER_TRACE": "off"})
+    assert not timings.trace_queries and not timings.trace_callbacks
+    assert timings.connection_factory() is sqlite3.Connection
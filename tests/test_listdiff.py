@@ -0,0 +1,76 @@
+from toga.sources import ListSource
+
+from sqltest.listdiff import patch_rows, update_rows
+
+
+class Listener:
+    "Records the notifications a ListSource sends its widgets"
+
+    def __init__(self):
+        self.events = []
+
+    def insert(self, index, item):
+        self.events.append(("insert", index))
+
+    def change(self, item):
+        self.events.append(("change", item.name))
+
+    def remove(self, index, item):
+        self.events.append(("remove", index))
+
+    def clear(self):
+        self.events.append(("clear",))
+
+
+def make_source(*names):
+    source = ListSource(accessors=["name", "value"], data=[])
+    for number, name in enumerate(names):
+        source.append({"name": name, "value": number})
+    listener = Listener()
+    source.add_listener(listener)
+    return source, listener
+
+
+def rows_of(source):
+    return [(row.name, row.value) for row in source]
+
+
+def test_insert_in_the_middle():
+    source, listener = make_source("a", "c")
+    result = patch_rows(
+        source, [{"name": "a", "value": 0}, {"name": "b", "value": 5}, {"name": "c", "value": 1}], "name"
+    )
+    assert rows_of(source) == [("a", 0), ("b", 5), ("c", 1)]
+    assert result == (1, 0, 0)
+    assert listener.events == [("insert", 1)]
+
+
+def test_update_and_remove():
+    source, listener = make_source("a", "b", "c")
+    result = patch_rows(source, [{"name": "a", "value": 0}, {"name": "c", "value": 9}], "name")
+    assert rows_of(source) == [("a", 0), ("c", 9)]
+    assert result == (0, 1, 1)
+    assert ("clear",) not in listener.events
+
+
+def test_reordered_rows_end_up_in_order():
+    source, listener = make_source("a", "b", "c")
+    rows = [{"name": "c", "value": 2}, {"name": "a", "value": 0}, {"name": "b", "value": 1}]
+    patch_rows(source, rows, "name")
+    assert rows_of(source) == [("c", 2), ("a", 0), ("b", 1)]
+
+
+def test_unchanged_rows_send_nothing():
+    source, listener = make_source("a", "b")
+    result = patch_rows(source, [{"name": "a", "value": 0}, {"name": "b", "value": 1}], "name")
+    assert result == (0, 0, 0)
+    assert listener.events == []
+
+
+def test_update_rows_touches_only_the_rows_given():
+    source, listener = make_source("a", "b", "c")
+    rows = [{"name": "c", "value": 7}, {"name": "b", "value": 1}, {"name": "z", "value": 0}]
+    changed = update_rows(source, rows, "name")
+    assert rows_of(source) == [("a", 0), ("b", 1), ("c", 7)]
+    assert changed == 1
+    assert listener.events == [("change", "c")]
@@ -0,0 +1,75 @@
+import datetime
+import time
+
+from sqltest import dates, migrations
+from sqltest.dates import day_number
+
+
+def test_migrate_new_database(con):
+    "A fresh database is brought up to the current schema version"
+    assert migrations.current_version(con) == 0
+    assert migrations.migrate(con) == 0
+    assert migrations.current_version(con) == migrations.SCHEMA_VERSION
+
+
+def test_migrate_is_idempotent(con):
+    migrations.migrate(con)
+    assert migrations.migrate(con) == migrations.SCHEMA_VERSION
+    assert migrations.current_version(con) == migrations.SCHEMA_VERSION
+
+
+def test_hot_queries_use_indexes(con):
+    "After migrating, every hot query's plan names its index"
+    assert migrations.check_query_plans(con)
+    migrations.migrate(con)
+    assert migrations.check_query_plans(con) == []
+
+
+def test_newer_database_is_left_alone(con):
+    con.execute(f"PRAGMA user_version = {migrations.SCHEMA_VERSION + 5}")
+    assert migrations.migrate(con) == migrations.SCHEMA_VERSION + 5
+    assert migrations.current_version(con) == migrations.SCHEMA_VERSION + 5
+
+
+def test_amounts_move_to_cents(con):
+    "Amounts and the balances derived from them are scaled, and triggers still run"
+    for migration in migrations.MIGRATIONS[: migrations.MIGRATIONS.index(migrations.amounts_in_minor_units)]:
+        migration(con)
+    con.execute("INSERT INTO budget_transactions (amount, date, budget_category_id, period_start) values (250, 0, 2, 0)")
+    migrations.amounts_in_minor_units(con)
+
+    assert con.execute("SELECT amount FROM transactions ORDER BY id").fetchall() == [(1000000,), (5000000,)]
+    assert con.execute("SELECT amount FROM budget_transactions").fetchall() == [(25000,)]
+    con.execute("UPDATE transactions SET amount = amount - 1 WHERE id = 1")
+    assert con.execute("SELECT balance FROM account_balances WHERE account_id = 1").fetchone()[0] == 999999
+    assert migrations.check_query_plans(con) == []
+
+
+def test_dates_become_day_numbers(con):
+    "Local-midnight timestamps become the day number of the same calendar date"
+    migrations.migrate(con)
+    april_first = datetime.date(2024, 4, 1)
+    assert con.execute("SELECT DISTINCT date FROM transactions").fetchall() == [(day_number(april_first),)]
+    assert dates.to_date(day_number(april_first)) == april_first
+
+
+def migrate_to(con, migration):
+    "Run the migrations before ``migration``"
+    for earlier in migrations.MIGRATIONS[: migrations.MIGRATIONS.index(migration)]:
+        earlier(con)
+    con.execute(f"PRAGMA user_version = {migrations.MIGRATIONS.index(migration)}")
+
+
+def test_swapped_funding_rows_are_put_right(con):
+    "The first app wrote funding rows as (amount, date) = (timestamp, dollars)"
+    migrate_to(con, migrations.key_budget_funding_by_period)
+    march = datetime.date(2024, 3, 15)
+    con.execute(
+        "insert into budget_transactions (amount, date) values (?, ?)",
+        [time.mktime(march.timetuple()), 300],
+    )
+    migrations.migrate(con)
+    assert con.execute("SELECT amount, date, budget_category_id, period_start FROM budget_transactions").fetchall() == [
+        (30000, day_number(march), None, day_number(datetime.date(2024, 3, 1)))
+    ]
+
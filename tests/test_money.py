@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+import pytest
+
+from sqltest import money
+from sqltest.money import US_CONVENTIONS, MoneyFormatter
+
+
+def test_to_minor_does_not_go_through_float():
+    assert money.to_minor("-12.34") == -1234
+    assert money.to_minor(Decimal("0.1")) == 10
+    assert money.to_minor(19.99) == 1999
+    assert money.to_minor("2.005") == 201
+    assert money.to_minor(-2.005) == -201
+    assert money.from_minor(-1234) == Decimal("-12.34")
+    with pytest.raises(ValueError):
+        money.to_minor("twelve")
+    with pytest.raises(ValueError):
+        money.to_minor("NaN")
+
+
+def test_format_matches_locale_currency():
+    formatter = MoneyFormatter(US_CONVENTIONS)
+    assert formatter.format(123456789) == "$1,234,567.89"
+    assert formatter.format(-5) == "-$0.05"
+    assert formatter.format(0) == "$0.00"
+
+
+def test_other_conventions():
+    euro = dict(
+        US_CONVENTIONS,
+        currency_symbol="€",
+        mon_decimal_point=",",
+        mon_thousands_sep=".",
+        p_cs_precedes=0,
+        n_cs_precedes=0,
+        p_sep_by_space=1,
+        n_sep_by_space=1,
+    )
+    assert MoneyFormatter(euro).format(-123456) == "-1.234,56 €"
+    rupee = dict(US_CONVENTIONS, currency_symbol="₹", mon_grouping=[3, 2, 0])
+    assert MoneyFormatter(rupee).format(1234567890) == "₹1,23,45,678.90"
+    yen = dict(US_CONVENTIONS, currency_symbol="¥", frac_digits=0)
+    assert MoneyFormatter(yen).format(-123450) == "-¥1,235"
+
+
+def test_format_many_matches_format(monkeypatch):
+    formatter = MoneyFormatter(US_CONVENTIONS)
+    amounts = [100, -123456, 100, 0, 999999999999, -1]
+    expected = [formatter.format(amount) for amount in amounts]
+    assert formatter.format_many(amounts) == expected
+    monkeypatch.setattr(money, "_numpy", False)
+    assert formatter.format_many(amounts) == expected
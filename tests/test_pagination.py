@@ -0,0 +1,86 @@
+from sqltest import pagination
+from sqltest.pagination import TransactionPager
+
+
+def add_transactions(con, count, date=1712000000, **columns):
+    for i in range(count):
+        con.execute(
+            "INSERT INTO transactions (amount, date, account_id, budget_category_id, spending_category_id) values (?, ?, ?, ?, ?)",
+            (
+                i,
+                date,
+                columns.get("account_id", 1),
+                columns.get("budget_category_id"),
+                columns.get("spending_category_id"),
+            ),
+        )
+
+
+def test_pages_cover_every_row_once(con):
+    "Keyset pages return each transaction exactly once, in (date, id) order"
+    add_transactions(con, 45)
+    pager = TransactionPager(page_size=10)
+
+    seen = []
+    while not pager.exhausted:
+        seen.extend(pager.next_page(con))
+
+    keys = [(row[pagination.DATE], row[pagination.ID]) for row in seen]
+    assert len(keys) == 47
+    assert keys == sorted(keys)
+    assert len(set(keys)) == len(keys)
+    assert pager.next_page(con) == []
+
+
+def test_uncategorized_rows_are_included(con):
+    "Rows without categories still show up"
+    add_transactions(con, 3)
+    rows = TransactionPager().next_page(con)
+    assert len(rows) == 5
+    assert rows[-1][pagination.BUDGET_CATEGORY] is None
+    assert rows[-1][pagination.SPENDING_CATEGORY] is None
+
+
+def test_reset_starts_over(con):
+    pager = TransactionPager(page_size=1)
+    first = pager.next_page(con)
+    pager.next_page(con)
+    pager.reset()
+    assert pager.next_page(con) == first
+
+
+def test_date_range(con):
+    "Only rows in the range come back, still paged in (date, id) order"
+    for day in range(19800, 19830):
+        add_transactions(con, 2, date=day)
+    pager = TransactionPager(page_size=7, start=19810, end=19819)
+
+    seen = []
+    while not pager.exhausted:
+        seen.extend(pager.next_page(con))
+
+    assert len(seen) == 20
+    assert {row[pagination.DATE] for row in seen} == set(range(19810, 19820))
+    keys = [(row[pagination.DATE], row[pagination.ID]) for row in seen]
+    assert keys == sorted(keys)
+
+
+def test_loaded_rows_reads_changed_rows_in_one_query(con):
+    "Changed rows are read back by id, and only where the loaded pages reach"
+    for day in range(19800, 19830):
+        add_transactions(con, 1, date=day)
+    pager = TransactionPager(page_size=10)
+    pager.next_page(con)
+    pager.next_page(con)
+    last_date, last_id = pager.last_key
+    con.execute("UPDATE transactions SET date = ? WHERE id = 5", [last_date + 5])
+    con.execute("DELETE FROM transactions WHERE id = 6")
+
+    statements = []
+    con.set_trace_callback(statements.append)
+    rows = pager.loaded_rows(con, [3, 4, 5, 6, last_id, last_id + 1])
+    con.set_trace_callback(None)
+
+    assert [row[pagination.ID] for row in rows] == [3, 4, last_id]
+    assert len(statements) == 1
+    assert TransactionPager().loaded_rows(con, [3]) == []
@@ -0,0 +1,114 @@
+import datetime
+
+import pytest
+
+from sqltest import migrations, pivot
+from sqltest.dates import day_number
+from sqltest.snapshot import LedgerSnapshot
+
+APRIL = pivot.month_number(datetime.date(2024, 4, 1))
+
+
+def add_spending(con, amount, day, spending_category_id=3, transaction_type="Debit"):
+    con.execute(
+        "INSERT INTO transactions (amount, date, transaction_type, account_id, budget_category_id, spending_category_id) values (?, ?, ?, 1, 3, ?)",
+        (amount, day_number(day), transaction_type, spending_category_id),
+    )
+
+
+@pytest.fixture
+def food(con):
+    migrations.migrate(con)
+    con.execute("INSERT INTO budget_categories (name) values ('Food')")
+    con.execute("INSERT INTO spending_categories (parent_category_id, name) values (3, 'Groceries'), (3, 'Restaurants')")
+    add_spending(con, -12000, datetime.date(2024, 4, 2))
+    add_spending(con, -3000, datetime.date(2024, 4, 30), 4)
+    add_spending(con, -500, datetime.date(2024, 5, 1), 4)
+    add_spending(con, -7000, datetime.date(2024, 5, 3), transaction_type="Transfer")
+    add_spending(con, 2000, datetime.date(2024, 5, 4), 4, transaction_type="Credit")
+    add_spending(con, -900, datetime.date(2024, 7, 1))
+    return con
+
+
+def food_rows(rows):
+    return [row for row in rows if row[0] == "Food"]
+
+
+def test_months():
+    assert pivot.month_number(datetime.date(1970, 1, 31)) == 0
+    assert pivot.month_day(APRIL) == day_number(datetime.date(2024, 4, 1))
+    assert pivot.month_label(APRIL + 9) == "2025-01"
+    assert pivot.runs([1, 2, 3, 7, 9, 10]) == [[1, 3], [7, 7], [9, 10]]
+
+
+def test_pivot_by_category_and_month(food):
+    assert food_rows(pivot.spending_pivot(food, APRIL, 3)) == [
+        ("Food", "", 15000, 500, 0, 15500),
+        ("Food", "Groceries", 12000, 0, 0, 12000),
+        ("Food", "Restaurants", 3000, 500, 0, 3500),
+    ]
+
+
+def test_snapshot_matches_sql(food):
+    pytest.importorskip("numpy")
+    assert pivot.spending_pivot(food, APRIL - 1, 6, LedgerSnapshot()) == pivot.spending_pivot(food, APRIL - 1, 6)
+
+
+def test_cache_serves_until_a_write(food):
+    cache = pivot.PivotCache(size=2)
+    first = cache.get(food, APRIL, 3)
+    assert cache.get(food, APRIL, 3) is first
+
+    add_spending(food, -100, datetime.date(2024, 5, 20))
+    second = cache.get(food, APRIL, 3)
+    assert second is not first
+    assert food_rows(second)[0] == ("Food", "", 15000, 600, 0, 15600)
+    assert second == pivot.spending_pivot(food, APRIL, 3)
+
+    # Only the two most recent windows are kept.
+    cache.get(food, APRIL + 1, 3)
+    cache.get(food, APRIL + 2, 3)
+    assert list(cache.windows) == [(APRIL + 1, 3), (APRIL + 2, 3)]
+
+
+def test_cache_regroups_only_changed_months(food, monkeypatch):
+    cache = pivot.PivotCache()
+    cache.get(food, APRIL, 4)
+    grouped = []
+    month_totals = pivot.month_totals
+
+    def counted(con, first, last, snapshot=None):
+        grouped.append((first, last))
+        return month_totals(con, first, last, snapshot)
+
+    monkeypatch.setattr(pivot, "month_totals", counted)
+
+    add_spending(food, -100, datetime.date(2024, 5, 20))
+    add_spending(food, -100, datetime.date(2024, 6, 20))
+    add_spending(food, -100, datetime.date(2023, 1, 20))
+    food.execute("DELETE FROM transactions WHERE date = ?", [day_number(datetime.date(2024, 7, 1))])
+    rows = cache.get(food, APRIL, 4)
+    assert grouped == [(APRIL + 1, APRIL + 3)]
+    assert food_rows(rows)[1] == ("Food", "Groceries", 12000, 100, 100, 0, 12200)
+
+    # A write outside the window regroups nothing.
+    grouped.clear()
+    add_spending(food, -100, datetime.date(2024, 9, 1))
+    assert cache.get(food, APRIL, 4) == rows
+    assert grouped == []
+
+
+def test_bulk_import_marks_months(food):
+    cache = pivot.PivotCache()
+    cache.get(food, APRIL, 3)
+    last_id = food.execute("SELECT MAX(id) FROM transactions").fetchone()[0]
+    seen = food.execute(pivot.CHANGE_SEQ_SQL).fetchone()[0]
+    food.execute("DROP TRIGGER changed_months_insert")
+    add_spending(food, -100, datetime.date(2024, 4, 20))
+    add_spending(food, -100, datetime.date(2024, 6, 20))
+    pivot.mark_inserted(food, last_id)
+
+    assert food.execute(
+        "SELECT month FROM changed_months WHERE change_seq > ? ORDER BY month", [seen]
+    ).fetchall() == [(APRIL,), (APRIL + 1,), (APRIL + 2,)]
+    assert cache.get(food, APRIL, 3) == pivot.spending_pivot(food, APRIL, 3)
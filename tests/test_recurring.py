@@ -0,0 +1,86 @@
+import datetime
+import itertools
+
+import pytest
+
+from sqltest import balances, forecast, migrations, recurring
+from sqltest.dates import day_number, to_date
+
+
+@pytest.fixture
+def migrated(con):
+    migrations.migrate(con)
+    return con
+
+
+def day(year, month, date):
+    return day_number(datetime.date(year, month, date))
+
+
+def test_occurrences_are_lazy_and_clip_to_month_ends():
+    rule = recurring.RecurringRule(1, 1, -150000, "Debit", forecast.MONTHLY, 1, day(2024, 1, 31))
+    # No end date: the generator runs for ever, so only take what is needed.
+    assert [to_date(n) for n in itertools.islice(rule.occurrences(), 4)] == [
+        datetime.date(2024, 1, 31),
+        datetime.date(2024, 2, 29),
+        datetime.date(2024, 3, 31),
+        datetime.date(2024, 4, 30),
+    ]
+    assert list(rule.occurrences(day(2030, 6, 1), day(2030, 6, 30))) == [day(2030, 6, 30)]
+
+
+def test_occurrences_match_the_forecast():
+    rules = [
+        recurring.RecurringRule(1, 1, -100, "Debit", forecast.WEEKLY, 2, day(2023, 12, 29), day(2025, 3, 1)),
+        recurring.RecurringRule(2, 1, -100, "Debit", forecast.YEARLY, 1, day(2020, 2, 29)),
+        recurring.RecurringRule(3, 1, -100, "Debit", forecast.MONTHLY, 5, day(2023, 8, 30), posted_through=day(2024, 2, 1)),
+    ]
+    first, last = day(2024, 1, 1), day(2028, 12, 31)
+    for rule in rules:
+        _, vectorized = forecast.occurrences(rule.forecast_rules(), first, last)
+        after = first if rule.posted_through is None else rule.posted_through + 1
+        assert list(rule.occurrences(after, last)) == vectorized.tolist()
+
+
+def test_post_due_posts_each_occurrence_once(migrated):
+    rent = recurring.add_rule(
+        migrated, 1, -150000, forecast.MONTHLY, day(2024, 4, 1), merchant="Landlord", description="Rent"
+    )
+    recurring.add_rule(migrated, 1, -5000, forecast.WEEKLY, day(2024, 4, 5), until_date=day(2024, 4, 19))
+
+    assert recurring.post_due(migrated, today=day(2024, 5, 15)) == 5
+    assert recurring.post_due(migrated, today=day(2024, 5, 15)) == 0
+    assert recurring.post_due(migrated, today=day(2024, 6, 1)) == 1
+
+    rows = migrated.execute(
+        "SELECT date, amount FROM transactions WHERE merchant = 'Landlord' ORDER BY date"
+    ).fetchall()
+    assert rows == [(day(2024, 4, 1), -150000), (day(2024, 5, 1), -150000), (day(2024, 6, 1), -150000)]
+    assert dict((row[0], row[2]) for row in balances.get_account_balances(migrated))[1] == 1000000 - 450000 - 15000
+
+    recurring.delete_rule(migrated, rent)
+    assert recurring.post_due(migrated, today=day(2024, 9, 1)) == 0
+
+
+def test_transfer_rules_post_both_sides(migrated):
+    recurring.add_rule(
+        migrated, 1, -20000, forecast.MONTHLY, day(2024, 4, 15), transaction_type="Transfer", transfer_account_id=2
+    )
+    assert recurring.post_due(migrated, today=day(2024, 4, 30)) == 2
+    assert dict((row[0], row[2]) for row in balances.get_account_balances(migrated)) == {1: 980000, 2: 5020000}
+
+
+def test_forecast_skips_posted_occurrences(migrated):
+    pytest.importorskip("numpy")
+    recurring.add_rule(migrated, 1, -100000, forecast.MONTHLY, day(2024, 4, 10))
+    today = day(2024, 5, 10)
+    recurring.post_due(migrated, today=today)
+
+    projection = recurring.forecast_ledger(migrated, days=40, first_day=today)
+    assert projection.balance_on(1, today) == 800000
+    assert projection.balance_on(1, day(2024, 6, 10)) == 700000
+
+
+def test_add_rule_rejects_unknown_frequency(migrated):
+    with pytest.raises(ValueError):
+        recurring.add_rule(migrated, 1, -100, "HOURLY", day(2024, 4, 1))
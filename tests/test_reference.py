@@ -0,0 +1,55 @@
+from sqltest import balances, migrations, queries
+from sqltest.reference import ReferenceData
+
+
+def test_load_reads_each_part_once(con):
+    migrations.migrate(con)
+    reference = ReferenceData()
+    assert not reference.loaded()
+    reference.load(con)
+    assert reference.loaded()
+    accounts = reference.accounts
+
+    queries.add_account(con, "Brokerage", "Investment")
+    reference.load(con)
+    assert reference.accounts is accounts
+
+    reference.invalidate_accounts()
+    reference.load(con)
+    assert "Brokerage" in [row[1] for row in reference.accounts]
+
+
+def test_children_index_follows_spending_categories(con):
+    migrations.migrate(con)
+    budget_id = queries.add_budget_category(con, "Food")
+    reference = ReferenceData()
+    reference.load(con)
+    assert reference.children(budget_id) == []
+
+    queries.add_spending_category(con, "Groceries", budget_id)
+    queries.add_spending_category(con, "Dining", budget_id)
+    reference.invalidate_spending_categories()
+    reference.load(con)
+    assert [row[1] for row in reference.children(budget_id)] == ["Dining", "Groceries"]
+
+
+def test_invalidating_one_part_leaves_the_others(con):
+    migrations.migrate(con)
+    reference = ReferenceData()
+    reference.load(con)
+    budget_categories = reference.budget_categories
+    spending_categories = reference.spending_categories
+
+    reference.invalidate_accounts()
+    reference.load(con)
+    assert reference.budget_categories is budget_categories
+    assert reference.spending_categories is spending_categories
+
+
+def test_update_accounts_replaces_only_those_rows(con):
+    migrations.migrate(con)
+    reference = ReferenceData()
+    reference.load(con)
+    queries.add_transaction(con, (19813, "Debit", -1200, 2, None, None, None, None, None, None))
+    reference.update_accounts(balances.get_account_balances(con, [2]))
+    assert reference.accounts == balances.get_account_balances(con)
@@ -0,0 +1,97 @@
+import pytest
+
+from sqltest import db, migrations
+from sqltest.rollups import CategoryRollups, category_rollups
+from sqltest.schema import create_schema
+from sqltest.snapshot import LedgerSnapshot
+
+
+def add_spending(con, amount, budget_category_id, spending_category_id, transaction_type="Debit"):
+    con.execute(
+        "INSERT INTO transactions (amount, date, transaction_type, account_id, budget_category_id, spending_category_id) values (?, ?, ?, 1, ?, ?)",
+        (amount, 1712000000, transaction_type, budget_category_id, spending_category_id),
+    )
+
+
+def make_categories(con):
+    migrations.migrate(con)
+    con.execute("INSERT INTO budget_categories (name) values ('Food')")
+    con.execute("INSERT INTO spending_categories (parent_category_id, name) values (3, 'Groceries'), (3, 'Restaurants')")
+    con.execute("INSERT INTO budget_transactions (amount, date, budget_category_id) values (50000, 1712000000, 3)")
+    add_spending(con, -12000, 3, 3)
+    add_spending(con, -3000, 3, 4)
+    add_spending(con, -500, 3, 4)
+    add_spending(con, -1000, 3, 0)
+    add_spending(con, -7000, 3, 3, transaction_type="Transfer")
+
+
+def test_rollups_per_category(con):
+    make_categories(con)
+    food = [row for row in category_rollups(con) if row[0] == "Food"]
+    assert food == [
+        ("Food", "", 50000 - 16500, 16500),
+        ("Food", "Groceries", None, 12000),
+        ("Food", "Restaurants", None, 3500),
+    ]
+
+
+def test_budget_without_spending_categories(con):
+    make_categories(con)
+    rows = category_rollups(con)
+    assert ("Unknown Budget Category", "", 0, 0) in rows
+
+
+def test_cache_reused_until_a_write(con):
+    make_categories(con)
+    rollups = CategoryRollups()
+    first = rollups.get(con)
+    assert rollups.get(con) is first
+
+    add_spending(con, -100, 3, 3)
+    second = rollups.get(con)
+    assert second is not first
+    assert ("Food", "Groceries", None, 12100) in second
+
+
+def test_rollups_for_some_budget_categories(con):
+    make_categories(con)
+    assert category_rollups(con, budget_category_ids=[3]) == [
+        row for row in category_rollups(con) if row[0] == "Food"
+    ]
+
+
+def test_credits_are_not_spending(con):
+    make_categories(con)
+    add_spending(con, 2500, 3, 3, transaction_type="Credit")
+    food = [
+        ("Food", "", 50000 - 16500, 16500),
+        ("Food", "Groceries", None, 12000),
+        ("Food", "Restaurants", None, 3500),
+    ]
+    assert [row for row in category_rollups(con) if row[0] == "Food"] == food
+    assert category_rollups(con, budget_category_ids=[3]) == food
+    pytest.importorskip("numpy")
+    assert category_rollups(con, LedgerSnapshot()) == category_rollups(con)
+
+
+def test_cache_is_shared_by_connections(tmp_path):
+    "Reader connections each have their own data_version; the cache is keyed on the change log instead"
+    path = tmp_path / "budget"
+    writer = db.connect(path)
+    create_schema(writer)
+    make_categories(writer)
+    writer.commit()
+    first_reader, second_reader = db.connect(path, read_only=True), db.connect(path, read_only=True)
+    try:
+        rollups = CategoryRollups()
+        first = rollups.get(first_reader)
+        assert rollups.get(second_reader) is first
+
+        add_spending(writer, -100, 3, 3)
+        writer.commit()
+        assert ("Food", "Groceries", None, 12100) in rollups.get(second_reader)
+        assert rollups.get(first_reader) is rollups.get(second_reader)
+    finally:
+        first_reader.close()
+        second_reader.close()
+        writer.close()
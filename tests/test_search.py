@@ -0,0 +1,67 @@
+import pytest
+
+from sqltest import importers, migrations, pagination, search
+from sqltest.search import SearchPager
+
+
+@pytest.fixture
+def migrated(con):
+    migrations.migrate(con)
+    return con
+
+
+def add_transaction(con, merchant, description=None, notes=None, date=19814):
+    return con.execute(
+        "INSERT INTO transactions (amount, date, account_id, merchant, description, notes) values (-100, ?, 1, ?, ?, ?)",
+        (date, merchant, description, notes),
+    ).lastrowid
+
+
+def found(con, text, **options):
+    pager = SearchPager(text, **options)
+    rows = []
+    while not pager.exhausted:
+        rows.extend(pager.next_page(con))
+    return [row[pagination.ID] for row in rows]
+
+
+def test_match_expression_quotes_each_word():
+    assert search.match_expression('caf"é OR -x') == '"caf"* "é"* "OR"* "x"*'
+    assert search.match_expression("  ...") is None
+
+
+def test_triggers_keep_the_index_current(migrated):
+    grocer = add_transaction(migrated, "Corner Grocer", "Weekly shop")
+    cafe = add_transaction(migrated, "Cafe Luna", notes="with grocer receipts")
+    assert found(migrated, "groc") == [grocer, cafe]
+    assert found(migrated, "weekly gro") == [grocer]
+
+    migrated.execute("UPDATE transactions SET merchant = 'Bakery' WHERE id = ?", [grocer])
+    assert found(migrated, "corner") == []
+    assert found(migrated, "bake") == [grocer]
+
+    migrated.execute("DELETE FROM transactions WHERE id = ?", [cafe])
+    assert found(migrated, "luna") == []
+
+
+def test_pages_cover_every_match_once(migrated):
+    ids = [add_transaction(migrated, "Cafe", date=19800 + n) for n in range(23)]
+    add_transaction(migrated, "Bakery")
+    seen = found(migrated, "cafe", page_size=4, rank_window=10)
+    assert sorted(seen) == ids
+    # Beyond the ranked window, older matches come newest first.
+    assert seen[10:] == sorted(ids[:13], reverse=True)
+
+
+def test_date_range(migrated):
+    for n in range(10):
+        add_transaction(migrated, "Cafe", date=19800 + n)
+    rows = SearchPager("cafe", start=19803, end=19805).next_page(migrated)
+    assert sorted(row[pagination.DATE] for row in rows) == [19803, 19804, 19805]
+
+
+def test_imported_rows_are_searchable(migrated, tmp_path):
+    path = tmp_path / "statement.csv"
+    path.write_text("Date,Description,Amount,Payee\n04/02/2024,Weekly shop,-54.20,Corner Grocer\n")
+    importers.import_statement(migrated, path, 1)
+    assert len(found(migrated, "corner")) == 1
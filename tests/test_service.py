@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+import pytest
+
+from sqltest import queries
+from sqltest.schema import create_schema
+from sqltest.service import DataService
+
+
+@pytest.fixture
+def service(tmp_path):
+    "A DataService over a new budget file"
+    data_service = DataService(tmp_path / "budget")
+    data_service.call(create_schema)
+    data_service.call(lambda con: con.commit())
+    yield data_service
+    data_service.close()
+
+
+def test_work_runs_off_the_calling_thread(service):
+    thread_name = asyncio.run(service.run(lambda con: threading.current_thread().name))
+    assert thread_name != threading.current_thread().name
+    assert thread_name.startswith("cashflower-db")
+
+
+def test_write_commits(service, tmp_path):
+    async def add():
+        return await service.write(queries.add_budget_category, "Travel")
+
+    category_id = asyncio.run(add())
+    reader = DataService(tmp_path / "budget")
+    try:
+        rows = reader.call(queries.get_budget_categories)
+    finally:
+        reader.close()
+    assert (category_id, "Travel") in rows
+
+
+def test_write_rolls_back_on_error(service):
+    def add_then_fail(con):
+        queries.add_budget_category(con, "Travel")
+        raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(service.write(add_then_fail))
+    names = [row[1] for row in service.call(queries.get_budget_categories)]
+    assert "Travel" not in names
+
+
+def test_transfer_is_written_in_one_transaction(service):
+    values = (1712000000, "Transfer", -100, 1, None, None, None, None, None, 2)
+    other_side = (1712000000, "Transfer", 100, 2, None, None, None, None, None, 1)
+    ids = asyncio.run(service.write(queries.add_transaction, values, other_side))
+    assert len(ids) == 2
+    rows = asyncio.run(
+        service.query("SELECT account_id, amount FROM transactions WHERE transaction_type = 'Transfer' ORDER BY id")
+    )
+    assert rows == [(1, -100), (2, 100)]
+
+
+def test_reads_use_read_only_connections(service):
+    journal_mode = asyncio.run(service.read(lambda con: con.execute("PRAGMA journal_mode").fetchone()[0]))
+    assert journal_mode == "wal"
+    with pytest.raises(Exception):
+        asyncio.run(service.read(queries.add_budget_category, "Travel"))
+
+
+def test_reads_run_while_a_write_is_open(service):
+    started = threading.Event()
+    finish = threading.Event()
+
+    def slow_write(con):
+        queries.add_budget_category(con, "Travel")
+        started.set()
+        finish.wait(5)
+
+    async def read_during_write():
+        write = asyncio.ensure_future(service.write(slow_write))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        names = [row[1] for row in await service.read(queries.get_budget_categories)]
+        finish.set()
+        await write
+        return names
+
+    names = asyncio.run(read_during_write())
+    assert "Travel" not in names
+    assert "Travel" in [row[1] for row in asyncio.run(service.read(queries.get_budget_categories))]
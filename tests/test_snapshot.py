@@ -0,0 +1,101 @@
+import datetime
+
+import pytest
+
+from sqltest import changelog, migrations, rollups
+from sqltest.dates import day_number
+from sqltest.snapshot import LedgerSnapshot
+
+pytest.importorskip("numpy")
+
+APRIL_1 = day_number(datetime.date(2024, 4, 1))
+# Months since January 1970.
+APRIL = (2024 - 1970) * 12 + 3
+
+
+@pytest.fixture
+def migrated(con):
+    migrations.migrate(con)
+    return con
+
+
+def add(con, amount, date, account_id=1, merchant="Cafe", budget_category_id=2, spending_category_id=2, transaction_type="Debit"):
+    return con.execute(
+        "INSERT INTO transactions (amount, date, transaction_type, account_id, merchant, budget_category_id, spending_category_id) values (?, ?, ?, ?, ?, ?, ?)",
+        (amount, date, transaction_type, account_id, merchant, budget_category_id, spending_category_id),
+    ).lastrowid
+
+
+def test_groups_by_account_category_and_month(migrated):
+    add(migrated, -500, APRIL_1 + 3)
+    add(migrated, -700, APRIL_1 + 31, merchant=None)
+    add(migrated, -300, APRIL_1 + 32, account_id=2, transaction_type="Transfer")
+    snapshot = LedgerSnapshot()
+    assert snapshot.refresh(migrated) == 5
+
+    assert snapshot.totals(("account_id",)) == [(1, 1000000 - 1200, 3), (2, 5000000 - 300, 2)]
+    assert snapshot.totals(("spending_category_id", "month"), transfers=False) == [
+        (1, APRIL, 6000000, 2),
+        (2, APRIL, -500, 1),
+        (2, APRIL + 1, -700, 1),
+    ]
+    assert snapshot.totals((), start=APRIL_1 + 1, end=APRIL_1 + 31) == [(-1200, 2)]
+    merchants = snapshot.merchants
+    assert [(merchants[code], total) for code, total, _ in snapshot.totals(("merchant",), account_ids=[1])] == [
+        ("Starting Balance", 1000000),
+        ("Cafe", -500),
+        ("", -700),
+    ]
+
+
+def test_refresh_appends_new_rows_and_reloads_after_a_delete(migrated):
+    snapshot = LedgerSnapshot()
+    snapshot.refresh(migrated)
+    transaction_id = add(migrated, -500, APRIL_1)
+    assert snapshot.refresh(migrated) == 1
+    assert snapshot.refresh(migrated) == 0
+
+    migrated.execute("DELETE FROM transactions WHERE id = ?", [transaction_id])
+    assert snapshot.refresh(migrated) == 2
+    assert snapshot.totals(("account_id",)) == [(1, 1000000, 1), (2, 5000000, 1)]
+
+
+def test_refresh_reads_updated_rows_again(migrated):
+    "Edits that leave every amount alone still reach the snapshot"
+    transaction_id = add(migrated, -500, APRIL_1)
+    snapshot = LedgerSnapshot()
+    snapshot.refresh(migrated)
+    before = rollups.category_rollups(migrated, snapshot)
+
+    migrated.execute(
+        "UPDATE transactions SET budget_category_id = 1, spending_category_id = 1, date = ?, merchant = 'Deli' WHERE id = ?",
+        [APRIL_1 + 40, transaction_id],
+    )
+    assert snapshot.refresh(migrated) == 1
+    assert len(snapshot) == 3
+    after = rollups.category_rollups(migrated, snapshot)
+    assert after != before
+    assert after == rollups.category_rollups(migrated)
+    assert snapshot.totals(("month",), transfers=False)[-1] == (APRIL + 1, -500, 1)
+    assert snapshot.merchants[snapshot.totals(("merchant",), start=APRIL_1 + 1)[0][0]] == "Deli"
+
+
+def test_refresh_starts_again_once_the_log_is_pruned(migrated):
+    snapshot = LedgerSnapshot()
+    snapshot.refresh(migrated)
+    for day in range(3):
+        add(migrated, -100, APRIL_1 + day)
+    changelog.prune(migrated, keep=1)
+    assert snapshot.refresh(migrated) == 5
+
+
+def test_rollups_match_sql(migrated):
+    add(migrated, -500, APRIL_1)
+    add(migrated, -800, APRIL_1, spending_category_id=None)
+    add(migrated, -300, APRIL_1, transaction_type="Transfer")
+    snapshot = LedgerSnapshot()
+    assert rollups.category_rollups(migrated, snapshot) == rollups.category_rollups(migrated)
+
+
+def test_rows_fit_in_forty_bytes():
+    assert LedgerSnapshot().bytes_per_row() < 40
@@ -0,0 +1,23 @@
+from sqltest.startup_timing import StartupTimer
+
+
+def test_marks_are_kept_in_order_and_only_once():
+    timer = StartupTimer()
+    timer.mark("import")
+    timer.mark("db open")
+    first_db_open = timer.elapsed("db open")
+    timer.mark("db open")
+    assert [name for name, _ in timer.marks] == ["import", "db open"]
+    assert timer.elapsed("db open") == first_db_open
+    assert timer.elapsed("import") <= first_db_open
+    assert timer.elapsed("data loaded") is None
+
+
+def test_report_has_a_line_per_mark():
+    timer = StartupTimer()
+    timer.mark("import")
+    timer.mark("first paint")
+    lines = timer.report().splitlines()
+    assert len(lines) == 2
+    assert lines[0].strip().startswith("import:")
+    assert lines[1].strip().startswith("first paint:")
@@ -0,0 +1,40 @@
+import datetime
+import hashlib
+import sqlite3
+
+from sqltest import balances, checkpoints, migrations, synthetic
+
+
+def test_ledger_has_the_requested_transactions(tmp_path):
+    path = synthetic.generate_ledger(tmp_path / "budget", 2000)
+    con = sqlite3.connect(path)
+    # The two starting balances come from the empty schema.
+    assert con.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 2002
+    assert migrations.current_version(con) == migrations.SCHEMA_VERSION
+    assert balances.verify_account_balances(con) == []
+    assert con.execute(
+        "SELECT SUM(amount) FROM transactions WHERE transaction_type = 'Transfer'"
+    ).fetchone()[0] == 0
+    assert con.execute("SELECT COUNT(*) FROM budget_transactions").fetchone()[0] > 0
+    balance_of = dict((row[0], row[2]) for row in balances.get_account_balances(con))
+    assert checkpoints.as_of(con, 1, datetime.date(2030, 1, 1)) == balance_of[1]
+    con.close()
+
+
+def test_same_seed_same_ledger(tmp_path):
+    def digest(path):
+        con = sqlite3.connect(path)
+        rows = con.execute("SELECT * FROM transactions ORDER BY id").fetchall()
+        con.close()
+        return hashlib.sha256(repr(rows).encode()).hexdigest()
+
+    first = synthetic.generate_ledger(tmp_path / "first", 1000)
+    second = synthetic.generate_ledger(tmp_path / "second", 1000)
+    other = synthetic.generate_ledger(tmp_path / "other", 1000, seed=1)
+    assert digest(first) == digest(second)
+    assert digest(first) != digest(other)
+
+
+def test_parse_size():
+    assert synthetic.parse_size("1M") == 1000000
+    assert synthetic.parse_size("25_000") == 25000
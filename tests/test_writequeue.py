@@ -0,0 +1,116 @@
+import asyncio
+import threading
+
+import pytest
+
+from sqltest import queries
+from sqltest.schema import create_schema
+from sqltest.service import DataService
+from sqltest.writequeue import WriteQueue
+
+
+@pytest.fixture
+def service(tmp_path):
+    "A DataService over a new budget file"
+    data_service = DataService(tmp_path / "budget")
+    data_service.call(create_schema)
+    data_service.call(lambda con: con.commit())
+    yield data_service
+    data_service.close()
+
+
+def budget_names(service):
+    return [row[1] for row in service.call(queries.get_budget_categories)]
+
+
+def count_commits(service):
+    statements = []
+    service.call(lambda con: con.set_trace_callback(statements.append))
+    return statements
+
+
+def test_writes_are_committed_together(service):
+    statements = count_commits(service)
+    queue = WriteQueue(service, delay=0.01)
+
+    async def enter():
+        futures = [queue.submit(queries.add_budget_category, f"Category {n}") for n in range(20)]
+        return await asyncio.gather(*futures)
+
+    ids = asyncio.run(enter())
+    assert len(set(ids)) == 20
+    assert [s for s in statements if s.upper() == "COMMIT"] == ["COMMIT"]
+    assert "Category 19" in budget_names(service)
+
+
+def test_failed_write_is_rolled_back_alone(service):
+    queue = WriteQueue(service, delay=0.01)
+
+    def transfer_then_fail(con):
+        queries.add_budget_category(con, "Half written")
+        raise RuntimeError("failed")
+
+    async def enter():
+        return await asyncio.gather(
+            queue.submit(queries.add_budget_category, "Kept"),
+            queue.submit(transfer_then_fail),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(enter())
+    assert isinstance(results[1], RuntimeError)
+    names = budget_names(service)
+    assert "Kept" in names
+    assert "Half written" not in names
+
+
+def test_flush_and_close_write_pending_rows(service):
+    queue = WriteQueue(service, delay=60)
+
+    async def enter():
+        queue.submit(queries.add_budget_category, "Flushed")
+        await queue.flush()
+        queue.submit(queries.add_budget_category, "On exit")
+
+    asyncio.run(enter())
+    assert "Flushed" in budget_names(service)
+    assert "On exit" not in budget_names(service)
+    queue.close()
+    assert "On exit" in budget_names(service)
+
+
+def test_on_commit_runs_after_each_batch(service):
+    committed = []
+    queue = WriteQueue(service, delay=60, on_commit=lambda: committed.append(budget_names(service)))
+
+    async def enter():
+        queue.submit(queries.add_budget_category, "Seen")
+        await queue.flush()
+        await queue.flush()
+
+    asyncio.run(enter())
+    assert len(committed) == 1
+    assert "Seen" in committed[0]
+
+
+def test_flush_waits_for_a_batch_already_committing(service):
+    queue = WriteQueue(service, delay=0.01)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_write(con):
+        started.set()
+        release.wait()
+        return queries.add_budget_category(con, "In flight")
+
+    async def enter():
+        future = queue.submit(slow_write)
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        flushed = asyncio.ensure_future(queue.flush())
+        await asyncio.sleep(0.05)
+        waited = not flushed.done()
+        release.set()
+        await flushed
+        return waited, future.done()
+
+    assert asyncio.run(enter()) == (True, True)